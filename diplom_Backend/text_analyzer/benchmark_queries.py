@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк основных запросов API до и после индексов миграции 0010.
+
+Создает отдельную тестовую базу (test_<NAME> из настроек), заполняет ее
+синтетическими документами, сессиями и темами, выполняет запросы
+endpoint'ов без индексов (схема 0009) и с итоговой схемой (все миграции) и печатает
+время выполнения и план запроса (EXPLAIN).
+
+    python benchmark_queries.py --documents 200000 --sessions 20 --topics 20
+    python benchmark_queries.py --plans        # полные планы запросов
+"""
+import argparse
+import os
+import random
+import statistics
+import time
+from datetime import date, timedelta
+
+import django
+
+
+BEFORE_MIGRATION = '0009_topicdailycount'
+
+THEMES = ['спорт', 'экономика', 'политика', 'технологии', 'культура', 'медицина', 'образование', 'наука']
+WORDS = [
+    'матч', 'команда', 'рынок', 'инвестиции', 'выборы', 'закон', 'алгоритм', 'данные',
+    'театр', 'кино', 'лечение', 'больница', 'студент', 'курс', 'исследование', 'открытие',
+    'регион', 'проект', 'развитие', 'результат', 'решение', 'система', 'программа', 'сезон'
+]
+
+
+def seed(documents: int, sessions: int, topics: int, days: int):
+    """
+    Синтетические данные: документы за days дней, сессии по documents/sessions
+    документов, в каждой сессии topics тем с дневными счетчиками
+    """
+    from text_analysis.analysis_sessions import rebuild_daily_counts
+    from text_analysis.ingestion import ingest_documents
+    from text_analysis.models import AnalysisSession, TopicDocument, TopicResult
+
+    rng = random.Random(42)
+    start = date(2024, 1, 1)
+    started = time.time()
+    text_documents = ingest_documents([
+        {
+            'date': start + timedelta(days=rng.randrange(days)),
+            'theme': rng.choice(THEMES),
+            'text': f"{i} " + ' '.join(rng.choice(WORDS) for _ in range(40))
+        }
+        for i in range(documents)
+    ])
+
+    SessionDocuments = AnalysisSession.documents.through
+    per_session = max(1, len(text_documents) // sessions)
+    for s in range(sessions):
+        session_documents = text_documents[s * per_session:(s + 1) * per_session]
+        session = AnalysisSession.objects.create(name=f'Бенчмарк {s + 1}', algorithm_used='benchmark')
+        SessionDocuments.objects.bulk_create(
+            [SessionDocuments(analysissession_id=session.id, textdocument_id=doc.id) for doc in session_documents],
+            batch_size=20000
+        )
+        topic_results = TopicResult.objects.bulk_create([
+            TopicResult(
+                session=session,
+                topic_name=f'Тема {t + 1}',
+                topic_keywords=rng.sample(WORDS, 5),
+                document_count=0,
+                confidence_score=0.5
+            )
+            for t in range(topics)
+        ])
+        TopicDocument.objects.bulk_create(
+            [
+                TopicDocument(
+                    topic_id=topic_results[i % topics].id,
+                    document_id=doc.id,
+                    confidence=round(rng.random(), 3)
+                )
+                for i, doc in enumerate(session_documents)
+            ],
+            batch_size=20000
+        )
+        rebuild_daily_counts(session)
+    print(f"Seeded {len(text_documents)} documents, {sessions} sessions x {topics} topics "
+          f"in {time.time() - started:.1f}s")
+
+
+def benchmark_queries():
+    """
+    Запросы endpoint'ов: (название, endpoint, функция -> QuerySet)
+    """
+    from django.db.models import Sum
+    from django.utils import timezone
+    from text_analysis.models import AnalysisJob, AnalysisSession, TextDocument, TopicDocument, TopicResult
+
+    session = AnalysisSession.objects.order_by('id').first()
+    topic = TopicResult.objects.filter(session=session).order_by('id').first()
+    document_id = TopicDocument.objects.filter(topic=topic).values_list('document_id', flat=True).first()
+    period = [date(2024, 2, 1), date(2024, 2, 14)]
+
+    return [
+        ('documents page', 'GET documents/',
+         lambda: TextDocument.objects.order_by('-created_at', '-id')[:50]),
+        ('theme in period', 'фильтр документов',
+         lambda: TextDocument.objects.filter(theme='спорт', date__range=period)),
+        ('session documents in period', 'справка по сессии',
+         lambda: session.documents.filter(date__range=period)),
+        ('topic by name', 'POST llm/generate-summary/',
+         lambda: session.topic_results.filter(topic_name=topic.topic_name)),
+        ('topic documents in period', 'POST llm/generate-summary/',
+         lambda: topic.documents.filter(date__range=period)),
+        ('summary report', 'справка по периоду',
+         lambda: session.daily_counts.filter(date__range=period, topic__isnull=False)
+         .values('topic_id').annotate(documents=Sum('document_count'))),
+        ('topics of document', 'темы документа',
+         lambda: TopicDocument.objects.filter(document_id=document_id)),
+        ('sessions page', 'GET analysis-sessions/',
+         lambda: AnalysisSession.objects.order_by('-created_at', '-id')[:50]),
+        ('stale sessions', 'обработчик задач',
+         lambda: AnalysisSession.objects.filter(status=AnalysisSession.STATUS_RUNNING, jobs__isnull=False)
+         .exclude(
+             jobs__status=AnalysisJob.STATUS_RUNNING,
+             jobs__heartbeat_at__gte=timezone.now() - timedelta(hours=1)
+         )),
+    ]
+
+
+def explain(queryset) -> str:
+    from django.db import connection
+
+    if connection.vendor == 'postgresql':
+        return queryset.explain(analyze=True)
+    return queryset.explain()
+
+
+def measure(repeat: int):
+    """Медианное время (мс) и план каждого запроса"""
+    results = {}
+    for name, endpoint, build in benchmark_queries():
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            list(build())
+            timings.append((time.perf_counter() - started) * 1000)
+        results[name] = {
+            'endpoint': endpoint,
+            'ms': statistics.median(timings),
+            'plan': explain(build())
+        }
+    return results
+
+
+def analyze_tables():
+    """Обновление статистики планировщика после загрузки/создания индексов"""
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк запросов до и после индексов')
+    parser.add_argument('--documents', type=int, default=100000, help='количество документов')
+    parser.add_argument('--sessions', type=int, default=10, help='количество сессий')
+    parser.add_argument('--topics', type=int, default=20, help='тем в сессии')
+    parser.add_argument('--days', type=int, default=365, help='дней, по которым распределены документы')
+    parser.add_argument('--repeat', type=int, default=20, help='повторов каждого запроса')
+    parser.add_argument('--plans', action='store_true', help='печатать полные планы запросов')
+    parser.add_argument('--keepdb', action='store_true', help='не удалять тестовую базу')
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'text_analyzer.settings')
+    django.setup()
+
+    from django.core.management import call_command
+    from django.db import connection
+
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=args.keepdb)
+    try:
+        call_command('migrate', 'text_analysis', BEFORE_MIGRATION, verbosity=0)
+        seed(args.documents, args.sessions, args.topics, args.days)
+        analyze_tables()
+        before = measure(args.repeat)
+
+        # Итоговая схема: индексы в том виде, в каком они будут в рабочей базе
+        call_command('migrate', 'text_analysis', verbosity=0)
+        analyze_tables()
+        after = measure(args.repeat)
+    finally:
+        if not args.keepdb:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    print(f"\n{'Запрос':32} {'Endpoint':28} {'До, мс':>10} {'После, мс':>10}")
+    for name, result in before.items():
+        print(f"{name:32} {result['endpoint']:28} {result['ms']:10.2f} {after[name]['ms']:10.2f}")
+
+    for name, result in before.items():
+        print(f"\n=== {name} ({result['endpoint']})")
+        for label, plan in (('до', result['plan']), ('после', after[name]['plan'])):
+            lines = plan.splitlines()
+            print(f"--- {label}:")
+            print('\n'.join(lines if args.plans else lines[:3]))
+
+
+if __name__ == '__main__':
+    main()
@@ -94,6 +94,26 @@ def pull_model(model_name="mistral"):
         print(f"❌ Ошибка: {e}")
         return False
 
+def warm_up_model(model_name="mistral", keep_alive="30m"):
+    """Загрузка модели в память Ollama, чтобы первый запрос не ждал ее загрузки"""
+    print(f"🔥 Прогрев модели '{model_name}'...")
+    
+    try:
+        # Запрос без промпта только загружает модель и задает keep_alive
+        response = requests.post(
+            "http://localhost:11434/api/generate",
+            json={"model": model_name, "prompt": "", "keep_alive": keep_alive},
+            timeout=300
+        )
+        if response.status_code == 200:
+            print(f"✅ Модель '{model_name}' загружена в память (keep_alive: {keep_alive})")
+            return True
+        print(f"❌ Ошибка прогрева модели: {response.status_code}")
+        return False
+    except Exception as e:
+        print(f"❌ Ошибка: {e}")
+        return False
+
 def setup_ollama():
     """Полная настройка Ollama"""
     print("=" * 60)
@@ -114,6 +134,9 @@ def setup_ollama():
         if not pull_model(model):
             return False
     
+    # 3. Загружаем модель в память
+    warm_up_model(model)
+    
     print(f"\n✅ Настройка завершена!")
     print(f"📖 Используемая модель: {model}")
     print(f"🔗 API доступен по: http://localhost:11434")
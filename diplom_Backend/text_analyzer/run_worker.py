@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Обработчик фоновых задач анализа (AnalysisJob).
+
+Запуск рядом с сервером, можно в нескольких экземплярах:
+    python run_worker.py            # обрабатывать очередь постоянно
+    python run_worker.py --once     # выполнить задачи из очереди и выйти
+"""
+import argparse
+import os
+import signal
+
+import django
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Обработчик фоновых задач анализа')
+    parser.add_argument('--once', action='store_true', help='выполнить доступные задачи и выйти')
+    parser.add_argument('--poll-interval', type=float, default=None, help='пауза между опросами очереди (сек)')
+    parser.add_argument('--worker-id', default=None, help='имя обработчика (по умолчанию host:pid)')
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'text_analyzer.settings')
+    django.setup()
+
+    from text_analysis.jobs import JobWorker
+    from text_analysis.llm_warmup import start_model_warmup
+
+    worker = JobWorker(worker_id=args.worker_id, poll_interval=args.poll_interval)
+    # Текущая задача дорабатывается, новые не берутся
+    signal.signal(signal.SIGTERM, lambda *_: worker.stop())
+
+    if not args.once:
+        start_model_warmup()
+    try:
+        worker.run(once=args.once)
+    except KeyboardInterrupt:
+        worker.stop()
+
+
+if __name__ == '__main__':
+    main()
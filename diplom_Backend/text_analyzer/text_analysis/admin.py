@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import TextDocument, AnalysisSession, TopicResult
+from .models import TextDocument, AnalysisSession, TopicResult, AnalysisJob
 
 class TextDocumentAdmin(admin.ModelAdmin):
     list_display = ['date', 'theme', 'created_at']
@@ -24,6 +24,12 @@ class TopicResultAdmin(admin.ModelAdmin):
     list_filter = ['session', 'confidence_score']
     search_fields = ['topic_name', 'topic_keywords']
 
+class AnalysisJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'kind', 'status', 'progress', 'worker', 'created_at', 'finished_at']
+    list_filter = ['status', 'kind', 'created_at']
+    readonly_fields = ['created_at', 'started_at', 'heartbeat_at', 'finished_at']
+
 admin.site.register(TextDocument, TextDocumentAdmin)
 admin.site.register(AnalysisSession, AnalysisSessionAdmin)
-admin.site.register(TopicResult, TopicResultAdmin)
\ No newline at end of file
+admin.site.register(TopicResult, TopicResultAdmin)
+admin.site.register(AnalysisJob, AnalysisJobAdmin)
\ No newline at end of file
@@ -0,0 +1,158 @@
+from datetime import timedelta
+from typing import Dict, List, Tuple
+
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .ingestion import ingest_documents
+from .models import AnalysisJob, AnalysisSession, TextDocument, TopicDailyCount, TopicDocument, TopicResult
+
+
+def start_analysis_session(documents_data: List[Dict], job: AnalysisJob = None,
+                           **session_fields) -> Tuple[AnalysisSession, List[TextDocument]]:
+    """
+    Первая фаза анализа: документы и сессия сохраняются в короткой транзакции
+    до начала вычислений. Сессия создается со статусом running.
+
+    Args:
+        job: Фоновая задача, выполняющая анализ (сессия привязывается к ней сразу)
+
+    Returns:
+        (сессия, TextDocument в порядке documents_data)
+    """
+    with transaction.atomic():
+        text_documents = ingest_documents(documents_data)
+        session = AnalysisSession.objects.create(status=AnalysisSession.STATUS_RUNNING, **session_fields)
+        session.documents.set(text_documents)
+        rebuild_daily_counts(session, topic_ids=[])
+        if job is not None:
+            AnalysisJob.objects.filter(pk=job.pk).update(session=session)
+    return session, text_documents
+
+
+def topic_document_links(topic_id: int, documents: List[TextDocument], confidences: List = None) -> List[TopicDocument]:
+    """
+    Связи темы с документами (TopicDocument) с уверенностью отнесения.
+    Одинаковые по содержимому документы - одна строка TextDocument,
+    для нее берется уверенность первого вхождения.
+    """
+    confidences = confidences or [None] * len(documents)
+    document_confidences = {}
+    for document, confidence in zip(documents, confidences):
+        document_confidences.setdefault(document.id, confidence)
+    return [
+        TopicDocument(
+            topic_id=topic_id,
+            document_id=document_id,
+            confidence=None if confidence is None else float(confidence)
+        )
+        for document_id, confidence in document_confidences.items()
+    ]
+
+
+def create_topic_results(session: AnalysisSession, topics: List[Dict]) -> List[TopicResult]:
+    """
+    Запись тем сессии: все темы - один bulk_create, все связи тем с
+    документами (с уверенностью отнесения) - один bulk_create TopicDocument.
+    Статус сессии и дневные счетчики не меняются. document_count темы -
+    число ее связей после объединения одинаковых документов.
+
+    Args:
+        topics: [{'topic_name', 'topic_keywords', 'confidence_score',
+                  'documents': [TextDocument], 'confidences': [float] (необязательно,
+                  по порядку documents)}]
+    """
+    topic_links = [
+        topic_document_links(None, topic['documents'], topic.get('confidences'))
+        for topic in topics
+    ]
+    topic_results = TopicResult.objects.bulk_create([
+        TopicResult(
+            session=session,
+            topic_name=topic['topic_name'],
+            topic_keywords=topic['topic_keywords'],
+            confidence_score=topic['confidence_score'],
+            document_count=len(links)
+        )
+        for topic, links in zip(topics, topic_links)
+    ])
+    links = []
+    for topic_result, topic_document_rows in zip(topic_results, topic_links):
+        for link in topic_document_rows:
+            link.topic_id = topic_result.id
+        links.extend(topic_document_rows)
+    # Пачки по 20000 строк укладываются в лимит параметров запроса PostgreSQL
+    TopicDocument.objects.bulk_create(links, batch_size=20000)
+    return topic_results
+
+
+def save_topic_results(session: AnalysisSession, topics: List[Dict]) -> List[TopicResult]:
+    """
+    Последняя фаза анализа: запись тем (create_topic_results) одной
+    короткой транзакцией, пересчет дневных счетчиков и завершение сессии.
+    """
+    with transaction.atomic():
+        topic_results = create_topic_results(session, topics)
+        rebuild_daily_counts(session)
+        session.status = AnalysisSession.STATUS_COMPLETED
+        session.save(update_fields=['status'])
+    return topic_results
+
+
+def rebuild_daily_counts(session: AnalysisSession, topic_ids: List[int] = None):
+    """
+    Пересчет дневных счетчиков сессии (TopicDailyCount): итоги по всем
+    документам сессии и по темам topic_ids (None - по всем темам сессии).
+    Счетчики считаются агрегирующими запросами на стороне БД.
+    """
+    stale = TopicDailyCount.objects.filter(session=session)
+    topic_links = TopicDocument.objects.filter(topic__session=session)
+    if topic_ids is not None:
+        stale = stale.filter(Q(topic__isnull=True) | Q(topic_id__in=topic_ids))
+        topic_links = topic_links.filter(topic_id__in=topic_ids)
+
+    session_days = session.documents.values('date').annotate(count=Count('id')).order_by()
+    topic_days = topic_links.values('topic_id', 'document__date').annotate(count=Count('id')).order_by()
+    with transaction.atomic():
+        stale.delete()
+        TopicDailyCount.objects.bulk_create(
+            [
+                TopicDailyCount(session=session, date=day['date'], document_count=day['count'])
+                for day in session_days
+            ] + [
+                TopicDailyCount(
+                    session=session, topic_id=day['topic_id'],
+                    date=day['document__date'], document_count=day['count']
+                )
+                for day in topic_days
+            ],
+            batch_size=5000
+        )
+
+
+def fail_analysis_session(session: AnalysisSession, error):
+    """
+    Пометка сессии, анализ которой завершился ошибкой
+    """
+    session.status = AnalysisSession.STATUS_FAILED
+    session.metadata['error'] = str(error)
+    session.save(update_fields=['status', 'metadata'])
+
+
+def fail_stale_sessions(older_than: float) -> int:
+    """
+    Сессии фоновых задач, оставшиеся в статусе running, хотя обработчик
+    задачи не подает сигналов дольше older_than секунд (или задача уже
+    снята с выполнения), помечаются как failed. Сессии синхронных
+    запросов без задачи не затрагиваются.
+    """
+    deadline = timezone.now() - timedelta(seconds=older_than)
+    failed = (
+        AnalysisSession.objects.filter(status=AnalysisSession.STATUS_RUNNING, jobs__isnull=False)
+        .exclude(jobs__status=AnalysisJob.STATUS_RUNNING, jobs__heartbeat_at__gte=deadline)
+        .update(status=AnalysisSession.STATUS_FAILED)
+    )
+    if failed:
+        print(f"Marked {failed} stale analysis sessions as failed")
+    return failed
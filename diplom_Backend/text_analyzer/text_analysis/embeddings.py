@@ -0,0 +1,286 @@
+import asyncio
+import hashlib
+import os
+import re
+import threading
+from pathlib import Path
+from typing import List, Dict, Optional
+
+import aiohttp
+import numpy as np
+
+from .llm_coalescing import CacheFileLock
+from .llm_pool import LLMBackendPool
+from .llm_scheduler import LLMOverloadedError, LLMScheduler
+
+
+class EmbeddingStore:
+    """
+    Компактное хранилище эмбеддингов в одном файле, который только дописывается:
+    заголовок (размерность, uint32) и записи фиксированной длины
+    (хеш содержимого + вектор float32).
+
+    Хранилище одно на процесс и модель (get_embedding_store). Новые векторы
+    дописываются под межпроцессной блокировкой CacheFileLock; перед записью
+    читаются записи, добавленные другими процессами, поэтому их строки не теряются.
+    """
+
+    KEY_SIZE = 40  # sha1 hexdigest
+    HEADER_SIZE = 4
+
+    def __init__(self, cache_dir: str, model_name: str, lock_timeout: float = 30):
+        safe_name = re.sub(r'[^\w\-]', '_', model_name)
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(exist_ok=True)
+        self.path = self.cache_dir / f"embeddings_{safe_name}.bin"
+        self.lock_path = self.cache_dir / f"embeddings_{safe_name}.lock"
+        self.lock_timeout = lock_timeout
+
+        self._lock = threading.Lock()
+        self._vectors: Dict[str, np.ndarray] = {}
+        self._dim: Optional[int] = None
+        self._offset = 0  # Сколько байт файла уже прочитано
+        with self._lock:
+            self._refresh()
+
+    def _record_dtype(self, dim: int) -> np.dtype:
+        return np.dtype([('key', f'S{self.KEY_SIZE}'), ('vector', '<f4', (dim,))])
+
+    def _refresh(self):
+        """
+        Чтение записей, дописанных в файл после предыдущего чтения
+        (в том числе другими процессами); недописанная последняя запись пропускается
+        """
+        try:
+            with open(self.path, 'rb') as f:
+                header = f.read(self.HEADER_SIZE)
+                if len(header) < self.HEADER_SIZE:
+                    return
+                dim = int(np.frombuffer(header, dtype='<u4')[0])
+                size = os.fstat(f.fileno()).st_size
+                if dim != self._dim or size < self._offset:
+                    # Файл создан заново (например, сменилась размерность модели)
+                    self._vectors = {}
+                    self._dim = dim
+                    self._offset = self.HEADER_SIZE
+                f.seek(self._offset)
+                data = f.read()
+        except OSError as e:
+            if not isinstance(e, FileNotFoundError):
+                print(f"Error loading embedding store: {e}")
+            return
+
+        record_dtype = self._record_dtype(self._dim)
+        count = len(data) // record_dtype.itemsize
+        if not count:
+            return
+        records = np.frombuffer(data, dtype=record_dtype, count=count)
+        for key, vector in zip(records['key'], records['vector']):
+            self._vectors.setdefault(key.decode('ascii'), vector)
+        self._offset += count * record_dtype.itemsize
+
+    def _create_file(self, dim: int):
+        """Новый пустой файл хранилища с заголовком (атомарно)"""
+        tmp_file = self.path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_file, 'wb') as f:
+            f.write(np.array([dim], dtype='<u4').tobytes())
+        os.replace(tmp_file, self.path)
+        self._vectors = {}
+        self._dim = dim
+        self._offset = self.HEADER_SIZE
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Получение сохраненных векторов по хешам"""
+        with self._lock:
+            if any(key not in self._vectors for key in keys):
+                self._refresh()
+            return {key: self._vectors[key] for key in keys if key in self._vectors}
+
+    def add_many(self, vectors: Dict[str, np.ndarray]):
+        """Дозапись новых векторов в файл хранилища"""
+        with self._lock:
+            new_keys = [key for key in vectors if key not in self._vectors]
+            if not new_keys:
+                return
+
+            lock = CacheFileLock(self.lock_path)
+            if not lock.acquire(timeout=self.lock_timeout):
+                # Векторы остаются только в памяти процесса
+                print("Embedding store is locked by another process, keeping vectors in memory")
+                for key in new_keys:
+                    self._vectors[key] = np.asarray(vectors[key], dtype=np.float32)
+                return
+            try:
+                self._refresh()
+                new_keys = [key for key in new_keys if key not in self._vectors]
+                if not new_keys:
+                    return
+                dim = len(vectors[new_keys[0]])
+                if dim != self._dim:
+                    # Нет файла или размерность изменилась (сменили модель с тем же именем)
+                    self._create_file(dim)
+                elif os.path.getsize(self.path) > self._offset:
+                    # Хвост недописанной записи процесса, завершившегося аварийно
+                    os.truncate(self.path, self._offset)
+
+                records = np.zeros(len(new_keys), dtype=self._record_dtype(dim))
+                records['key'] = [key.encode('ascii') for key in new_keys]
+                records['vector'] = np.vstack([vectors[key] for key in new_keys])
+                with open(self.path, 'ab') as f:
+                    f.write(records.tobytes())
+                self._offset += records.nbytes
+                for key, vector in zip(new_keys, records['vector']):
+                    self._vectors[key] = vector
+            finally:
+                lock.release()
+
+
+_stores: Dict[tuple, EmbeddingStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_embedding_store(cache_dir: str, model_name: str) -> EmbeddingStore:
+    """
+    Общее для процесса хранилище эмбеддингов модели: анализаторы
+    не перечитывают файл хранилища при создании
+    """
+    key = (str(Path(cache_dir).resolve()), model_name)
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = EmbeddingStore(cache_dir, model_name)
+        return _stores[key]
+
+
+class OllamaEmbedder:
+    """
+    Получение эмбеддингов через endpoint Ollama /api/embeddings
+    с кэшированием по хешу содержимого.
+
+    Запросы идут тем же путем, что и вызовы LLM: слот планировщика в классе
+    приоритета, наименее загруженный бэкенд пула с закрытой цепью и общий
+    дедлайн на все запросы вызова embed().
+    """
+
+    def __init__(self, pool: LLMBackendPool, scheduler: LLMScheduler, model_name: str, cache_dir: str,
+                 priority: str = 'bulk', request_deadline: float = 180,
+                 batch_size: int = 16, timeout: int = 60, max_text_length: int = 2000):
+        self.pool = pool
+        self.scheduler = scheduler
+        self.priority = priority
+        self.request_deadline = request_deadline
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.max_text_length = max_text_length
+        self.store = get_embedding_store(cache_dir, model_name)
+
+    @staticmethod
+    def content_hash(text: str) -> str:
+        """Хеш содержимого текста"""
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+    async def _embed_one(self, session: aiohttp.ClientSession, text: str,
+                         deadline: float) -> Optional[List[float]]:
+        loop = asyncio.get_running_loop()
+        if not await self.scheduler.acquire_async(self.priority, timeout=max(0.0, deadline - loop.time())):
+            return None
+        try:
+            backend = await self.pool.acquire_async(self.model_name, timeout=max(0.0, deadline - loop.time()))
+            if backend is None:
+                return None
+            try:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    print("Embedding request deadline exceeded")
+                    return None
+                payload = {"model": self.model_name, "prompt": text}
+                timeout = aiohttp.ClientTimeout(total=min(self.timeout, remaining))
+                async with session.post(f"{backend.url}/api/embeddings", json=payload, timeout=timeout) as response:
+                    if response.status != 200:
+                        print(f"Embedding request on {backend.url} failed: {response.status}")
+                        # 4xx - ошибка запроса, а не признак недоступности бэкенда
+                        if response.status >= 500:
+                            backend.health.record_failure(f"HTTP {response.status}")
+                        return None
+                    result = await response.json()
+                    backend.health.record_success()
+                    return result.get("embedding")
+            except Exception as e:
+                print(f"Embedding request on {backend.url} error: {e}")
+                backend.health.record_failure(str(e) or type(e).__name__)
+                return None
+            finally:
+                self.pool.release(backend)
+        finally:
+            self.scheduler.release(self.priority)
+
+    async def _embed_async(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Пакетные запросы: внутри пакета запросы выполняются параллельно
+        (в пределах слотов планировщика и пула). После неудачного пакета
+        остальные не отправляются - результат все равно будет отброшен.
+        """
+        if not self.pool.is_available(self.model_name):
+            print(f"No LLM backend available for {self.model_name}, skipping embeddings")
+            return [None] * len(texts)
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.request_deadline
+        results = []
+        async with aiohttp.ClientSession() as session:
+            for start in range(0, len(texts), self.batch_size):
+                batch = texts[start:start + self.batch_size]
+                results.extend(await asyncio.gather(
+                    *(self._embed_one(session, text, deadline) for text in batch)
+                ))
+                if any(vector is None for vector in results):
+                    break
+        return results + [None] * (len(texts) - len(results))
+
+    def embed(self, texts: List[str]) -> Optional[np.ndarray]:
+        """
+        Эмбеддинги текстов (матрица n x d, float32); None, если сервис недоступен
+        """
+        texts = [text[:self.max_text_length] for text in texts]
+        keys = [self.content_hash(text) for text in texts]
+        cached = self.store.get_many(keys)
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+
+        if missing:
+            print(f"Requesting {len(missing)} embeddings ({len(cached)} cached)")
+            try:
+                vectors = asyncio.run(self._embed_async(list(missing.values())))
+            except LLMOverloadedError:
+                # Отказ планировщика передается в view (ответ 503), как и для вызовов LLM
+                raise
+            except Exception as e:
+                print(f"Error requesting embeddings: {e}")
+                return None
+            if any(vector is None for vector in vectors):
+                return None
+            new_vectors = {
+                key: np.asarray(vector, dtype=np.float32)
+                for key, vector in zip(missing.keys(), vectors)
+            }
+            self.store.add_many(new_vectors)
+            cached.update(new_vectors)
+
+        return np.vstack([cached[key] for key in keys])
+
+
+def cosine_assignments(doc_vectors: np.ndarray, topic_vectors: np.ndarray):
+    """
+    Назначение документов темам по косинусному сходству
+
+    Returns:
+        (индексы лучших тем, значения сходства)
+    """
+    doc_norm = doc_vectors / np.maximum(np.linalg.norm(doc_vectors, axis=1, keepdims=True), 1e-12)
+    topic_norm = topic_vectors / np.maximum(np.linalg.norm(topic_vectors, axis=1, keepdims=True), 1e-12)
+    similarity = doc_norm @ topic_norm.T
+    best = similarity.argmax(axis=1)
+    return best, similarity[np.arange(len(best)), best]
@@ -0,0 +1,148 @@
+import io
+from typing import Dict, List
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import TextDocument, compute_content_hash
+
+
+_ingestion_settings = getattr(settings, 'INGESTION_CONFIG', {})
+
+
+class DocumentIngestionService:
+    """
+    Массовое сохранение загруженных документов с дедупликацией по хешу содержимого.
+
+    Новые документы вставляются пачками через bulk_create (конфликт по
+    content_hash пропускается); очень большие загрузки в PostgreSQL идут
+    через COPY во временную таблицу и INSERT ... ON CONFLICT DO NOTHING.
+    Уже сохраненные ранее документы не дублируются: возвращаются
+    существующие строки, и сессии ссылаются на них.
+    """
+
+    COPY_COLUMNS = ('date', 'theme', 'text', 'created_at', 'content_hash')
+
+    def __init__(self, batch_size: int = None, copy_threshold: int = None):
+        """
+        Args:
+            batch_size: Документов в одном INSERT (bulk_create) и в одном запросе выборки
+            copy_threshold: Начиная с этого количества новых документов используется COPY
+                (None или 0 - COPY не используется)
+        """
+        self.batch_size = batch_size or _ingestion_settings.get('BATCH_SIZE', 1000)
+        self.copy_threshold = (
+            copy_threshold if copy_threshold is not None
+            else _ingestion_settings.get('COPY_THRESHOLD', 20000)
+        )
+
+    def ingest(self, documents_data: List[Dict]) -> List[TextDocument]:
+        """
+        Сохранение документов [{'date', 'theme', 'text'}, ...]
+
+        Returns:
+            TextDocument (с id) в порядке documents_data; одинаковые по
+            содержимому документы - один и тот же объект
+        """
+        hashes = [
+            compute_content_hash(doc_data['date'], doc_data['theme'], doc_data['text'])
+            for doc_data in documents_data
+        ]
+        if not hashes:
+            return []
+
+        # Первое вхождение каждого содержимого
+        unique = {}
+        for content_hash, doc_data in zip(hashes, documents_data):
+            unique.setdefault(content_hash, doc_data)
+
+        with transaction.atomic():
+            existing = self._fetch(list(unique))
+            new_documents = [
+                TextDocument(
+                    date=doc_data['date'],
+                    theme=doc_data['theme'],
+                    text=doc_data['text'],
+                    content_hash=content_hash
+                )
+                for content_hash, doc_data in unique.items() if content_hash not in existing
+            ]
+
+            if new_documents:
+                if self._use_copy(len(new_documents)):
+                    self._copy(new_documents)
+                else:
+                    TextDocument.objects.bulk_create(
+                        new_documents, batch_size=self.batch_size, ignore_conflicts=True
+                    )
+                # ID новых строк (и строк, вставленных параллельной загрузкой) - по хешу
+                existing.update(self._fetch([document.content_hash for document in new_documents]))
+
+        print(f"Ingested {len(hashes)} documents: {len(new_documents)} new, "
+              f"{len(unique) - len(new_documents)} already stored, {len(hashes) - len(unique)} repeated")
+        return [existing[content_hash] for content_hash in hashes]
+
+    def _fetch(self, hashes: List[str]) -> Dict[str, TextDocument]:
+        """Сохраненные документы по хешам, пачками по batch_size"""
+        found = {}
+        for start in range(0, len(hashes), self.batch_size):
+            found.update(TextDocument.objects.in_bulk(
+                hashes[start:start + self.batch_size], field_name='content_hash'
+            ))
+        return found
+
+    def _use_copy(self, count: int) -> bool:
+        return bool(self.copy_threshold) and count >= self.copy_threshold \
+            and connection.vendor == 'postgresql'
+
+    def _copy(self, documents: List[TextDocument]):
+        """
+        Загрузка через COPY FROM STDIN во временную таблицу и перенос
+        в основную одним INSERT с пропуском уже существующих хешей
+        """
+        table = connection.ops.quote_name(TextDocument._meta.db_table)
+        columns = ', '.join(self.COPY_COLUMNS)
+        now = timezone.now().isoformat()
+        rows = [
+            (str(document.date), document.theme, document.text, now, document.content_hash)
+            for document in documents
+        ]
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "CREATE TEMP TABLE ingest_documents "
+                "(date date, theme varchar(200), text text, created_at timestamptz, content_hash varchar(64)) "
+                "ON COMMIT DROP"
+            )
+            sql = f"COPY ingest_documents ({columns}) FROM STDIN"
+            raw_cursor = cursor.cursor
+            if hasattr(raw_cursor, 'copy'):
+                # psycopg 3
+                with raw_cursor.copy(sql) as copy:
+                    for row in rows:
+                        copy.write_row(row)
+            else:
+                # psycopg2
+                raw_cursor.copy_expert(sql, io.StringIO(''.join(self._copy_line(row) for row in rows)))
+            cursor.execute(
+                f"INSERT INTO {table} ({columns}) SELECT {columns} FROM ingest_documents "
+                f"ON CONFLICT (content_hash) DO NOTHING"
+            )
+            cursor.execute("DROP TABLE ingest_documents")
+        print(f"Copied {len(documents)} documents via COPY")
+
+    @staticmethod
+    def _copy_line(row) -> str:
+        """Строка текстового формата COPY с экранированием спецсимволов"""
+        def escape(value) -> str:
+            return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+                    .replace('\n', '\\n').replace('\r', '\\r'))
+        return '\t'.join(escape(value) for value in row) + '\n'
+
+
+def ingest_documents(documents_data: List[Dict]) -> List[TextDocument]:
+    """
+    Сохранение документов с настройками из settings.INGESTION_CONFIG
+    """
+    return DocumentIngestionService().ingest(documents_data)
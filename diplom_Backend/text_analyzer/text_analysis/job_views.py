@@ -0,0 +1,61 @@
+from rest_framework import viewsets, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from django.urls import reverse
+from .models import AnalysisJob
+from .serializers import AnalysisJobSerializer, AnalysisJobSubmitSerializer
+from .jobs import submit_job
+from .pagination import KeysetPagination
+
+
+class AnalysisJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    API фоновых задач анализа: постановка в очередь, статус и результат.
+    Анализ выполняет отдельный процесс run_worker.py, HTTP запрос не ждет его.
+    """
+    queryset = AnalysisJob.objects.all()
+    serializer_class = AnalysisJobSerializer
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        job_status = self.request.query_params.get('status')
+        if job_status:
+            queryset = queryset.filter(status=job_status)
+        return queryset
+
+    def create(self, request):
+        """
+        Постановка задачи: {"kind": "llm_topic_analysis", "params": {...}}.
+        Возвращает id задачи сразу, 202 Accepted.
+        """
+        serializer = AnalysisJobSubmitSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        job = submit_job(serializer.validated_data['kind'], serializer.validated_data['params'])
+        status_url = reverse('analysisjob-detail', args=[job.id])
+        return Response(
+            {
+                'job_id': job.id,
+                'status': job.status,
+                'status_url': request.build_absolute_uri(status_url),
+                'result_url': request.build_absolute_uri(reverse('analysisjob-result', args=[job.id]))
+            },
+            status=status.HTTP_202_ACCEPTED,
+            headers={'Location': status_url}
+        )
+
+    @action(detail=True, methods=['get'])
+    def result(self, request, pk=None):
+        """
+        Результат задачи в формате синхронного endpoint; пока задача
+        не завершена - 202 со статусом и прогрессом. Ошибка задачи - это
+        ее результат, а не сбой запроса: 200 со статусом failed и ошибкой
+        """
+        job = self.get_object()
+        if job.status == AnalysisJob.STATUS_DONE:
+            return Response(job.result)
+        if job.status == AnalysisJob.STATUS_FAILED:
+            return Response({'job_id': job.id, 'status': job.status, 'error': job.error})
+        return Response(AnalysisJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
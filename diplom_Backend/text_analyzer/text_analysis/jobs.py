@@ -0,0 +1,304 @@
+import json
+import os
+import socket
+import threading
+import time
+import traceback
+from datetime import timedelta
+from typing import Callable, Dict, Optional
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from .analysis_sessions import fail_stale_sessions
+from .models import AnalysisJob
+
+
+_jobs_settings = getattr(settings, 'JOBS_CONFIG', {})
+
+
+class JobError(Exception):
+    """Ошибка выполнения задачи, сообщение сохраняется в AnalysisJob.error"""
+
+
+class RetryableJobError(JobError):
+    """
+    Временный отказ (LLM перегружен, бэкенд недоступен): задача
+    возвращается в очередь и повторяется не раньше чем через retry_after секунд
+    """
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+# Ответы view, после которых задачу имеет смысл повторить позже
+RETRYABLE_STATUSES = {429, 502, 503, 504}
+
+
+def report_progress(job: AnalysisJob, progress: float, message: str = ''):
+    """
+    Обновление прогресса задачи (и сигнала, что обработчик жив)
+    без блокировки строки задачи
+    """
+    job.progress = progress
+    job.progress_message = message[:200]
+    AnalysisJob.objects.filter(pk=job.pk).update(
+        progress=progress,
+        progress_message=job.progress_message,
+        heartbeat_at=timezone.now()
+    )
+
+
+def _unwrap(response) -> Dict:
+    """
+    Данные ответа view; ответ с ошибкой превращается в JobError, временный
+    отказ (503 и т.п. или ответ с Retry-After) - в RetryableJobError.
+    Данные проходят через JSONRenderer, как и при HTTP ответе (numpy и т.п.)
+    """
+    data = json.loads(JSONRenderer().render(response.data))
+    if response.status_code >= 400:
+        message = data.get('error') if isinstance(data, dict) else None
+        message = message or json.dumps(data, ensure_ascii=False)
+        retry_after = response.get('Retry-After')
+        if response.status_code in RETRYABLE_STATUSES or retry_after is not None:
+            try:
+                retry_after = float(retry_after)
+            except (TypeError, ValueError):
+                retry_after = None
+            raise RetryableJobError(message, retry_after)
+        raise JobError(message)
+    return data
+
+
+def _validated(params: Dict) -> Dict:
+    from .serializers import AnalysisRequestSerializer
+
+    serializer = AnalysisRequestSerializer(data=params)
+    if not serializer.is_valid():
+        raise JobError(json.dumps(serializer.errors, ensure_ascii=False))
+    return serializer.validated_data
+
+
+def run_topic_analysis(job: AnalysisJob) -> Dict:
+    """Тематический анализ (TopicAnalysisView) в фоне"""
+    from .views import TopicAnalysisView
+
+    validated_data = _validated(job.params)
+    report_progress(job, 0.1, 'Анализ документов')
+    return _unwrap(TopicAnalysisView().perform_analysis(validated_data, job=job))
+
+
+def run_llm_topic_analysis(job: AnalysisJob) -> Dict:
+    """Тематический анализ с LLM (LLMTopicAnalysisView) в фоне"""
+    from .llm_views import LLMTopicAnalysisView
+
+    validated_data = _validated(job.params)
+    view = LLMTopicAnalysisView()
+    analyzer = view.build_analyzer(validated_data, job.params)
+    report_progress(job, 0.1, f'Анализ документов моделью {analyzer.model_name}')
+    return _unwrap(view.perform_llm_analysis(validated_data, analyzer, job=job))
+
+
+# Обработчики по типу задачи: handler(job) -> результат (dict)
+JOB_HANDLERS: Dict[str, Callable[[AnalysisJob], Dict]] = {
+    'topic_analysis': run_topic_analysis,
+    'llm_topic_analysis': run_llm_topic_analysis,
+}
+
+
+def submit_job(kind: str, params: Dict) -> AnalysisJob:
+    """
+    Постановка задачи в очередь
+    """
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    job = AnalysisJob.objects.create(kind=kind, params=params)
+    print(f"Job {job.id} queued: {kind}")
+    return job
+
+
+class JobWorker:
+    """
+    Обработчик очереди задач анализа.
+
+    Задача забирается запросом SELECT ... FOR UPDATE SKIP LOCKED в короткой
+    транзакции и помечается как выполняемая, поэтому несколько обработчиков
+    не берут одну задачу и не ждут друг друга. Сам анализ идет вне этой
+    транзакции; пока он идет, отдельный поток обновляет heartbeat задачи.
+    Задачи, обработчик которых перестал обновлять heartbeat
+    (процесс упал), возвращаются в очередь или, после max_attempts, завершаются ошибкой.
+    Так же, с паузой run_after, повторяются задачи, получившие временный отказ
+    (LLM перегружен); ошибки валидации завершают задачу сразу.
+    """
+
+    def __init__(self, worker_id: str = None, poll_interval: float = None,
+                 stale_after: float = None, max_attempts: int = None,
+                 handlers: Dict[str, Callable] = None):
+        """
+        Args:
+            worker_id: Имя обработчика (по умолчанию host:pid)
+            poll_interval: Пауза между опросами пустой очереди (сек)
+            stale_after: Через сколько секунд без heartbeat задача считается брошенной
+            max_attempts: Сколько раз задача может быть взята в работу
+            handlers: Обработчики по типу задачи
+        """
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.poll_interval = poll_interval or _jobs_settings.get('POLL_INTERVAL', 2)
+        self.stale_after = stale_after or _jobs_settings.get('STALE_AFTER', 1800)
+        self.max_attempts = max_attempts or _jobs_settings.get('MAX_ATTEMPTS', 2)
+        self.retry_delay = _jobs_settings.get('RETRY_DELAY', 30)
+        self.handlers = handlers or JOB_HANDLERS
+        self._stopped = False
+
+    def claim(self) -> Optional[AnalysisJob]:
+        """
+        Следующая задача из очереди, помеченная как выполняемая этим обработчиком
+        """
+        with transaction.atomic():
+            job = (
+                AnalysisJob.objects.select_for_update(skip_locked=True)
+                .filter(status=AnalysisJob.STATUS_QUEUED)
+                .filter(Q(run_after__isnull=True) | Q(run_after__lte=timezone.now()))
+                .order_by('created_at', 'id')
+                .first()
+            )
+            if job is None:
+                return None
+            now = timezone.now()
+            job.status = AnalysisJob.STATUS_RUNNING
+            job.worker = self.worker_id
+            job.attempts += 1
+            job.started_at = now
+            job.heartbeat_at = now
+            job.progress = 0.0
+            job.progress_message = 'Задача взята в работу'
+            job.save(update_fields=[
+                'status', 'worker', 'attempts', 'started_at', 'heartbeat_at',
+                'progress', 'progress_message'
+            ])
+        return job
+
+    def requeue_stale(self) -> int:
+        """
+        Возврат в очередь задач, обработчик которых не подает сигналов
+        """
+        # Сессии, анализ которых прервался вместе с обработчиком (до того,
+        # как задача вернется в очередь и получит новую сессию)
+        fail_stale_sessions(self.stale_after)
+        
+        deadline = timezone.now() - timedelta(seconds=self.stale_after)
+        recovered = 0
+        with transaction.atomic():
+            stale = (
+                AnalysisJob.objects.select_for_update(skip_locked=True)
+                .filter(status=AnalysisJob.STATUS_RUNNING, heartbeat_at__lt=deadline)
+            )
+            for job in stale:
+                if job.attempts >= self.max_attempts:
+                    job.status = AnalysisJob.STATUS_FAILED
+                    job.error = f'Обработчик {job.worker} не завершил задачу'
+                    job.finished_at = timezone.now()
+                else:
+                    job.status = AnalysisJob.STATUS_QUEUED
+                job.save(update_fields=['status', 'error', 'finished_at'])
+                recovered += 1
+        if recovered:
+            print(f"Recovered {recovered} stale jobs")
+        return recovered
+
+    def heartbeat(self, job: AnalysisJob, stopped: threading.Event):
+        """
+        Обновление heartbeat_at задачи каждые stale_after/3 секунд, пока
+        выполняется обработчик: долгий анализ (LLM, LDA) не считается брошенным
+        """
+        interval = self.stale_after / 3
+        try:
+            while not stopped.wait(interval):
+                try:
+                    AnalysisJob.objects.filter(
+                        pk=job.pk, worker=self.worker_id, attempts=job.attempts,
+                        status=AnalysisJob.STATUS_RUNNING
+                    ).update(heartbeat_at=timezone.now())
+                except Exception as e:
+                    print(f"Heartbeat of job {job.id} failed: {e}")
+        finally:
+            # У потока свое соединение с БД
+            connection.close()
+
+    def execute(self, job: AnalysisJob):
+        """
+        Выполнение задачи и сохранение результата или ошибки
+        """
+        print(f"Worker {self.worker_id} running job {job.id} ({job.kind})")
+        started = time.time()
+        fields = {'finished_at': None, 'heartbeat_at': None}
+        stopped = threading.Event()
+        heartbeat = threading.Thread(target=self.heartbeat, args=(job, stopped), daemon=True)
+        heartbeat.start()
+        try:
+            handler = self.handlers.get(job.kind)
+            if handler is None:
+                raise JobError(f'Неизвестный тип задачи: {job.kind}')
+            result = handler(job)
+            fields.update(
+                status=AnalysisJob.STATUS_DONE,
+                result=result,
+                session_id=result.get('session_id'),
+                progress=1.0,
+                progress_message='Готово'
+            )
+        except RetryableJobError as e:
+            if job.attempts < self.max_attempts:
+                delay = e.retry_after if e.retry_after is not None else self.retry_delay
+                fields.update(
+                    status=AnalysisJob.STATUS_QUEUED,
+                    error=str(e),
+                    run_after=timezone.now() + timedelta(seconds=delay),
+                    progress_message=f'Временный отказ, повтор через {delay:.0f} с'
+                )
+            else:
+                fields.update(status=AnalysisJob.STATUS_FAILED, error=str(e), progress_message='Ошибка')
+        except Exception as e:
+            if not isinstance(e, JobError):
+                traceback.print_exc()
+            fields.update(status=AnalysisJob.STATUS_FAILED, error=str(e), progress_message='Ошибка')
+        finally:
+            stopped.set()
+            heartbeat.join()
+
+        fields['heartbeat_at'] = timezone.now()
+        if fields['status'] != AnalysisJob.STATUS_QUEUED:
+            fields['finished_at'] = fields['heartbeat_at']
+        # Результат записывается, только если задачу не забрали как брошенную
+        AnalysisJob.objects.filter(pk=job.pk, worker=self.worker_id, attempts=job.attempts).update(**fields)
+        print(f"Job {job.id} {fields['status']} in {time.time() - started:.1f}s")
+
+    def run_once(self) -> bool:
+        """Выполнение одной задачи; False, если очередь пуста"""
+        close_old_connections()
+        job = self.claim()
+        if job is None:
+            return False
+        self.execute(job)
+        return True
+
+    def run(self, once: bool = False):
+        """
+        Цикл обработки очереди (once - выполнить доступные задачи и выйти)
+        """
+        print(f"Job worker {self.worker_id} started")
+        while not self._stopped:
+            self.requeue_stale()
+            if self.run_once():
+                continue
+            if once:
+                break
+            time.sleep(self.poll_interval)
+        print(f"Job worker {self.worker_id} stopped")
+
+    def stop(self):
+        self._stopped = True
@@ -0,0 +1,67 @@
+import re
+from bisect import bisect_left
+from typing import List, Dict, Set, Iterable, Tuple
+import numpy as np
+
+
+class KeywordIndex:
+    """
+    Инвертированный индекс токен -> номера документов с этим токеном,
+    строится один раз на запрос по текстам в нижнем регистре
+    """
+
+    def __init__(self, texts: Iterable[str]):
+        self.postings: Dict[str, Set[int]] = {}
+        self.size = 0
+
+        for idx, text in enumerate(texts):
+            for token in set(re.findall(r'\w+', text.lower())):
+                self.postings.setdefault(token, set()).add(idx)
+            self.size = idx + 1
+
+        self._vocabulary = sorted(self.postings)
+        self._prefix_cache: Dict[str, Set[int]] = {}
+
+    def _documents_with_prefix(self, prefix: str) -> Set[int]:
+        """
+        Документы с токенами, начинающимися с prefix
+        (ключевые слова часто являются основами: "технолог", "финанс")
+        """
+        if prefix in self._prefix_cache:
+            return self._prefix_cache[prefix]
+
+        docs = set()
+        position = bisect_left(self._vocabulary, prefix)
+        while position < len(self._vocabulary) and self._vocabulary[position].startswith(prefix):
+            docs.update(self.postings[self._vocabulary[position]])
+            position += 1
+
+        self._prefix_cache[prefix] = docs
+        return docs
+
+    def documents_with(self, keyword: str) -> Set[int]:
+        """
+        Документы, содержащие все слова ключевой фразы (пересечение списков вхождений)
+        """
+        words = re.findall(r'\w+', keyword.lower())
+        if not words:
+            return set()
+
+        result = None
+        for word in words:
+            docs = self._documents_with_prefix(word)
+            result = set(docs) if result is None else result & docs
+            if not result:
+                break
+        return result
+
+    def score(self, weighted_terms: List[Tuple[str, float]]) -> np.ndarray:
+        """
+        Оценка документов: сумма весов ключевых фраз, встречающихся в документе
+        """
+        scores = np.zeros(self.size)
+        for term, weight in weighted_terms:
+            docs = self.documents_with(term)
+            if docs:
+                scores[list(docs)] += weight
+        return scores
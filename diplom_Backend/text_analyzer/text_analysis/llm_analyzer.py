@@ -12,6 +12,20 @@ import hashlib
 import pickle
 import os
 from pathlib import Path
+from .near_duplicates import NearDuplicateDetector
+from .keyword_index import KeywordIndex
+from .embeddings import OllamaEmbedder, cosine_assignments
+from .llm_pool import get_backend_pool
+from .llm_scheduler import LLMScheduler, LLMOverloadedError, get_scheduler
+from .llm_routing import ModelRouter
+from .llm_schemas import (
+    TASK_SCHEMAS, TASK_ARRAY_KEYS, IncrementalArrayParser,
+    extract_json, find_invalid_items, missing_fields, repair_schema
+)
+from .llm_coalescing import SingleFlight, CacheFileLock
+
+# Одинаковые параллельные запросы к LLM внутри процесса выполняются один раз
+_llm_single_flight = SingleFlight()
 
 class LLMProvider(Enum):
     OLLAMA = "ollama"
@@ -39,6 +53,8 @@ class Topic:
     documents: List[Document]
     confidence: float
     category: str = "general"
+    # Уверенность отнесения каждого документа (по порядку documents), если известна
+    document_confidences: Optional[List[float]] = None
     
     def to_dict(self):
         return {
@@ -49,7 +65,8 @@ class Topic:
             "document_count": len(self.documents),
             "confidence": self.confidence,
             "category": self.category,
-            "document_indices": [doc.id for doc in self.documents]
+            "document_indices": [doc.id for doc in self.documents],
+            "document_confidences": self.document_confidences
         }
 
 class LLMTopicAnalyzer:
@@ -61,7 +78,22 @@ class LLMTopicAnalyzer:
                  provider: LLMProvider = LLMProvider.OLLAMA,
                  model_name: str = "mistral",
                  ollama_url: str = "http://localhost:11434",
-                 cache_dir: str = ".llm_cache"):
+                 cache_dir: str = ".llm_cache",
+                 collapse_duplicates: bool = True,
+                 duplicate_threshold: float = 0.85,
+                 assignment_mode: str = "llm",
+                 embedding_model: str = "nomic-embed-text",
+                 timeout: float = 120,
+                 max_retries: int = 3,
+                 temperature: float = 0.3,
+                 num_predict: int = 4000,
+                 keep_alive: Optional[str] = None,
+                 request_deadline: float = 180,
+                 failure_threshold: int = 3,
+                 reset_timeout: float = 30,
+                 backends: Optional[List[Dict]] = None,
+                 priority: str = "bulk",
+                 scheduler: Optional[LLMScheduler] = None):
         """
         Инициализация анализатора
         
@@ -70,12 +102,49 @@ class LLMTopicAnalyzer:
             model_name: Название модели
             ollama_url: URL для Ollama API
             cache_dir: Директория для кэша
+            collapse_duplicates: Отправлять в LLM только одного представителя группы почти одинаковых документов
+            duplicate_threshold: Порог сходства для объединения документов в группу
+            assignment_mode: Распределение документов по темам: "llm" (ID от модели и ключевые слова)
+                или "embedding" (косинусное сходство эмбеддингов)
+            embedding_model: Модель Ollama для эмбеддингов
+            timeout: Таймаут одной попытки вызова LLM (сек)
+            max_retries: Количество попыток вызова LLM
+            temperature: Температура генерации
+            num_predict: Максимальное количество генерируемых токенов
+            keep_alive: Сколько Ollama держит модель в памяти после запроса ("30m", "-1");
+                None - значение по умолчанию Ollama
+            request_deadline: Общий лимит времени на все попытки одного вызова (сек)
+            failure_threshold: Количество подряд неудачных вызовов до размыкания цепи
+            reset_timeout: Пауза перед пробой недоступного бэкенда (сек)
+            backends: Пул экземпляров Ollama [{'URL', 'MAX_CONCURRENCY', 'MODELS'}]
+                (по умолчанию - один ollama_url без ограничения)
+            priority: Класс приоритета вызовов в планировщике: "interactive", "report" или "bulk"
+            scheduler: Планировщик вызовов LLM (по умолчанию - общий для процесса)
         """
         self.provider = provider
         self.model_name = model_name
         self.ollama_url = ollama_url
         self.cache_dir = Path(cache_dir)
         self.cache_dir.mkdir(exist_ok=True)
+        self.collapse_duplicates = collapse_duplicates
+        self.duplicate_detector = NearDuplicateDetector(threshold=duplicate_threshold)
+        self.assignment_mode = assignment_mode
+        self.embedding_model = embedding_model
+        self._embedder = None
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.temperature = temperature
+        self.num_predict = num_predict
+        self.keep_alive = keep_alive
+        self.routing = None
+        self.request_deadline = request_deadline
+        self.pool = get_backend_pool(
+            backends or [{'URL': ollama_url}],
+            failure_threshold=failure_threshold,
+            reset_timeout=reset_timeout
+        )
+        self.priority = priority
+        self.scheduler = scheduler or get_scheduler()
         
         # Промпты для разных задач
         self.prompts = {
@@ -161,6 +230,112 @@ class LLMTopicAnalyzer:
   "confidence": 0.88
 }}""",
             
+            "batch_document_analysis": """Проанализируй каждый из документов и определи его основную тему.
+
+Документы:
+{documents}
+
+Задачи для каждого документа:
+1. Определи основную тему документа (1-2 слова)
+2. Дай краткое описание темы
+3. Укажи 3-5 ключевых слов
+4. Оцени уверенность (0-1)
+
+Формат ответа в JSON (по одному элементу на каждый документ, ID документа как в списке):
+{{
+  "results": [
+    {{
+      "document_id": "ID документа",
+      "main_topic": "Название темы",
+      "topic_description": "Описание",
+      "keywords": ["слово1", "слово2", ...],
+      "confidence": 0.88
+    }}
+  ]
+}}
+
+Ответ только в формате JSON, без дополнительного текста.""",
+            
+            "cluster_naming": """Ты - эксперт по анализу текстов. Ниже описан кластер документов, найденный автоматически.
+
+Ключевые слова кластера: {keywords}
+Количество документов: {count}
+
+Характерные фрагменты документов:
+{excerpts}
+
+Задачи:
+1. Придумай лаконичное и информативное название темы
+2. Дай описание темы (1-2 предложения)
+
+Формат ответа в JSON:
+{{
+  "name": "Название темы",
+  "description": "Описание темы"
+}}
+
+Ответ только в формате JSON, без дополнительного текста.""",
+            
+            "partial_summary": """Кратко опиши, что происходило по теме за период.
+
+Тема: {topic_name}
+Ключевые слова: {keywords}
+Период: {period}
+Документы ({count} шт.):
+
+{documents_summary}
+
+Ответ: 3-5 предложений о главных событиях и фактах периода, без заголовков.""",
+            
+            "summary_reduce": """Сформируй подробную справку по теме за указанный период на основе кратких сводок по отдельным промежуткам.
+
+Тема: {topic_name}
+Описание: {topic_description}
+Период: {start_date} - {end_date}
+Ключевые слова: {keywords}
+Всего документов: {count}
+
+Сводки по промежуткам:
+
+{partial_summaries}
+
+Задачи:
+1. Сформируй аналитическую справку по теме
+2. Выдели основные тренды и закономерности
+3. Укажи ключевые события и изменения
+4. Дай рекомендации или выводы
+
+Формат ответа (развернутый текст):
+# Аналитическая справка по теме: {topic_name}
+
+## Основные тренды
+...
+
+## Ключевые события
+...
+
+## Анализ динамики
+...
+
+## Выводы и рекомендации
+...""",
+            
+            "field_repair": """Ты - эксперт по анализу текстов. В ответе на задачу "{task}" у некоторых элементов не хватает полей.
+
+Элементы (номер: имеющиеся данные - недостающие поля):
+{items}
+
+Заполни только недостающие поля каждого элемента, опираясь на имеющиеся данные.
+
+Формат ответа в JSON:
+{{
+  "items": [
+    {{"index": 0, "недостающее_поле": "значение"}}
+  ]
+}}
+
+Ответ только в формате JSON, без дополнительного текста.""",
+            
             "summary_generation": """Сформируй подробную справку по теме за указанный период.
 
 Тема: {topic_name}
@@ -200,6 +375,11 @@ class LLMTopicAnalyzer:
             content += f"_{doc.id}_{hashlib.md5(doc.text.encode()).hexdigest()[:10]}"
         return hashlib.md5(content.encode()).hexdigest()
     
+    def _get_prompt_cache_key(self, task: str, prompt: str) -> str:
+        """Ключ кэша по полному тексту промпта"""
+        content = f"{task}_{self.model_name}_{prompt}"
+        return hashlib.md5(content.encode()).hexdigest()
+    
     def _load_from_cache(self, cache_key: str) -> Optional[Dict]:
         """Загрузка из кэша"""
         cache_file = self.cache_dir / f"{cache_key}.pkl"
@@ -209,44 +389,96 @@ class LLMTopicAnalyzer:
         return None
     
     def _save_to_cache(self, cache_key: str, data: Dict):
-        """Сохранение в кэш"""
+        """Сохранение в кэш (атомарно, чтобы другие процессы не прочитали недописанный файл)"""
         cache_file = self.cache_dir / f"{cache_key}.pkl"
-        with open(cache_file, 'wb') as f:
+        tmp_file = self.cache_dir / f"{cache_key}.{os.getpid()}.tmp"
+        with open(tmp_file, 'wb') as f:
             pickle.dump(data, f)
+        os.replace(tmp_file, cache_file)
     
-    async def _call_llm_async(self, prompt: str, max_retries: int = 3) -> Optional[str]:
+    def _run_cached(self, cache_key: str, compute, use_cache: bool = True):
+        """
+        Выполнение работы не более одного раза на все процессы: результат берется
+        из кэша, а вычисление защищено файловой блокировкой рядом с кэшем.
+        
+        compute() возвращает (результат, можно_ли_кэшировать).
+        """
+        if not use_cache:
+            return compute()[0]
+        
+        cached = self._load_from_cache(cache_key)
+        if cached:
+            print("Using cached results")
+            return cached
+        
+        cache_file = self.cache_dir / f"{cache_key}.pkl"
+        lock = CacheFileLock(self.cache_dir / f"{cache_key}.lock")
+        lock.acquire(timeout=self.request_deadline, ready=cache_file.exists)
+        try:
+            # Пока ждали блокировку, результат мог записать другой процесс
+            cached = self._load_from_cache(cache_key)
+            if cached:
+                print("Using cached results")
+                return cached
+            
+            result, cacheable = compute()
+            if cacheable:
+                self._save_to_cache(cache_key, result)
+            return result
+        finally:
+            lock.release()
+    
+    def _build_payload(self, prompt: str, schema: Optional[Dict] = None) -> Dict:
+        """
+        Тело запроса к Ollama /api/generate; schema - JSON схема ответа (поле format)
+        """
+        payload = {
+            "model": self.model_name,
+            "prompt": prompt,
+            "stream": False,
+            "options": {
+                "temperature": self.temperature,
+                "top_p": 0.9,
+                "top_k": 40,
+                "num_predict": self.num_predict
+            }
+        }
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        if schema is not None:
+            payload["format"] = schema
+        return payload
+    
+    async def _call_llm_async(self, prompt: str, max_retries: Optional[int] = None,
+                              schema: Optional[Dict] = None) -> Optional[str]:
         """
         Асинхронный вызов LLM через Ollama API
+        
+        Вызов ждет слот планировщика в своем классе приоритета; каждая попытка
+        уходит на наименее загруженный доступный бэкенд пула (повтор - по
+        возможности на другой). Если у всех бэкендов модели цепь разомкнута,
+        сразу возвращает None (вызывающий код переходит к фолбэку). Ожидание
+        в очереди и все попытки укладываются в request_deadline.
+        
+        Raises:
+            LLMOverloadedError: очередь класса приоритета переполнена
         """
         if self.provider == LLMProvider.OLLAMA:
-            url = f"{self.ollama_url}/api/generate"
-            payload = {
-                "model": self.model_name,
-                "prompt": prompt,
-                "stream": False,
-                "options": {
-                    "temperature": 0.3,
-                    "top_p": 0.9,
-                    "top_k": 40,
-                    "num_predict": 4000
-                }
-            }
+            payload = self._build_payload(prompt, schema)
             
-            for attempt in range(max_retries):
-                try:
-                    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=120)) as session:
-                        async with session.post(url, json=payload) as response:
-                            if response.status == 200:
-                                result = await response.json()
-                                return result.get("response", "")
-                            else:
-                                print(f"Attempt {attempt + 1} failed: {response.status}")
-                                await asyncio.sleep(2 ** attempt)  # Exponential backoff
-                except Exception as e:
-                    print(f"Attempt {attempt + 1} error: {e}")
-                    await asyncio.sleep(2 ** attempt)
+            if not self.pool.is_available(self.model_name):
+                print(f"No LLM backend available for {self.model_name}, skipping call")
+                return None
             
-            return None
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + self.request_deadline
+            
+            if not await self.scheduler.acquire_async(self.priority, timeout=self.request_deadline):
+                return None
+            try:
+                return await self._call_ollama_async(payload, deadline, max_retries or self.max_retries)
+            finally:
+                self.scheduler.release(self.priority)
         
         elif self.provider == LLMProvider.YANDEX_GPT:
             # Реализация для Yandex GPT API
@@ -256,15 +488,80 @@ class LLMTopicAnalyzer:
         else:
             raise ValueError(f"Unsupported provider: {self.provider}")
     
-    def _call_llm_sync(self, prompt: str) -> Optional[str]:
+    async def _call_ollama_async(self, payload: Dict, deadline: float, max_retries: int) -> Optional[str]:
+        """
+        Попытки вызова Ollama /api/generate с повтором до дедлайна (время цикла событий)
+        """
+        loop = asyncio.get_running_loop()
+        previous = None
+        
+        for attempt in range(max_retries):
+            backend = await self.pool.acquire_async(
+                self.model_name, timeout=max(0.0, deadline - loop.time()), exclude=previous
+            )
+            if backend is None:
+                print(f"No LLM backend available for {self.model_name}, skipping call")
+                break
+            previous = backend
+            
+            remaining = deadline - loop.time()
+            try:
+                if remaining <= 0:
+                    print("LLM request deadline exceeded")
+                    break
+                timeout = aiohttp.ClientTimeout(total=min(self.timeout, remaining))
+                async with aiohttp.ClientSession(timeout=timeout) as session:
+                    async with session.post(f"{backend.url}/api/generate", json=payload) as response:
+                        if response.status == 200:
+                            result = await response.json()
+                            backend.health.record_success()
+                            return result.get("response", "")
+                        else:
+                            print(f"Attempt {attempt + 1} on {backend.url} failed: {response.status}")
+                            # 4xx - ошибка запроса, а не признак недоступности бэкенда
+                            if response.status >= 500:
+                                backend.health.record_failure(f"HTTP {response.status}")
+            except Exception as e:
+                print(f"Attempt {attempt + 1} on {backend.url} error: {e}")
+                backend.health.record_failure(str(e) or type(e).__name__)
+            finally:
+                self.pool.release(backend)
+            
+            # Цепь разомкнута на всех бэкендах модели - дальнейшие попытки бессмысленны
+            if not self.pool.is_available(self.model_name):
+                break
+            
+            # Exponential backoff, если он укладывается в дедлайн
+            backoff = 2 ** attempt
+            if attempt + 1 >= max_retries or loop.time() + backoff >= deadline:
+                break
+            await asyncio.sleep(backoff)
+        
+        return None
+    
+    def _call_llm_sync(self, prompt: str, schema: Optional[Dict] = None) -> Optional[str]:
         """
         Синхронный вызов LLM (обертка для асинхронного)
+        
+        Одновременные вызовы с одинаковым промптом и параметрами
+        объединяются: запрос к LLM выполняет только первый из них.
         """
-        try:
-            return asyncio.run(self._call_llm_async(prompt))
-        except Exception as e:
-            print(f"Error calling LLM: {e}")
-            return None
+        payload = self._build_payload(prompt, schema)
+        request_key = hashlib.sha256(
+            f"{self.ollama_url}|{json.dumps(payload, sort_keys=True, ensure_ascii=False)}".encode()
+        ).hexdigest()
+        
+        def call():
+            try:
+                return asyncio.run(self._call_llm_async(prompt, schema=schema))
+            except LLMOverloadedError:
+                # Отказ планировщика передается в view (ответ 503)
+                raise
+            except Exception as e:
+                print(f"Error calling LLM: {e}")
+                return None
+        
+        return _llm_single_flight.do(request_key, call)
     
     def _parse_llm_response(self, response: str) -> Dict:
         """
@@ -273,18 +570,70 @@ class LLMTopicAnalyzer:
         if not response:
             return {}
         
-        # Ищем JSON в ответе
-        json_match = re.search(r'\{.*\}', response, re.DOTALL)
-        if json_match:
-            try:
-                return json.loads(json_match.group())
-            except json.JSONDecodeError as e:
-                print(f"Error parsing JSON: {e}")
-                print(f"Raw response: {response[:500]}...")
+        data = extract_json(response)
+        if data is not None:
+            return data
         
         # Если JSON не найден, пытаемся извлечь структурированные данные
+        print(f"No JSON in LLM response: {response[:500]}...")
         return self._extract_structured_data(response)
     
+    def _call_llm_json(self, task: str, prompt: str) -> Optional[Dict]:
+        """
+        Вызов LLM с JSON схемой задачи (Ollama format) и проверкой ответа.
+        Элементы с недостающими полями дополняются коротким дозапросом
+        только этих полей, без повторной отправки документов.
+        
+        Returns:
+            Разобранный ответ или None, если LLM недоступен
+        """
+        response = self._call_llm_sync(prompt, TASK_SCHEMAS[task])
+        if not response:
+            return None
+        
+        data = self._parse_llm_response(response)
+        return self._repair_missing_fields(task, data)
+    
+    def _repair_missing_fields(self, task: str, data: Dict, max_items: int = 20) -> Dict:
+        """
+        Дозапрос недостающих полей у элементов ответа, не прошедших проверку схемы
+        """
+        invalid = find_invalid_items(data, task)[:max_items]
+        if not invalid:
+            return data
+        
+        array_key = TASK_ARRAY_KEYS.get(task)
+        items = data[array_key] if array_key else [data]
+        lines = []
+        fields = []
+        for index, item_fields in invalid:
+            item = items[index if index is not None else 0]
+            # Длинные списки ID документов модели для дозаполнения не нужны
+            known = {k: v for k, v in item.items() if k != "document_ids" and k not in item_fields}
+            lines.append(f"{index or 0}: {json.dumps(known, ensure_ascii=False)} - {', '.join(item_fields)}")
+            fields.extend(f for f in item_fields if f not in fields)
+        
+        print(f"Re-asking LLM for missing fields {fields} in {len(invalid)} items of {task}")
+        prompt = self.prompts["field_repair"].format(task=task, items="\n".join(lines))
+        response = self._call_llm_sync(prompt, repair_schema(task, fields))
+        repaired = extract_json(response) if response else None
+        if not repaired:
+            return data
+        
+        item_schema = TASK_SCHEMAS[task]["properties"][array_key]["items"] if array_key else TASK_SCHEMAS[task]
+        requested = {index or 0: item_fields for index, item_fields in invalid}
+        for patch in repaired.get("items", []):
+            if not isinstance(patch, dict) or patch.get("index") not in requested:
+                continue
+            item = items[patch["index"]]
+            for field in requested[patch["index"]]:
+                # Поле принимается, только если оно прошло проверку типа
+                if field in patch and not missing_fields({field: patch[field]}, {
+                    "properties": item_schema["properties"], "required": [field]
+                }):
+                    item[field] = patch[field]
+        return data
+    
     def _extract_structured_data(self, text: str) -> Dict:
         """
         Извлечение структурированных данных из текстового ответа
@@ -345,47 +694,283 @@ class LLMTopicAnalyzer:
         if not documents:
             return {"topics": [], "metadata": {"total_documents": 0}}
         
-        # Проверка кэша
         cache_key = self._get_cache_key(documents, "topic_extraction")
-        if use_cache:
-            cached = self._load_from_cache(cache_key)
-            if cached:
-                print("Using cached results")
-                return cached
+        return self._run_cached(
+            cache_key, lambda: self._analyze_topics_uncached(documents), use_cache
+        )
+    
+    def _prepare_topic_extraction(self, documents: List[Document]):
+        """
+        Группы почти одинаковых документов, их представители и промпт выделения тем
+        """
+        # Схлопываем почти одинаковые документы, в LLM уходят только представители групп
+        groups = self._group_near_duplicates(documents)
+        representatives = [documents[group[0]] for group in groups]
         
         # Подготовка промпта
-        formatted_docs = self._prepare_documents_for_prompt(documents)
+        formatted_docs = self._prepare_documents_for_prompt(representatives)
         prompt = self.prompts["topic_extraction"].format(documents=formatted_docs)
+        return groups, representatives, prompt
+    
+    def _analyze_topics_uncached(self, documents: List[Document]):
+        """
+        Анализ тем без кэша; возвращает (результат, получен_ли_он_от_LLM)
+        """
+        groups, representatives, prompt = self._prepare_topic_extraction(documents)
         
-        print(f"Analyzing {len(documents)} documents with LLM...")
+        print(f"Analyzing {len(representatives)} unique of {len(documents)} documents with LLM...")
         print(f"Using model: {self.model_name}")
         
-        # Вызов LLM
-        response = self._call_llm_sync(prompt)
+        # Вызов LLM с JSON схемой ответа
+        result = self._call_llm_json("topic_extraction", prompt)
         
-        if not response:
+        if result is None:
             print("LLM call failed, using fallback")
-            return self._fallback_analysis(documents)
+            return self._fallback_analysis(documents), False
         
-        # Парсинг ответа
-        result = self._parse_llm_response(response)
+        # Обогащение результата и возврат дубликатов в темы представителей
+        enriched_result = self._enrich_analysis_result(result, representatives)
+        enriched_result = self._expand_duplicate_groups(enriched_result, documents, groups)
         
-        # Обогащение результата
-        enriched_result = self._enrich_analysis_result(result, documents)
+        return enriched_result, True
+    
+    def stream_topics(self, documents: List[Document], use_cache: bool = True):
+        """
+        Потоковый анализ тем: генератор событий ("topic", тема) по мере того,
+        как модель заканчивает очередную тему, и итоговое ("result", результат)
+        в формате analyze_topics. Если поток оборвался после отправки тем,
+        перед темами фолбэк анализа отдается ("reset", причина) - ранее
+        отправленные темы клиент должен отбросить.
+        """
+        if not documents:
+            yield "result", {"topics": [], "metadata": {"total_documents": 0}}
+            return
         
-        # Сохранение в кэш
+        cache_key = self._get_cache_key(documents, "topic_extraction")
         if use_cache:
-            self._save_to_cache(cache_key, enriched_result)
+            cached = self._load_from_cache(cache_key)
+            if cached is not None:
+                for topic in cached["topics"]:
+                    yield "topic", self._topic_preview(topic)
+                yield "result", cached
+                return
+        
+        groups, representatives, prompt = self._prepare_topic_extraction(documents)
+        print(f"Streaming topic analysis of {len(representatives)} unique of {len(documents)} documents")
+        
+        parser = IncrementalArrayParser("topics")
+        item_schema = TASK_SCHEMAS["topic_extraction"]["properties"]["topics"]["items"]
+        stream_state = {}
+        topics = []
+        sent = 0
+        for chunk in self._stream_llm_sync(prompt, stream_state, TASK_SCHEMAS["topic_extraction"]):
+            for topic in parser.feed(chunk):
+                topics.append(topic)
+                # Неполные темы отдаются после дозапроса недостающих полей
+                if not missing_fields(topic, item_schema):
+                    sent += 1
+                    yield "topic", topic
+        
+        if not stream_state.get("done"):
+            print("LLM stream failed, using fallback")
+            if sent:
+                yield "reset", {"reason": "Генерация тем прервана, темы определены по ключевым словам"}
+            result = self._fallback_analysis(documents)
+            for topic in result["topics"]:
+                yield "topic", self._topic_preview(topic)
+            yield "result", result
+            return
+        
+        if not topics:
+            # Ответ не в ожидаемом виде - разбираем его целиком
+            topics = self._parse_llm_response(parser.text).get("topics", [])
+            incomplete = list(range(len(topics)))
+        else:
+            incomplete = [i for i, topic in enumerate(topics) if missing_fields(topic, item_schema)]
+        
+        data = self._repair_missing_fields("topic_extraction", {"topics": topics})
+        for i in incomplete:
+            yield "topic", data["topics"][i]
+        
+        result = self._enrich_analysis_result(data, representatives)
+        result = self._expand_duplicate_groups(result, documents, groups)
+        if use_cache:
+            self._save_to_cache(cache_key, result)
+        yield "result", result
+    
+    @staticmethod
+    def _topic_preview(topic: Dict) -> Dict:
+        """Тема итогового результата в виде темы из ответа модели"""
+        return {
+            "name": topic["topic_name"],
+            "description": topic.get("description", ""),
+            "keywords": topic.get("keywords", []),
+            "confidence": topic.get("confidence", 0.7)
+        }
+    
+    def refine_topics(self, existing_topics: List[Dict], new_documents: List[Document],
+                      use_cache: bool = True) -> Dict:
+        """
+        Инкрементальное уточнение тем: в LLM уходят только новые документы
+        и компактный список существующих тем (id, название, ключевые слова).
+        
+        Args:
+            existing_topics: [{"id": ..., "name": ..., "keywords": [...]}, ...]
+            new_documents: Новые документы
+        
+        Returns:
+            {"updated_topics": [...], "unassigned_document_ids": [...], "metadata": {...}},
+            document_ids тем содержат только ID новых документов
+        """
+        if not new_documents:
+            return {"updated_topics": [], "unassigned_document_ids": [], "metadata": {"new_documents": 0}}
+        
+        compact_topics = "\n".join(
+            f"ID {topic['id']}: {topic['name']} (ключевые слова: {', '.join(topic.get('keywords', [])[:5])})"
+            for topic in existing_topics
+        ) or "Нет"
+        prompt = self.prompts["topic_refinement"].format(
+            existing_topics=compact_topics,
+            new_documents=self._prepare_documents_for_prompt(new_documents)
+        )
+        
+        def compute():
+            response = self._call_llm_json("topic_refinement", prompt)
+            if response is None:
+                print("LLM call failed, assigning new documents by keywords")
+                return self._build_refinement_delta([], existing_topics, new_documents), False
+            updated = response.get("updated_topics", [])
+            return self._build_refinement_delta(updated, existing_topics, new_documents), True
+        
+        cache_key = self._get_prompt_cache_key("topic_refinement", prompt)
+        return self._run_cached(cache_key, compute, use_cache)
+    
+    def _build_refinement_delta(self, updated_topics: List[Dict], existing_topics: List[Dict],
+                                new_documents: List[Document]) -> Dict:
+        """
+        Нормализация ответа уточнения; документы, которые LLM не распределил,
+        относятся к темам по ключевым словам
+        """
+        new_ids = {doc.id for doc in new_documents}
+        existing_ids = {str(topic["id"]) for topic in existing_topics}
+        
+        topics = []
+        assigned = set()
+        for topic_data in updated_topics:
+            if not isinstance(topic_data, dict) or not topic_data.get("name"):
+                continue
+            document_ids = [
+                str(doc_id) for doc_id in topic_data.get("document_ids", [])
+                if str(doc_id) in new_ids and str(doc_id) not in assigned
+            ]
+            assigned.update(document_ids)
+            topic_id = str(topic_data.get("id", ""))
+            topics.append({
+                "id": topic_id if topic_id in existing_ids else None,
+                "name": topic_data["name"],
+                "description": topic_data.get("description", ""),
+                "keywords": topic_data.get("keywords", []),
+                "confidence": topic_data.get("confidence", 0.7),
+                "document_ids": document_ids
+            })
+        
+        # Существующие темы, которые LLM не вернул, тоже могут получить новые документы
+        returned_ids = {topic["id"] for topic in topics}
+        for topic in existing_topics:
+            if str(topic["id"]) not in returned_ids:
+                topics.append({
+                    "id": str(topic["id"]),
+                    "name": topic["name"],
+                    "description": "",
+                    "keywords": topic.get("keywords", []),
+                    "confidence": topic.get("confidence", 0.7),
+                    "document_ids": [],
+                    "unchanged": True
+                })
+        
+        unassigned = [doc for doc in new_documents if doc.id not in assigned]
+        if unassigned and topics:
+            index = KeywordIndex(doc.text for doc in unassigned)
+            scores = np.vstack([
+                index.score([(keyword, 1) for keyword in topic["keywords"]])
+                for topic in topics
+            ])
+            best_topics = scores.argmax(axis=0)
+            best_scores = scores.max(axis=0)
+            for doc_idx, doc in enumerate(unassigned):
+                if best_scores[doc_idx] > 0:
+                    topics[best_topics[doc_idx]]["document_ids"].append(doc.id)
+                    assigned.add(doc.id)
         
-        return enriched_result
+        # Темы без изменений и без новых документов в дельту не попадают
+        topics = [t for t in topics if not (t.pop("unchanged", False) and not t["document_ids"])]
+        
+        return {
+            "updated_topics": topics,
+            "unassigned_document_ids": [doc.id for doc in new_documents if doc.id not in assigned],
+            "metadata": {
+                "new_documents": len(new_documents),
+                "model_used": self.model_name,
+                "timestamp": datetime.now().isoformat()
+            }
+        }
+    
+    def _group_near_duplicates(self, documents: List[Document]) -> List[List[int]]:
+        """
+        Группировка почти одинаковых документов (первый индекс группы - представитель)
+        """
+        if not self.collapse_duplicates or len(documents) < 2:
+            return [[i] for i in range(len(documents))]
+        
+        groups = self.duplicate_detector.group([doc.text for doc in documents])
+        if len(groups) < len(documents):
+            print(f"Collapsed {len(documents) - len(groups)} near-duplicate documents")
+        return groups
+    
+    def _expand_duplicate_groups(self, result: Dict, documents: List[Document],
+                                 groups: List[List[int]]) -> Dict:
+        """
+        Распространение тем представителей на все документы их групп
+        """
+        members = {
+            documents[group[0]].id: [documents[idx].id for idx in group]
+            for group in groups
+        }
+        
+        for topic in result["topics"]:
+            expanded = []
+            expanded_confidences = []
+            confidences = topic.get("document_confidences") or [None] * len(topic["document_indices"])
+            for doc_id, confidence in zip(topic["document_indices"], confidences):
+                group_ids = members.get(doc_id, [doc_id])
+                expanded.extend(group_ids)
+                expanded_confidences.extend([confidence] * len(group_ids))
+            topic["document_indices"] = expanded
+            if topic.get("document_confidences"):
+                topic["document_confidences"] = expanded_confidences
+            topic["document_count"] = len(expanded)
+        
+        result["metadata"]["total_documents"] = len(documents)
+        result["metadata"]["unique_documents"] = len(groups)
+        result["metadata"]["duplicates_collapsed"] = len(documents) - len(groups)
+        return result
     
     def _enrich_analysis_result(self, llm_result: Dict, documents: List[Document]) -> Dict:
         """
         Обогащение результата анализа
         """
+        if self.assignment_mode == "embedding":
+            result = self._assign_by_embeddings(llm_result, documents)
+            if result is not None:
+                return result
+            print("Embedding assignment failed, using LLM document IDs")
+        
         # Создаем словарь документов по ID
         doc_dict = {doc.id: doc for doc in documents}
         
+        # Индекс ключевых слов строится один раз и только при необходимости
+        index = None
+        
         topics = []
         for i, topic_data in enumerate(llm_result.get("topics", [])):
             # Получаем документы для темы
@@ -404,10 +989,12 @@ class LLMTopicAnalyzer:
             
             # Если нет документов, пытаемся определить по ключевым словам
             if not topic_docs and "keywords" in topic_data:
-                for doc in documents:
-                    doc_text = doc.text.lower()
-                    if any(keyword.lower() in doc_text for keyword in topic_data["keywords"][:3]):
-                        topic_docs.append(doc)
+                if index is None:
+                    index = KeywordIndex(doc.text for doc in documents)
+                matched = set()
+                for keyword in topic_data["keywords"][:3]:
+                    matched |= index.documents_with(keyword)
+                topic_docs = [documents[idx] for idx in sorted(matched)]
             
             # Создаем объект Topic
             topic = Topic(
@@ -423,21 +1010,76 @@ class LLMTopicAnalyzer:
         
         # Если LLM не распределил документы, делаем это сами
         if not any(t.documents for t in topics):
-            topics = self._distribute_documents_to_topics(topics, documents)
+            topics = self._distribute_documents_to_topics(topics, documents, index)
         
-        # Форматируем результат
-        result = {
+        return self._format_topics_result(topics, documents)
+    
+    def _format_topics_result(self, topics: List[Topic], documents: List[Document]) -> Dict:
+        """
+        Форматирование результата анализа
+        """
+        return {
             "topics": [topic.to_dict() for topic in topics],
             "metadata": {
                 "total_documents": len(documents),
                 "topics_discovered": len(topics),
                 "model_used": self.model_name,
                 "provider": self.provider.value,
+                "assignment_mode": self.assignment_mode,
                 "timestamp": datetime.now().isoformat()
             }
         }
+    
+    @property
+    def embedder(self) -> OllamaEmbedder:
+        if self._embedder is None:
+            self._embedder = OllamaEmbedder(
+                pool=self.pool,
+                scheduler=self.scheduler,
+                model_name=self.embedding_model,
+                cache_dir=str(self.cache_dir),
+                priority=self.priority,
+                request_deadline=self.request_deadline
+            )
+        return self._embedder
+    
+    def _assign_by_embeddings(self, llm_result: Dict, documents: List[Document]) -> Optional[Dict]:
+        """
+        Распределение документов по темам через косинусное сходство эмбеддингов
+        документов и описаний тем (ID документов из ответа LLM не используются)
+        """
+        topics_data = llm_result.get("topics", [])
+        if not topics_data or not documents:
+            return None
         
-        return result
+        topic_texts = [
+            f"{topic_data.get('name', '')}. {topic_data.get('description', '')}. "
+            f"Ключевые слова: {', '.join(topic_data.get('keywords', []))}"
+            for topic_data in topics_data
+        ]
+        
+        doc_vectors = self.embedder.embed([doc.text for doc in documents])
+        topic_vectors = self.embedder.embed(topic_texts)
+        if doc_vectors is None or topic_vectors is None:
+            return None
+        
+        best_topics, best_scores = cosine_assignments(doc_vectors, topic_vectors)
+        
+        topics = []
+        for i, topic_data in enumerate(topics_data):
+            members = [j for j, best in enumerate(best_topics) if best == i]
+            topics.append(Topic(
+                id=i + 1,
+                name=topic_data.get("name", f"Тема {i + 1}"),
+                description=topic_data.get("description", ""),
+                keywords=topic_data.get("keywords", []),
+                documents=[documents[j] for j in members],
+                confidence=topic_data.get("confidence", 0.7),
+                category=self._categorize_topic(topic_data),
+                document_confidences=[round(float(best_scores[j]), 4) for j in members]
+            ))
+        
+        return self._format_topics_result(topics, documents)
     
     def _categorize_topic(self, topic_data: Dict) -> str:
         """Категоризация темы"""
@@ -463,7 +1105,8 @@ class LLMTopicAnalyzer:
         
         return "general"
     
-    def _distribute_documents_to_topics(self, topics: List[Topic], documents: List[Document]) -> List[Topic]:
+    def _distribute_documents_to_topics(self, topics: List[Topic], documents: List[Document],
+                                        index: Optional[KeywordIndex] = None) -> List[Topic]:
         """
         Распределение документов по темам на основе ключевых слов
         """
@@ -471,31 +1114,26 @@ class LLMTopicAnalyzer:
         for topic in topics:
             topic.documents = []
         
+        if index is None:
+            index = KeywordIndex(doc.text for doc in documents)
+        
+        # Матрица оценок темы x документы: ключевое слово +1, слово названия темы +2
+        scores = np.zeros((len(topics), len(documents)))
+        for i, topic in enumerate(topics):
+            weighted_terms = [(keyword, 1) for keyword in topic.keywords]
+            weighted_terms += [
+                (word, 2) for word in re.findall(r'\w+', topic.name.lower()) if len(word) > 3
+            ]
+            scores[i] = index.score(weighted_terms)
+        
+        best_topics = scores.argmax(axis=0) if len(topics) else np.zeros(len(documents), dtype=int)
+        best_scores = scores.max(axis=0) if len(topics) else np.zeros(len(documents))
+        
         # Распределяем каждый документ
-        for doc in documents:
-            doc_text = doc.text.lower()
-            best_topic = None
-            best_score = 0
-            
-            for topic in topics:
-                score = 0
-                # Оцениваем по ключевым словам
-                for keyword in topic.keywords:
-                    if keyword.lower() in doc_text:
-                        score += 1
-                
-                # Оцениваем по названию темы
-                for word in topic.name.lower().split():
-                    if word in doc_text and len(word) > 3:
-                        score += 2
-                
-                if score > best_score:
-                    best_score = score
-                    best_topic = topic
-            
+        for doc_idx, doc in enumerate(documents):
             # Если нашли подходящую тему, добавляем документ
-            if best_topic and best_score > 0:
-                best_topic.documents.append(doc)
+            if best_scores[doc_idx] > 0:
+                topics[best_topics[doc_idx]].documents.append(doc)
             else:
                 # Создаем новую тему для неклассифицированных документов
                 unclassified_topic = next((t for t in topics if t.name == "Другое"), None)
@@ -536,14 +1174,14 @@ class LLMTopicAnalyzer:
         word_counts = Counter(all_keywords)
         common_themes = word_counts.most_common(5)
         
+        # Индекс документов для поиска по тематическим словам
+        index = KeywordIndex(doc.text for doc in documents)
+        
         # Создаем темы
         topics = []
         for i, (theme_word, _) in enumerate(common_themes):
             # Находим документы с этим словом
-            theme_docs = []
-            for doc in documents:
-                if theme_word in doc.text.lower():
-                    theme_docs.append(doc)
+            theme_docs = [documents[idx] for idx in sorted(index.documents_with(theme_word))]
             
             if theme_docs:
                 topic = Topic(
@@ -597,9 +1235,8 @@ class LLMTopicAnalyzer:
             doc_id=document.id
         )
         
-        response = self._call_llm_sync(prompt)
-        if response:
-            result = self._parse_llm_response(response)
+        result = self._call_llm_json("single_document_analysis", prompt)
+        if result is not None:
             result["document_id"] = document.id
             return result
         
@@ -611,10 +1248,10 @@ class LLMTopicAnalyzer:
             "confidence": 0.0
         }
     
-    def generate_summary(self, topic: Dict, documents: List[Document], 
-                         start_date: str, end_date: str) -> str:
+    def _build_summary_prompt(self, topic: Dict, documents: List[Document],
+                              start_date: str, end_date: str):
         """
-        Генерация аналитической справки по теме
+        Промпт для справки по теме; возвращает (промпт, документы периода)
         """
         # Фильтруем документы по дате
         filtered_docs = []
@@ -637,16 +1274,219 @@ class LLMTopicAnalyzer:
             count=len(filtered_docs),
             documents_summary="\n".join(docs_summary)
         )
+        return prompt, filtered_docs
+    
+    @staticmethod
+    def _clean_summary(response: str) -> str:
+        """Очистка ответа от лишнего форматирования"""
+        clean_response = re.sub(r'^```(json|markdown)?\s*', '', response, flags=re.MULTILINE)
+        clean_response = re.sub(r'\s*```$', '', clean_response, flags=re.MULTILINE)
+        return clean_response.strip()
+    
+    def _get_document_cache_key(self, document: Document) -> str:
+        """Ключ кэша анализа документа по хешу его содержимого"""
+        content = f"single_document_analysis_{self.model_name}_{document.date}_{document.theme}_{document.text}"
+        return hashlib.md5(content.encode()).hexdigest()
+    
+    def _classify_batch(self, documents: List[Document]) -> Dict[str, Dict]:
+        """
+        Один вызов LLM на пакет документов; возвращает только прошедшие проверку результаты
+        """
+        formatted_docs = "\n\n".join(
+            f"Документ (ID: {doc.id}, Дата: {doc.date}, Тема: {doc.theme}):\n{doc.text[:1000]}"
+            for doc in documents
+        )
+        prompt = self.prompts["batch_document_analysis"].format(documents=formatted_docs)
+        response = self._call_llm_json("batch_document_analysis", prompt)
+        if response is None:
+            return {}
+        
+        batch_ids = {doc.id for doc in documents}
+        results = {}
+        for item in response.get("results", []):
+            if not isinstance(item, dict):
+                continue
+            doc_id = str(item.get("document_id", ""))
+            main_topic = item.get("main_topic")
+            if doc_id not in batch_ids or not isinstance(main_topic, str) or not main_topic.strip():
+                continue
+            
+            keywords = item.get("keywords", [])
+            try:
+                confidence = min(max(float(item.get("confidence", 0.7)), 0.0), 1.0)
+            except (TypeError, ValueError):
+                confidence = 0.7
+            
+            results[doc_id] = {
+                "document_id": doc_id,
+                "main_topic": main_topic.strip(),
+                "topic_description": str(item.get("topic_description", "")),
+                "keywords": [str(k) for k in keywords] if isinstance(keywords, list) else [],
+                "confidence": confidence
+            }
+        return results
+    
+    def analyze_documents_batch(self, documents: List[Document], batch_size: int = 10,
+                                use_cache: bool = True) -> List[Dict]:
+        """
+        Анализ документов пакетами по batch_size штук в одном промпте.
+        Документы, для которых ответ не разобрался, запрашиваются повторно
+        отдельным пакетом; результаты кэшируются по хешу содержимого документа.
         
-        response = self._call_llm_sync(prompt)
-        if response:
-            # Очищаем ответ от лишнего форматирования
-            clean_response = re.sub(r'^```(json|markdown)?\s*', '', response, flags=re.MULTILINE)
-            clean_response = re.sub(r'\s*```$', '', clean_response, flags=re.MULTILINE)
-            return clean_response.strip()
+        Returns:
+            Результаты в порядке входных документов (формат analyze_single_document)
+        """
+        results = {}
+        pending = []
+        for doc in documents:
+            cached = self._load_from_cache(self._get_document_cache_key(doc)) if use_cache else None
+            if cached:
+                results[doc.id] = dict(cached, document_id=doc.id)
+            else:
+                pending.append(doc)
         
-        # Фолбэк справка
-        return self._generate_fallback_summary(topic, filtered_docs, start_date, end_date)
+        if pending:
+            print(f"Classifying {len(pending)} documents in batches of {batch_size} "
+                  f"({len(documents) - len(pending)} cached)")
+        
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            parsed = self._classify_batch(batch)
+            
+            # Переспрашиваем только документы, результат для которых не получен
+            missing = [doc for doc in batch if doc.id not in parsed]
+            if missing and self.pool.is_available(self.model_name):
+                print(f"Re-asking for {len(missing)} documents")
+                parsed.update(self._classify_batch(missing))
+            
+            for doc in batch:
+                if doc.id in parsed:
+                    results[doc.id] = parsed[doc.id]
+                    if use_cache:
+                        self._save_to_cache(self._get_document_cache_key(doc), parsed[doc.id])
+                else:
+                    results[doc.id] = {
+                        "document_id": doc.id,
+                        "main_topic": doc.theme,
+                        "topic_description": "Анализ не выполнен",
+                        "keywords": [],
+                        "confidence": 0.0
+                    }
+        
+        return [results[doc.id] for doc in documents]
+    
+    def generate_summary(self, topic: Dict, documents: List[Document], 
+                         start_date: str, end_date: str, use_cache: bool = True) -> str:
+        """
+        Генерация аналитической справки по теме
+        """
+        prompt, filtered_docs = self._build_summary_prompt(topic, documents, start_date, end_date)
+        
+        def compute():
+            response = self._call_llm_sync(prompt)
+            if response:
+                return self._clean_summary(response), True
+            
+            # Фолбэк справка
+            return self._generate_fallback_summary(topic, filtered_docs, start_date, end_date), False
+        
+        cache_key = self._get_prompt_cache_key("summary_generation", prompt)
+        return self._run_cached(cache_key, compute, use_cache)
+    
+    def stream_summary(self, topic: Dict, documents: List[Document],
+                       start_date: str, end_date: str, use_cache: bool = True,
+                       state: Optional[Dict] = None):
+        """
+        Потоковая генерация справки: генератор фрагментов текста по мере
+        их генерации моделью. Готовый текст сохраняется в кэш результатов.
+        state["done"] = True, если справка выдана полностью; False - генерация
+        оборвалась и выданный текст неполный.
+        """
+        stream_state = state if state is not None else {}
+        stream_state["done"] = False
+        prompt, filtered_docs = self._build_summary_prompt(topic, documents, start_date, end_date)
+        cache_key = self._get_prompt_cache_key("summary_generation", prompt)
+        
+        if use_cache:
+            cached = self._load_from_cache(cache_key)
+            if cached:
+                print("Using cached results")
+                yield cached
+                stream_state["done"] = True
+                return
+        
+        chunks = []
+        for chunk in self._stream_llm_sync(prompt, stream_state):
+            chunks.append(chunk)
+            yield chunk
+        
+        if not chunks:
+            # Модель недоступна - отдаем фолбэк справку целиком
+            yield self._generate_fallback_summary(topic, filtered_docs, start_date, end_date)
+            stream_state["done"] = True
+            return
+        
+        # Оборванный ответ в кэш не попадает
+        if use_cache and stream_state["done"]:
+            self._save_to_cache(cache_key, self._clean_summary("".join(chunks)))
+    
+    def _stream_llm_sync(self, prompt: str, state: Optional[Dict] = None,
+                         schema: Optional[Dict] = None):
+        """
+        Потоковый вызов Ollama (stream=True): генератор фрагментов ответа.
+        Не выдает ничего, если бэкенд недоступен; обрывается при ошибке.
+        По завершении генерации выставляет state["done"] = True.
+        """
+        state = state if state is not None else {}
+        if self.provider != LLMProvider.OLLAMA:
+            raise ValueError(f"Unsupported provider for streaming: {self.provider}")
+        
+        if not self.pool.is_available(self.model_name):
+            print(f"No LLM backend available for {self.model_name}, skipping call")
+            return
+        
+        async def acquire():
+            if not await self.scheduler.acquire_async(self.priority, timeout=self.request_deadline):
+                return None
+            backend = await self.pool.acquire_async(self.model_name, timeout=self.request_deadline)
+            if backend is None:
+                self.scheduler.release(self.priority)
+            return backend
+        
+        backend = asyncio.run(acquire())
+        if backend is None:
+            print(f"No LLM backend available for {self.model_name}, skipping call")
+            return
+        
+        payload = self._build_payload(prompt, schema)
+        payload["stream"] = True
+        
+        try:
+            # Таймаут чтения действует между фрагментами, а не на весь ответ
+            with requests.post(f"{backend.url}/api/generate", json=payload,
+                               stream=True, timeout=(5, self.timeout)) as response:
+                if response.status_code != 200:
+                    print(f"Streaming request failed: {response.status_code}")
+                    if response.status_code >= 500:
+                        backend.health.record_failure(f"HTTP {response.status_code}")
+                    return
+                
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    data = json.loads(line)
+                    if data.get("response"):
+                        yield data["response"]
+                    if data.get("done"):
+                        state["done"] = True
+                        break
+            backend.health.record_success()
+        except (requests.RequestException, json.JSONDecodeError) as e:
+            print(f"Streaming error: {e}")
+            backend.health.record_failure(str(e) or type(e).__name__)
+        finally:
+            self.pool.release(backend)
+            self.scheduler.release(self.priority)
     
     def _generate_fallback_summary(self, topic: Dict, documents: List[Document],
                                    start_date: str, end_date: str) -> str:
@@ -696,7 +1536,7 @@ class LLMTopicAnalyzer:
                 formatted_docs = self._prepare_documents_for_prompt(batch)
                 prompt = self.prompts["topic_extraction"].format(documents=formatted_docs)
                 
-                response = await self._call_llm_async(prompt)
+                response = await self._call_llm_async(prompt, schema=TASK_SCHEMAS["topic_extraction"])
                 if response:
                     result = self._parse_llm_response(response)
                     if "topics" in result:
@@ -731,14 +1571,67 @@ class LLMTopicAnalyzer:
 def create_llm_analyzer(
     provider: str = "ollama",
     model: str = "mistral",
-    ollama_url: str = "http://localhost:11434"
+    ollama_url: str = "http://localhost:11434",
+    collapse_duplicates: bool = True,
+    duplicate_threshold: float = 0.85,
+    assignment_mode: str = "llm",
+    embedding_model: str = "nomic-embed-text",
+    timeout: float = 120,
+    max_retries: int = 3,
+    temperature: float = 0.3,
+    num_predict: int = 4000,
+    keep_alive: Optional[str] = None,
+    request_deadline: float = 180,
+    failure_threshold: int = 3,
+    reset_timeout: float = 30,
+    backends: Optional[List[Dict]] = None,
+    priority: str = "bulk",
+    scheduler: Optional[LLMScheduler] = None,
+    router: Optional[ModelRouter] = None,
+    task: Optional[str] = None,
+    texts: Optional[List[str]] = None
 ) -> LLMTopicAnalyzer:
     """
     Создание анализатора с настройками
+    
+    Если передан router и task, модель и num_predict выбираются политикой
+    маршрутизации по задаче, объему texts и загрузке бэкендов; решение
+    сохраняется в analyzer.routing.
     """
     provider_enum = LLMProvider(provider.lower())
-    return LLMTopicAnalyzer(
+    analyzer = LLMTopicAnalyzer(
         provider=provider_enum,
         model_name=model,
-        ollama_url=ollama_url
-    )
\ No newline at end of file
+        ollama_url=ollama_url,
+        collapse_duplicates=collapse_duplicates,
+        duplicate_threshold=duplicate_threshold,
+        assignment_mode=assignment_mode,
+        embedding_model=embedding_model,
+        timeout=timeout,
+        max_retries=max_retries,
+        temperature=temperature,
+        num_predict=num_predict,
+        keep_alive=keep_alive,
+        request_deadline=request_deadline,
+        failure_threshold=failure_threshold,
+        reset_timeout=reset_timeout,
+        backends=backends,
+        priority=priority,
+        scheduler=scheduler
+    )
+    
+    if router is not None and task:
+        route = router.route(task, texts or [], analyzer.pool, analyzer.scheduler)
+        print(f"Model routing for {task}: {route.model} ({route.reason}, ~{route.estimated_tokens} tokens)")
+        analyzer.model_name = route.model
+        analyzer.num_predict = route.num_predict
+        analyzer.routing = route.to_dict()
+    elif task:
+        analyzer.routing = {
+            "task": task,
+            "model": model,
+            "num_predict": num_predict,
+            "reason": "fixed model"
+        }
+    
+    return analyzer
\ No newline at end of file
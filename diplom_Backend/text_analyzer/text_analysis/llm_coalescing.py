@@ -0,0 +1,92 @@
+import os
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Callable, Dict, Any
+
+
+class SingleFlight:
+    """
+    Объединение одинаковых параллельных вызовов внутри процесса:
+    первый вызов выполняет работу, остальные ждут его результат
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            future = self._calls.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = Future()
+                self._calls[key] = future
+
+        if not is_leader:
+            print(f"Waiting for identical in-flight request {key[:8]}")
+            return future.result()
+
+        try:
+            result = fn()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+
+class CacheFileLock:
+    """
+    Межпроцессная блокировка записи в файловый кэш результатов.
+    Файл блокировки создается атомарно (O_EXCL); зависшая блокировка
+    умершего процесса снимается по возрасту.
+    """
+
+    def __init__(self, path: Path, stale_after: float = 600, poll_interval: float = 0.5):
+        self.path = Path(path)
+        self.stale_after = stale_after
+        self.poll_interval = poll_interval
+        self.acquired = False
+
+    def _try_acquire(self) -> bool:
+        try:
+            fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                if time.time() - self.path.stat().st_mtime > self.stale_after:
+                    self.path.unlink()
+            except FileNotFoundError:
+                pass
+            return False
+        with os.fdopen(fd, 'w') as f:
+            f.write(str(os.getpid()))
+        self.acquired = True
+        return True
+
+    def acquire(self, timeout: float, ready: Callable[[], bool] = lambda: False) -> bool:
+        """
+        Захват блокировки. Ожидание прекращается раньше, если ready() сообщает,
+        что другой процесс уже записал результат.
+
+        Returns:
+            True, если блокировка получена
+        """
+        deadline = time.monotonic() + timeout
+        while not self._try_acquire():
+            if ready() or time.monotonic() >= deadline:
+                return False
+            time.sleep(self.poll_interval)
+        return True
+
+    def release(self):
+        if self.acquired:
+            try:
+                self.path.unlink()
+            except FileNotFoundError:
+                pass
+            self.acquired = False
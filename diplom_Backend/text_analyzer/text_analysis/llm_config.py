@@ -0,0 +1,56 @@
+from django.conf import settings
+
+
+_llm_settings = getattr(settings, 'LLM_CONFIG', {})
+
+
+class LLMConfig:
+    """
+    Настройки LLM анализатора из settings.LLM_CONFIG
+    """
+    PROVIDER = _llm_settings.get('PROVIDER', 'ollama')
+    MODEL_NAME = _llm_settings.get('MODEL_NAME', 'mistral')
+    OLLAMA_URL = _llm_settings.get('OLLAMA_URL', 'http://localhost:11434')
+    USE_CACHE = _llm_settings.get('USE_CACHE', True)
+    CACHE_DIR = _llm_settings.get('CACHE_DIR', '.llm_cache')
+    TIMEOUT = _llm_settings.get('TIMEOUT', 120)
+    MAX_RETRIES = _llm_settings.get('MAX_RETRIES', 3)
+    TEMPERATURE = _llm_settings.get('TEMPERATURE', 0.3)
+    MAX_TOKENS = _llm_settings.get('MAX_TOKENS', 4000)
+
+    # Распределение документов по темам: 'llm' или 'embedding'
+    ASSIGNMENT_MODE = _llm_settings.get('ASSIGNMENT_MODE', 'llm')
+    EMBEDDING_MODEL = _llm_settings.get('EMBEDDING_MODEL', 'nomic-embed-text')
+
+    # Общий лимит времени на все попытки одного вызова LLM (сек)
+    REQUEST_DEADLINE = _llm_settings.get('REQUEST_DEADLINE', 180)
+    # Circuit breaker: размыкание после N неудач подряд, проба бэкенда через RESET_TIMEOUT сек
+    CIRCUIT_FAILURE_THRESHOLD = _llm_settings.get('CIRCUIT_FAILURE_THRESHOLD', 3)
+    CIRCUIT_RESET_TIMEOUT = _llm_settings.get('CIRCUIT_RESET_TIMEOUT', 30)
+
+    # Количество документов в одном промпте пакетной классификации
+    CLASSIFICATION_BATCH_SIZE = _llm_settings.get('CLASSIFICATION_BATCH_SIZE', 10)
+
+    # Способ выделения тем: 'llm' - документы целиком в LLM,
+    # 'clusters' - локальная кластеризация + названия тем от LLM
+    TOPIC_ENGINE = _llm_settings.get('TOPIC_ENGINE', 'llm')
+
+    # Справки по периоду из кэшированных сводок: 'day', 'week' или 'none'
+    SUMMARY_GRANULARITY = _llm_settings.get('SUMMARY_GRANULARITY', 'day')
+
+    # Пул экземпляров Ollama: [{'URL': ..., 'MAX_CONCURRENCY': ..., 'MODELS': [...]}],
+    # пустой список - один OLLAMA_URL без ограничения параллельности
+    BACKENDS = _llm_settings.get('BACKENDS', [])
+
+    # Планировщик вызовов LLM: общий лимит, квоты и длина очередей по классам
+    # приоритета ('interactive', 'report', 'bulk'); при переполнении очереди - 503
+    SCHEDULER = _llm_settings.get('SCHEDULER', {})
+    OVERLOAD_RETRY_AFTER = _llm_settings.get('OVERLOAD_RETRY_AFTER', 5)
+
+    # Выбор модели и num_predict по задаче, объему входа и загрузке бэкендов
+    MODEL_ROUTING = _llm_settings.get('MODEL_ROUTING', {})
+
+    # Сколько Ollama держит модель в памяти после запроса (None - по умолчанию Ollama, 5 минут)
+    KEEP_ALIVE = _llm_settings.get('KEEP_ALIVE')
+    # Прогрев моделей при старте сервера и периодическое продление keep_alive
+    WARMUP = _llm_settings.get('WARMUP', {})
@@ -0,0 +1,117 @@
+import threading
+import time
+from enum import Enum
+from typing import Dict
+
+import aiohttp
+
+
+class CircuitState(Enum):
+    CLOSED = "closed"        # Бэкенд работает, запросы проходят
+    OPEN = "open"            # Бэкенд недоступен, запросы сразу уходят в фолбэк
+    HALF_OPEN = "half_open"  # Проба прошла, пропускаем пробный запрос
+
+
+class BackendHealth:
+    """
+    Состояние LLM бэкенда с автоматическим выключателем (circuit breaker).
+    Общий для всех анализаторов процесса, работающих с одним URL.
+    """
+
+    def __init__(self, url: str, failure_threshold: int = 3,
+                 reset_timeout: float = 30, probe_timeout: float = 2):
+        """
+        Args:
+            url: Базовый URL бэкенда
+            failure_threshold: Количество подряд неудачных вызовов до размыкания
+            reset_timeout: Через сколько секунд после размыкания пробовать бэкенд снова
+            probe_timeout: Таймаут пробного запроса к /api/tags
+        """
+        self.url = url
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.probe_timeout = probe_timeout
+
+        self.state = CircuitState.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.last_error = ""
+        self._probing = False
+        self._lock = threading.Lock()
+
+    async def _probe_async(self) -> bool:
+        """Легкая проверка доступности через /api/tags"""
+        try:
+            timeout = aiohttp.ClientTimeout(total=self.probe_timeout)
+            async with aiohttp.ClientSession(timeout=timeout) as session:
+                async with session.get(f"{self.url}/api/tags") as response:
+                    return response.status == 200
+        except Exception as e:
+            print(f"Health probe for {self.url} failed: {e}")
+            return False
+
+    async def allow_request_async(self) -> bool:
+        """
+        Можно ли сейчас обращаться к бэкенду. При разомкнутой цепи после
+        reset_timeout выполняется одна проба, остальные вызовы сразу получают отказ.
+        """
+        with self._lock:
+            if self.state != CircuitState.OPEN:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_timeout or self._probing:
+                return False
+            self._probing = True
+
+        healthy = await self._probe_async()
+
+        with self._lock:
+            self._probing = False
+            if healthy:
+                self.state = CircuitState.HALF_OPEN
+            else:
+                self.opened_at = time.monotonic()
+        return healthy
+
+    def is_open(self) -> bool:
+        with self._lock:
+            return self.state == CircuitState.OPEN
+
+    def record_success(self):
+        with self._lock:
+            self.state = CircuitState.CLOSED
+            self.consecutive_failures = 0
+            self.last_error = ""
+
+    def record_failure(self, error: str = ""):
+        with self._lock:
+            self.consecutive_failures += 1
+            self.last_error = error
+            if (self.state == CircuitState.HALF_OPEN or
+                    self.consecutive_failures >= self.failure_threshold):
+                if self.state != CircuitState.OPEN:
+                    print(f"Circuit for {self.url} opened after {self.consecutive_failures} failures")
+                self.state = CircuitState.OPEN
+                self.opened_at = time.monotonic()
+
+    def status(self) -> Dict:
+        with self._lock:
+            return {
+                "url": self.url,
+                "state": self.state.value,
+                "consecutive_failures": self.consecutive_failures,
+                "last_error": self.last_error
+            }
+
+
+_backends: Dict[str, BackendHealth] = {}
+_backends_lock = threading.Lock()
+
+
+def get_backend_health(url: str, **kwargs) -> BackendHealth:
+    """
+    Общий для процесса трекер состояния бэкенда по URL
+    """
+    with _backends_lock:
+        if url not in _backends:
+            _backends[url] = BackendHealth(url, **kwargs)
+        return _backends[url]
@@ -0,0 +1,154 @@
+import numpy as np
+from typing import List, Dict, Tuple
+
+from .llm_analyzer import LLMTopicAnalyzer, Document, Topic
+from .text_processor import HybridTopicAnalyzer
+
+
+class LLMClusterTopicAnalyzer:
+    """
+    Гибридный анализ: темы находит локальная кластеризация (NMF по TF-IDF),
+    а LLM только дает им названия и описания по ключевым словам и
+    нескольким характерным фрагментам. Стоимость LLM зависит от числа тем,
+    а не от размера корпуса.
+    """
+
+    def __init__(self, llm_analyzer: LLMTopicAnalyzer, n_topics: int = None,
+                 max_topics: int = 10, n_keywords: int = 10,
+                 n_excerpts: int = 3, excerpt_length: int = 300):
+        """
+        Args:
+            llm_analyzer: LLM анализатор для именования тем
+            n_topics: Количество тем (None - подбирается автоматически)
+            max_topics: Максимальное количество тем при автоподборе
+            n_keywords: Количество ключевых слов темы
+            n_excerpts: Количество фрагментов документов в промпте темы
+            excerpt_length: Длина фрагмента в символах
+        """
+        self.llm = llm_analyzer
+        self.local = HybridTopicAnalyzer()
+        self.n_topics = n_topics
+        self.max_topics = max_topics
+        self.n_keywords = n_keywords
+        self.n_excerpts = n_excerpts
+        self.excerpt_length = excerpt_length
+
+    @property
+    def model_name(self) -> str:
+        return self.llm.model_name
+
+    @property
+    def routing(self):
+        return self.llm.routing
+
+    def analyze_topics(self, documents: List[Document], use_cache: bool = True) -> Dict:
+        """
+        Кластеризация корпуса и именование кластеров через LLM
+        """
+        if not documents:
+            return {"topics": [], "metadata": {"total_documents": 0}}
+
+        try:
+            clusters, weights = self._cluster(documents)
+        except ValueError as e:
+            # Слишком маленький корпус для TF-IDF/NMF - отправляем документы в LLM целиком
+            print(f"Local clustering failed ({e}), using LLM topic extraction")
+            return self.llm.analyze_topics(documents, use_cache)
+
+        topics = []
+        llm_named = 0
+        for cluster in clusters:
+            naming = self._name_cluster(cluster, documents, use_cache)
+            llm_named += int(bool(naming))
+
+            topic_data = {
+                "name": naming.get("name") or cluster["topic_name"],
+                "description": naming.get("description", ""),
+                "keywords": cluster["keywords"]
+            }
+            topics.append(Topic(
+                id=len(topics) + 1,
+                name=topic_data["name"],
+                description=topic_data["description"],
+                keywords=topic_data["keywords"],
+                documents=[documents[idx] for idx in cluster["document_indices"]],
+                confidence=round(float(np.mean(cluster["confidences"])), 3),
+                category=self.llm._categorize_topic(topic_data),
+                document_confidences=[round(float(c), 4) for c in cluster["confidences"]]
+            ))
+
+        result = self.llm._format_topics_result(topics, documents)
+        # Доли тем NMF каждого документа по столбцам topics (для сохранения распределения)
+        weights = weights[:, [cluster["column"] for cluster in clusters]]
+        totals = weights.sum(axis=1, keepdims=True)
+        result["document_topic_weights"] = np.divide(
+            weights, totals, out=np.zeros_like(weights), where=totals > 0
+        )
+        result["metadata"]["engine"] = "local_clustering+llm_naming"
+        result["metadata"]["llm_named_topics"] = llm_named
+        return result
+
+    def _cluster(self, documents: List[Document]) -> Tuple[List[Dict], np.ndarray]:
+        """
+        Локальная кластеризация: NMF темы с ключевыми словами и документами.
+        Возвращает (кластеры, веса NMF документы x темы, нормированные по строкам).
+        Уверенность отнесения документа - доля основной темы в его весах, [0, 1].
+        """
+        corpus = self.local.prepare_corpus([doc.text for doc in documents], use_cache=False)
+        X = corpus['X']
+
+        n_topics = self.n_topics or self.local.find_optimal_topics(X, self.max_topics)
+        model = self.local.train_nmf(X, n_topics)
+        topic_keywords = self.local.extract_topic_keywords(
+            model, corpus['feature_names'], self.n_keywords, model_type='nmf'
+        )
+        assignments = self.local.assign_documents_to_topics(model, X, 'nmf')
+
+        # Веса NMF не ограничены сверху: строки нормируются в доли тем документа
+        weights = np.array([a['topic_distribution'] for a in assignments], dtype=np.float32)
+        totals = weights.sum(axis=1, keepdims=True)
+        weights = np.divide(weights, totals, out=np.zeros_like(weights), where=totals > 0)
+
+        clusters = []
+        for topic_info in topic_keywords:
+            column = topic_info['topic_id']
+            rows = [row for row, a in enumerate(assignments) if a['dominant_topic'] == column]
+            if not rows:
+                continue
+            # Самые уверенно отнесенные документы идут первыми (характерные фрагменты)
+            rows.sort(key=lambda row: weights[row, column], reverse=True)
+            clusters.append({
+                "topic_name": topic_info['topic_name'],
+                "keywords": topic_info['keywords'],
+                "document_indices": [assignments[row]['document_index'] for row in rows],
+                "confidences": [float(weights[row, column]) for row in rows],
+                "column": column
+            })
+
+        clusters.sort(key=lambda c: len(c["document_indices"]), reverse=True)
+        return clusters, weights
+
+    def _name_cluster(self, cluster: Dict, documents: List[Document], use_cache: bool):
+        """
+        Короткий промпт на кластер; возвращает название и описание от LLM
+        (пустой словарь, если LLM недоступен)
+        """
+        excerpts = []
+        for i, idx in enumerate(cluster["document_indices"][:self.n_excerpts], 1):
+            text = documents[idx].text
+            excerpt = text[:self.excerpt_length] + "..." if len(text) > self.excerpt_length else text
+            excerpts.append(f"{i}. {excerpt}")
+
+        prompt = self.llm.prompts["cluster_naming"].format(
+            keywords=", ".join(cluster["keywords"]),
+            count=len(cluster["document_indices"]),
+            excerpts="\n".join(excerpts)
+        )
+
+        def compute():
+            naming = self.llm._call_llm_json("cluster_naming", prompt) or {}
+            valid = isinstance(naming.get("name"), str) and bool(naming["name"].strip())
+            return (naming if valid else {}), valid
+
+        cache_key = self.llm._get_prompt_cache_key("cluster_naming", prompt)
+        return self.llm._run_cached(cache_key, compute, use_cache)
@@ -0,0 +1,184 @@
+import asyncio
+import threading
+from typing import Dict, List, Optional
+
+from .llm_health import BackendHealth, get_backend_health
+
+
+class LLMBackend:
+    """
+    Один экземпляр Ollama в пуле: URL, лимит одновременных запросов,
+    список обслуживаемых моделей и общий трекер состояния
+    """
+
+    def __init__(self, url: str, health: BackendHealth, max_concurrency: Optional[int] = None,
+                 models: Optional[List[str]] = None):
+        """
+        Args:
+            url: Базовый URL Ollama
+            health: Трекер состояния (circuit breaker) бэкенда
+            max_concurrency: Максимум одновременных запросов (None - без ограничения)
+            models: Модели, загруженные на бэкенде (пусто - любые)
+        """
+        self.url = url.rstrip('/')
+        self.health = health
+        self.max_concurrency = max_concurrency
+        self.models = list(models or [])
+        self.in_flight = 0
+        self.total_requests = 0
+        self.last_model = None
+
+    def serves(self, model: str) -> bool:
+        return not self.models or model in self.models
+
+    def has_capacity(self) -> bool:
+        return self.max_concurrency is None or self.in_flight < self.max_concurrency
+
+    def load(self) -> float:
+        """Доля занятых слотов (для бэкендов без лимита - число запросов)"""
+        if self.max_concurrency:
+            return self.in_flight / self.max_concurrency
+        return float(self.in_flight)
+
+
+class LLMBackendPool:
+    """
+    Пул LLM бэкендов с маршрутизацией на наименее загруженный.
+
+    Кандидаты на запрос - бэкенды, обслуживающие модель (сначала те, где она
+    указана явно) с закрытой цепью и свободным слотом. При равной загрузке
+    предпочтение отдается бэкенду, который последним выполнял эту модель
+    (модель уже в памяти). Если свободных слотов нет, запрос ждет.
+    """
+
+    def __init__(self, backends: List[LLMBackend], poll_interval: float = 0.05):
+        if not backends:
+            raise ValueError("Пул LLM бэкендов пуст")
+        self.backends = backends
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+
+    def _candidates(self, model: str) -> List[LLMBackend]:
+        explicit = [b for b in self.backends if model in b.models]
+        return explicit or [b for b in self.backends if b.serves(model)]
+
+    def backends_for(self, model: str) -> List[LLMBackend]:
+        """Бэкенды, на которые может уйти запрос к модели"""
+        return self._candidates(model)
+
+    def is_available(self, model: str) -> bool:
+        """Есть ли для модели хотя бы один бэкенд с неразомкнутой цепью"""
+        return any(not b.health.is_open() for b in self._candidates(model))
+
+    def load(self, model: str) -> float:
+        """Доля занятых слотов бэкендов модели с ограничением параллельности"""
+        with self._lock:
+            limited = [b for b in self._candidates(model) if b.max_concurrency]
+            if not limited:
+                return 0.0
+            return sum(b.in_flight for b in limited) / sum(b.max_concurrency for b in limited)
+
+    def _try_reserve(self, backend: LLMBackend, model: str) -> bool:
+        with self._lock:
+            if not backend.has_capacity():
+                return False
+            backend.in_flight += 1
+            backend.total_requests += 1
+            backend.last_model = model
+            return True
+
+    def release(self, backend: LLMBackend):
+        with self._lock:
+            backend.in_flight = max(0, backend.in_flight - 1)
+
+    async def acquire_async(self, model: str, timeout: float,
+                            exclude: Optional[LLMBackend] = None) -> Optional[LLMBackend]:
+        """
+        Резервирование слота на наименее загруженном доступном бэкенде
+
+        Args:
+            model: Модель запроса
+            timeout: Сколько ждать свободного слота (сек)
+            exclude: Бэкенд, которого по возможности следует избегать (для повторной попытки)
+
+        Returns:
+            Бэкенд (слот освобождается через release) или None, если все
+            подходящие бэкенды недоступны или заняты до истечения timeout
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        candidates = self._candidates(model)
+        if not candidates:
+            print(f"No LLM backend serves model {model}")
+            return None
+
+        while True:
+            with self._lock:
+                ranked = sorted(
+                    candidates,
+                    key=lambda b: (b is exclude, b.load(), b.last_model != model)
+                )
+            any_healthy = False
+            for backend in ranked:
+                if not backend.has_capacity():
+                    any_healthy = any_healthy or not backend.health.is_open()
+                    continue
+                if not await backend.health.allow_request_async():
+                    continue
+                any_healthy = True
+                if self._try_reserve(backend, model):
+                    return backend
+
+            # Все бэкенды модели недоступны - ждать бессмысленно
+            if not any_healthy or loop.time() >= deadline:
+                return None
+            await asyncio.sleep(self.poll_interval)
+
+    def status(self) -> List[Dict]:
+        with self._lock:
+            backends = [
+                {
+                    "url": b.url,
+                    "in_flight": b.in_flight,
+                    "max_concurrency": b.max_concurrency,
+                    "models": b.models,
+                    "total_requests": b.total_requests,
+                }
+                for b in self.backends
+            ]
+        for info, backend in zip(backends, self.backends):
+            info["state"] = backend.health.status()["state"]
+        return backends
+
+
+_pools: Dict[tuple, LLMBackendPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_backend_pool(backends: List[Dict], failure_threshold: int = 3,
+                     reset_timeout: float = 30) -> LLMBackendPool:
+    """
+    Общий для процесса пул по списку бэкендов из LLM_CONFIG['BACKENDS']:
+    [{'URL': ..., 'MAX_CONCURRENCY': ..., 'MODELS': [...]}]
+    Счетчики занятых слотов разделяются всеми анализаторами процесса.
+    """
+    key = tuple(
+        (b['URL'].rstrip('/'), b.get('MAX_CONCURRENCY'), tuple(b.get('MODELS') or ()))
+        for b in backends
+    )
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = LLMBackendPool([
+                LLMBackend(
+                    url=b['URL'],
+                    health=get_backend_health(
+                        b['URL'].rstrip('/'),
+                        failure_threshold=failure_threshold,
+                        reset_timeout=reset_timeout
+                    ),
+                    max_concurrency=b.get('MAX_CONCURRENCY'),
+                    models=b.get('MODELS')
+                )
+                for b in backends
+            ])
+        return _pools[key]
@@ -0,0 +1,119 @@
+from dataclasses import dataclass, asdict
+from typing import Dict, Iterable, Optional
+
+
+# Задачи, для которых по умолчанию нужна большая модель
+LARGE_MODEL_TASKS = {"topic_analysis", "summary", "refinement"}
+
+# Бюджет генерации (num_predict) по задачам
+DEFAULT_NUM_PREDICT = {
+    "quick_analysis": 1500,
+    "topic_analysis": 4000,
+    "summary": 1500,
+    "classification": 1000,
+    "refinement": 3000,
+    "cluster_naming": 300,
+}
+
+
+def estimate_tokens(texts: Iterable[str]) -> int:
+    """
+    Грубая оценка количества токенов: для русского текста около трех
+    символов на токен
+    """
+    return sum(len(text) for text in texts) // 3 + 1
+
+
+@dataclass
+class ModelRoute:
+    """Решение маршрутизации: модель и бюджет генерации для задачи"""
+    task: str
+    model: str
+    num_predict: int
+    estimated_tokens: int
+    load: float
+    reason: str
+
+    def to_dict(self):
+        return asdict(self)
+
+
+class ModelRouter:
+    """
+    Выбор модели и num_predict по типу задачи, объему входа и загрузке бэкендов.
+
+    Быстрые задачи (быстрый анализ, классификация, именование тем) идут на
+    малую модель. Большая модель нужна для анализа корпуса, справок и
+    уточнения тем, но и они уходят на малую модель, если вход маленький или
+    бэкенды большой модели перегружены, а вход помещается в малую модель.
+    """
+
+    def __init__(self, small_model: str, large_model: str,
+                 small_input_tokens: int = 1500, small_max_input_tokens: int = 6000,
+                 load_threshold: float = 0.8, num_predict: Optional[Dict[str, int]] = None,
+                 max_tokens: int = 4000):
+        """
+        Args:
+            small_model: Малая быстрая модель
+            large_model: Большая точная модель
+            small_input_tokens: До этого объема входа все задачи идут на малую модель
+            small_max_input_tokens: Максимальный вход, с которым малая модель справляется
+            load_threshold: Доля занятых слотов большой модели, после которой задачи
+                переносятся на малую
+            num_predict: Бюджет генерации по задачам (дополняет DEFAULT_NUM_PREDICT)
+            max_tokens: Верхняя граница num_predict
+        """
+        self.small_model = small_model
+        self.large_model = large_model
+        self.small_input_tokens = small_input_tokens
+        self.small_max_input_tokens = small_max_input_tokens
+        self.load_threshold = load_threshold
+        self.num_predict = dict(DEFAULT_NUM_PREDICT)
+        self.num_predict.update(num_predict or {})
+        self.max_tokens = max_tokens
+
+    def route(self, task: str, texts: Iterable[str], pool=None, scheduler=None) -> ModelRoute:
+        """
+        Выбор модели для задачи
+
+        Args:
+            task: Тип задачи (ключ DEFAULT_NUM_PREDICT)
+            texts: Тексты документов, уходящих в промпт
+            pool: Пул бэкендов (LLMBackendPool) для оценки загрузки
+            scheduler: Планировщик (LLMScheduler) для оценки загрузки
+        """
+        tokens = estimate_tokens(texts)
+        load = self._load(self.large_model, pool, scheduler)
+        fits_small = tokens <= self.small_max_input_tokens
+
+        if task not in LARGE_MODEL_TASKS:
+            model, reason = self.small_model, "fast task"
+        elif tokens <= self.small_input_tokens:
+            model, reason = self.small_model, "small input"
+        elif fits_small and load >= self.load_threshold:
+            model, reason = self.small_model, f"large model load {load:.2f}"
+        elif fits_small and pool is not None and not pool.is_available(self.large_model):
+            model, reason = self.small_model, "large model unavailable"
+        else:
+            model, reason = self.large_model, "large task"
+
+        budget = min(self.num_predict.get(task, self.max_tokens), self.max_tokens)
+        return ModelRoute(
+            task=task,
+            model=model,
+            num_predict=budget,
+            estimated_tokens=tokens,
+            load=round(load, 3),
+            reason=reason
+        )
+
+    @staticmethod
+    def _load(model: str, pool, scheduler) -> float:
+        load = 0.0
+        if pool is not None:
+            load = max(load, pool.load(model))
+        if scheduler is not None:
+            state = scheduler.status()
+            if state["max_concurrency"]:
+                load = max(load, state["running"] / state["max_concurrency"])
+        return load
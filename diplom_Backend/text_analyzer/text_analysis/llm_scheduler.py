@@ -0,0 +1,198 @@
+import asyncio
+import itertools
+import json
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+
+# Классы приоритета: меньше значение - выше приоритет
+PRIORITY_CLASSES = {
+    "interactive": 0,  # быстрый анализ, пользователь ждет ответ
+    "report": 1,       # справки по темам
+    "bulk": 2,         # анализ корпусов, пакетная классификация
+}
+
+
+class LLMOverloadedError(Exception):
+    """Очередь класса приоритета переполнена - запрос отклонен без ожидания"""
+
+    def __init__(self, priority: str, queued: int):
+        self.priority = priority
+        self.queued = queued
+        super().__init__(f"Очередь LLM запросов '{priority}' переполнена ({queued} в ожидании)")
+
+
+class _ClassStats:
+    def __init__(self, window: int):
+        self.running = 0
+        self.queued = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.waits = deque(maxlen=window)
+
+
+class LLMScheduler:
+    """
+    Планировщик вызовов LLM для всего процесса.
+
+    Ограничивает общее количество одновременных вызовов и количество вызовов
+    каждого класса приоритета. Свободный слот получает ожидающий запрос
+    с наивысшим приоритетом (при равном - пришедший раньше), класс которого
+    не исчерпал квоту. При переполнении очереди класса запрос сразу
+    отклоняется с LLMOverloadedError.
+    """
+
+    def __init__(self, max_concurrency: int = 4, quotas: Optional[Dict[str, int]] = None,
+                 max_queue: Optional[Dict[str, int]] = None, poll_interval: float = 0.05,
+                 metrics_window: int = 200):
+        """
+        Args:
+            max_concurrency: Максимум одновременных вызовов LLM в процессе
+            quotas: Максимум одновременных вызовов по классам (по умолчанию - max_concurrency)
+            max_queue: Максимальная длина очереди по классам (None - без ограничения)
+            poll_interval: Период проверки очереди ожидающим вызовом (сек)
+            metrics_window: Количество последних ожиданий для статистики
+        """
+        self.max_concurrency = max_concurrency
+        self.quotas = {name: max_concurrency for name in PRIORITY_CLASSES}
+        self.quotas.update(quotas or {})
+        self.max_queue = dict(max_queue or {})
+        self.poll_interval = poll_interval
+
+        self._lock = threading.Lock()
+        self._sequence = itertools.count()
+        self._waiting: Dict[int, tuple] = {}
+        self._running = 0
+        self._stats = {name: _ClassStats(metrics_window) for name in PRIORITY_CLASSES}
+
+    def _check_priority(self, priority: str):
+        if priority not in PRIORITY_CLASSES:
+            raise ValueError(f"Неизвестный класс приоритета: {priority}")
+
+    def _can_start(self, ticket: int, priority: str) -> bool:
+        """Вызывается под блокировкой: может ли ожидающий запрос занять слот"""
+        if self._running >= self.max_concurrency:
+            return False
+        if self._stats[priority].running >= self.quotas[priority]:
+            return False
+        rank = (PRIORITY_CLASSES[priority], ticket)
+        # Слот достается лучшему из ожидающих, чей класс не исчерпал квоту
+        for other, (other_priority, _) in self._waiting.items():
+            if other == ticket:
+                continue
+            if self._stats[other_priority].running >= self.quotas[other_priority]:
+                continue
+            if (PRIORITY_CLASSES[other_priority], other) < rank:
+                return False
+        return True
+
+    def _enqueue(self, priority: str) -> int:
+        self._check_priority(priority)
+        with self._lock:
+            stats = self._stats[priority]
+            limit = self.max_queue.get(priority)
+            if limit is not None and stats.queued >= limit:
+                stats.rejected += 1
+                raise LLMOverloadedError(priority, stats.queued)
+            ticket = next(self._sequence)
+            self._waiting[ticket] = (priority, time.monotonic())
+            stats.queued += 1
+            return ticket
+
+    def _try_start(self, ticket: int, priority: str) -> bool:
+        with self._lock:
+            if not self._can_start(ticket, priority):
+                return False
+            _, enqueued_at = self._waiting.pop(ticket)
+            stats = self._stats[priority]
+            stats.queued -= 1
+            stats.running += 1
+            stats.waits.append(time.monotonic() - enqueued_at)
+            self._running += 1
+            return True
+
+    def _abandon(self, ticket: int, priority: str):
+        with self._lock:
+            if self._waiting.pop(ticket, None) is not None:
+                self._stats[priority].queued -= 1
+                self._stats[priority].timed_out += 1
+
+    async def acquire_async(self, priority: str, timeout: float) -> bool:
+        """
+        Ожидание слота для вызова LLM
+
+        Returns:
+            True - слот получен (освобождается через release),
+            False - слот не освободился за timeout
+
+        Raises:
+            LLMOverloadedError: очередь класса переполнена
+        """
+        ticket = self._enqueue(priority)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        try:
+            while not self._try_start(ticket, priority):
+                if loop.time() >= deadline:
+                    print(f"LLM scheduler: '{priority}' request waited {timeout:.0f}s without a slot")
+                    self._abandon(ticket, priority)
+                    return False
+                await asyncio.sleep(self.poll_interval)
+        except BaseException:
+            self._abandon(ticket, priority)
+            raise
+        return True
+
+    def release(self, priority: str):
+        with self._lock:
+            self._running = max(0, self._running - 1)
+            stats = self._stats[priority]
+            stats.running = max(0, stats.running - 1)
+            stats.completed += 1
+
+    def status(self) -> Dict:
+        with self._lock:
+            classes = {}
+            for name, stats in self._stats.items():
+                waits = sorted(stats.waits)
+                classes[name] = {
+                    "running": stats.running,
+                    "queued": stats.queued,
+                    "quota": self.quotas[name],
+                    "max_queue": self.max_queue.get(name),
+                    "completed": stats.completed,
+                    "rejected": stats.rejected,
+                    "timed_out": stats.timed_out,
+                    "wait_avg": round(sum(waits) / len(waits), 3) if waits else 0.0,
+                    "wait_p95": round(waits[int(0.95 * (len(waits) - 1))], 3) if waits else 0.0,
+                    "wait_max": round(waits[-1], 3) if waits else 0.0,
+                }
+            return {
+                "max_concurrency": self.max_concurrency,
+                "running": self._running,
+                "classes": classes
+            }
+
+
+_schedulers: Dict[str, LLMScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(config: Optional[Dict] = None) -> LLMScheduler:
+    """
+    Общий для процесса планировщик по настройкам из LLM_CONFIG['SCHEDULER']:
+    {'MAX_CONCURRENCY': ..., 'QUOTAS': {...}, 'MAX_QUEUE': {...}}
+    """
+    config = config or {}
+    key = json.dumps(config, sort_keys=True)
+    with _schedulers_lock:
+        if key not in _schedulers:
+            _schedulers[key] = LLMScheduler(
+                max_concurrency=config.get('MAX_CONCURRENCY', 4),
+                quotas=config.get('QUOTAS'),
+                max_queue=config.get('MAX_QUEUE')
+            )
+        return _schedulers[key]
@@ -0,0 +1,239 @@
+import json
+import re
+from typing import Dict, List, Optional, Tuple
+
+
+_STRING = {"type": "string"}
+_NUMBER = {"type": "number"}
+_STRING_LIST = {"type": "array", "items": _STRING}
+
+_TOPIC = {
+    "type": "object",
+    "properties": {
+        "id": {"type": "integer"},
+        "name": _STRING,
+        "description": _STRING,
+        "keywords": _STRING_LIST,
+        "confidence": _NUMBER,
+        "document_ids": _STRING_LIST
+    },
+    "required": ["name", "description", "keywords"]
+}
+
+_DOCUMENT_TOPIC = {
+    "type": "object",
+    "properties": {
+        "document_id": _STRING,
+        "main_topic": _STRING,
+        "topic_description": _STRING,
+        "keywords": _STRING_LIST,
+        "confidence": _NUMBER
+    },
+    "required": ["document_id", "main_topic", "keywords"]
+}
+
+# JSON схемы ответов по задачам; передаются в поле format запроса к Ollama
+TASK_SCHEMAS = {
+    "topic_extraction": {
+        "type": "object",
+        "properties": {"topics": {"type": "array", "items": _TOPIC}},
+        "required": ["topics"]
+    },
+    "topic_refinement": {
+        "type": "object",
+        "properties": {"updated_topics": {"type": "array", "items": _TOPIC}},
+        "required": ["updated_topics"]
+    },
+    "single_document_analysis": _DOCUMENT_TOPIC,
+    "batch_document_analysis": {
+        "type": "object",
+        "properties": {"results": {"type": "array", "items": _DOCUMENT_TOPIC}},
+        "required": ["results"]
+    },
+    "cluster_naming": {
+        "type": "object",
+        "properties": {"name": _STRING, "description": _STRING},
+        "required": ["name", "description"]
+    },
+}
+
+# Задачи, ответ которых - список элементов под ключом; остальные - один объект
+TASK_ARRAY_KEYS = {
+    "topic_extraction": "topics",
+    "topic_refinement": "updated_topics",
+    "batch_document_analysis": "results",
+}
+
+_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "number": (int, float),
+    "integer": int,
+}
+
+
+def _matches_type(value, schema: Dict) -> bool:
+    expected = _TYPES.get(schema.get("type"))
+    if expected is None:
+        return True
+    if isinstance(value, bool):
+        return False
+    if not isinstance(value, expected):
+        return False
+    if schema.get("type") == "string" and not value.strip():
+        return False
+    if schema.get("type") == "array" and "items" in schema:
+        return all(_matches_type(item, schema["items"]) for item in value)
+    return True
+
+
+def missing_fields(item: Dict, schema: Dict) -> List[str]:
+    """
+    Обязательные поля объекта, которые отсутствуют или имеют неверный тип
+    """
+    if not isinstance(item, dict):
+        return list(schema.get("required", []))
+    properties = schema.get("properties", {})
+    return [
+        field for field in schema.get("required", [])
+        if field not in item or not _matches_type(item[field], properties.get(field, {}))
+    ]
+
+
+def find_invalid_items(data: Dict, task: str) -> List[Tuple[Optional[int], List[str]]]:
+    """
+    Элементы ответа с недостающими полями: [(индекс элемента или None для
+    ответа-объекта, [поля])]
+    """
+    schema = TASK_SCHEMAS[task]
+    array_key = TASK_ARRAY_KEYS.get(task)
+    if array_key is None:
+        fields = missing_fields(data, schema)
+        return [(None, fields)] if fields else []
+
+    item_schema = schema["properties"][array_key]["items"]
+    invalid = []
+    for index, item in enumerate(data.get(array_key) or []):
+        if not isinstance(item, dict):
+            continue
+        fields = missing_fields(item, item_schema)
+        if fields:
+            invalid.append((index, fields))
+    return invalid
+
+
+def repair_schema(task: str, fields: List[str]) -> Dict:
+    """
+    Схема ответа на дозапрос недостающих полей: {"items": [{"index", ...поля}]}
+    """
+    schema = TASK_SCHEMAS[task]
+    array_key = TASK_ARRAY_KEYS.get(task)
+    item_schema = schema["properties"][array_key]["items"] if array_key else schema
+    properties = {"index": {"type": "integer"}}
+    for field in fields:
+        properties[field] = item_schema["properties"].get(field, _STRING)
+    return {
+        "type": "object",
+        "properties": {
+            "items": {
+                "type": "array",
+                "items": {"type": "object", "properties": properties, "required": ["index"] + fields}
+            }
+        },
+        "required": ["items"]
+    }
+
+
+def extract_json(text: str) -> Optional[Dict]:
+    """
+    Разбор JSON ответа модели. При генерации по схеме ответ - чистый JSON;
+    иначе снимается обертка ```json и берется первый целый JSON объект.
+    """
+    if not text:
+        return None
+    text = text.strip()
+    try:
+        data = json.loads(text)
+        return data if isinstance(data, dict) else None
+    except json.JSONDecodeError:
+        pass
+
+    text = re.sub(r'^```(?:json)?\s*|\s*```$', '', text)
+    decoder = json.JSONDecoder()
+    start = text.find('{')
+    while start != -1:
+        try:
+            data, _ = decoder.raw_decode(text, start)
+            if isinstance(data, dict):
+                return data
+        except json.JSONDecodeError:
+            pass
+        start = text.find('{', start + 1)
+    return None
+
+
+class IncrementalArrayParser:
+    """
+    Потоковый разбор ответа вида {"<key>": [{...}, {...}]}: каждый элемент
+    массива возвращается, как только его объект закрыт, не дожидаясь конца ответа.
+    """
+
+    def __init__(self, array_key: str):
+        self.array_key = array_key
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._last_string = None
+        self._key = None
+        self._in_target = False
+        self._item_start = None
+        self._text = ""
+
+    def feed(self, chunk: str) -> List[Dict]:
+        """Добавление фрагмента ответа; возвращает элементы, закрытые в нем"""
+        items = []
+        offset = len(self._text)
+        self._text += chunk
+        for position in range(offset, len(self._text)):
+            char = self._text[position]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    self._last_string = self._text[self._string_start + 1:position]
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = position
+            elif char == ':' and self._depth == 1:
+                self._key = self._last_string
+            elif char in '{[':
+                if char == '[' and self._depth == 1 and self._key == self.array_key:
+                    self._in_target = True
+                elif char == '{' and self._in_target and self._depth == 2:
+                    self._item_start = position
+                self._depth += 1
+            elif char in '}]':
+                self._depth -= 1
+                if char == '}' and self._in_target and self._depth == 2 and self._item_start is not None:
+                    try:
+                        item = json.loads(self._text[self._item_start:position + 1])
+                        if isinstance(item, dict):
+                            items.append(item)
+                    except json.JSONDecodeError:
+                        pass
+                    self._item_start = None
+                elif char == ']' and self._in_target and self._depth == 1:
+                    self._in_target = False
+        return items
+
+    @property
+    def text(self) -> str:
+        """Весь полученный ответ"""
+        return self._text
@@ -0,0 +1,132 @@
+from datetime import date, timedelta
+from typing import List, Dict, Optional
+
+from .llm_analyzer import LLMTopicAnalyzer, Document
+
+
+class HierarchicalSummaryEngine:
+    """
+    Справки за произвольный период из кэшированных частичных сводок.
+
+    Для каждого дня (или недели) периода по теме строится короткая сводка,
+    которая кэшируется по содержимому документов этого промежутка. Итоговая
+    справка получается одним reduce-вызовом над сводками и тоже кэшируется.
+    При смене периода пересчитываются только сводки новых или изменившихся
+    промежутков.
+    """
+
+    GRANULARITIES = ('day', 'week')
+
+    def __init__(self, llm_analyzer: LLMTopicAnalyzer, granularity: str = 'day',
+                 max_documents_per_partial: int = 20, preview_length: int = 200):
+        """
+        Args:
+            llm_analyzer: LLM анализатор (вызовы, кэш, промпты)
+            granularity: Промежуток частичной сводки: 'day' или 'week'
+            max_documents_per_partial: Максимум документов в промпте частичной сводки
+            preview_length: Длина фрагмента документа в промпте
+        """
+        if granularity not in self.GRANULARITIES:
+            raise ValueError(f"Неизвестная гранулярность: {granularity}")
+        self.llm = llm_analyzer
+        self.granularity = granularity
+        self.max_documents_per_partial = max_documents_per_partial
+        self.preview_length = preview_length
+
+    def _bucket(self, doc_date: str) -> str:
+        """Промежуток документа: дата или понедельник его недели"""
+        if self.granularity == 'day':
+            return doc_date
+        day = date.fromisoformat(doc_date)
+        return (day - timedelta(days=day.weekday())).isoformat()
+
+    def _bucket_label(self, bucket: str) -> str:
+        if self.granularity == 'day':
+            return bucket
+        end = date.fromisoformat(bucket) + timedelta(days=6)
+        return f"{bucket} - {end.isoformat()}"
+
+    def _partial_summary(self, topic: Dict, bucket: str, documents: List[Document],
+                         use_cache: bool) -> Optional[str]:
+        """
+        Частичная сводка по промежутку; None, если LLM недоступен
+        """
+        docs_summary = []
+        # Сортировка делает промпт (и ключ кэша) независимым от порядка выборки из БД
+        ordered = sorted(documents, key=lambda doc: (doc.theme, doc.text))
+        for i, doc in enumerate(ordered[:self.max_documents_per_partial], 1):
+            preview = doc.text[:self.preview_length] + "..." if len(doc.text) > self.preview_length else doc.text
+            docs_summary.append(f"{i}. {doc.theme}: {preview}")
+
+        prompt = self.llm.prompts["partial_summary"].format(
+            topic_name=topic.get("topic_name", "Тема"),
+            keywords=", ".join(topic.get("keywords", [])[:5]),
+            period=self._bucket_label(bucket),
+            count=len(documents),
+            documents_summary="\n".join(docs_summary)
+        )
+
+        def compute():
+            response = self.llm._call_llm_sync(prompt)
+            if response:
+                return self.llm._clean_summary(response), True
+            return None, False
+
+        cache_key = self.llm._get_prompt_cache_key("partial_summary", prompt)
+        return self.llm._run_cached(cache_key, compute, use_cache)
+
+    def summarize(self, topic: Dict, documents: List[Document],
+                  start_date: str, end_date: str, use_cache: bool = True) -> Dict:
+        """
+        Справка по теме за период из частичных сводок
+
+        Returns:
+            {"summary": текст, "partials": количество промежутков, "is_fallback": bool}
+        """
+        filtered_docs = [doc for doc in documents if start_date <= doc.date <= end_date]
+
+        buckets: Dict[str, List[Document]] = {}
+        for doc in filtered_docs:
+            buckets.setdefault(self._bucket(doc.date), []).append(doc)
+
+        partials = []
+        for bucket in sorted(buckets):
+            text = self._partial_summary(topic, bucket, buckets[bucket], use_cache)
+            if text is None:
+                partials = None
+                break
+            partials.append(f"### {self._bucket_label(bucket)} ({len(buckets[bucket])} док.)\n{text}")
+
+        if not partials:
+            return {
+                "summary": self.llm._generate_fallback_summary(topic, filtered_docs, start_date, end_date),
+                "partials": len(buckets),
+                "is_fallback": True
+            }
+
+        prompt = self.llm.prompts["summary_reduce"].format(
+            topic_name=topic.get("topic_name", "Тема"),
+            topic_description=topic.get("description", ""),
+            start_date=start_date,
+            end_date=end_date,
+            keywords=", ".join(topic.get("keywords", [])[:5]),
+            count=len(filtered_docs),
+            partial_summaries="\n\n".join(partials)
+        )
+
+        def compute():
+            response = self.llm._call_llm_sync(prompt)
+            if response:
+                return self.llm._clean_summary(response), True
+            return None, False
+
+        cache_key = self.llm._get_prompt_cache_key("summary_reduce", prompt)
+        summary = self.llm._run_cached(cache_key, compute, use_cache)
+        if summary is None:
+            return {
+                "summary": self.llm._generate_fallback_summary(topic, filtered_docs, start_date, end_date),
+                "partials": len(buckets),
+                "is_fallback": True
+            }
+
+        return {"summary": summary, "partials": len(buckets), "is_fallback": False}
@@ -2,102 +2,186 @@ from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.db import transaction
-from .models import TextDocument, AnalysisSession, TopicResult
+from django.db.models import Count
+from django.http import StreamingHttpResponse
+from .models import TextDocument, AnalysisSession, TopicResult, TopicDocument, TopicDistribution
+from .ingestion import ingest_documents
+from .topic_distributions import save_topic_distribution
+from .analysis_sessions import (
+    start_analysis_session, save_topic_results, create_topic_results, topic_document_links,
+    fail_analysis_session, rebuild_daily_counts
+)
 from .serializers import AnalysisRequestSerializer, TextDocumentUploadSerializer
 from .llm_analyzer import create_llm_analyzer, Document
+from .llm_hybrid import LLMClusterTopicAnalyzer
+from .llm_summaries import HierarchicalSummaryEngine
+from .llm_scheduler import LLMOverloadedError, get_scheduler
+from .llm_routing import ModelRouter
+from .llm_warmup import get_model_warmer
 from .llm_config import LLMConfig  # Импортируем конфигурацию
+from datetime import datetime
 import asyncio
+import json
+
+
+def build_llm_analyzer(**overrides):
+    """
+    Создание LLM анализатора с настройками из LLMConfig
+    """
+    params = {
+        'provider': LLMConfig.PROVIDER,
+        'model': LLMConfig.MODEL_NAME,
+        'ollama_url': LLMConfig.OLLAMA_URL,
+        'timeout': LLMConfig.TIMEOUT,
+        'max_retries': LLMConfig.MAX_RETRIES,
+        'temperature': LLMConfig.TEMPERATURE,
+        'num_predict': LLMConfig.MAX_TOKENS,
+        'keep_alive': LLMConfig.KEEP_ALIVE,
+        'assignment_mode': LLMConfig.ASSIGNMENT_MODE,
+        'embedding_model': LLMConfig.EMBEDDING_MODEL,
+        'request_deadline': LLMConfig.REQUEST_DEADLINE,
+        'failure_threshold': LLMConfig.CIRCUIT_FAILURE_THRESHOLD,
+        'reset_timeout': LLMConfig.CIRCUIT_RESET_TIMEOUT,
+        'backends': LLMConfig.BACKENDS,
+        'scheduler': get_scheduler(LLMConfig.SCHEDULER),
+    }
+    # Явно заданная модель маршрутизацией не переопределяется
+    if 'model' not in overrides:
+        params['router'] = build_model_router()
+    params.update(overrides)
+    return create_llm_analyzer(**params)
+
+
+def build_model_router():
+    """
+    Политика выбора модели из LLMConfig.MODEL_ROUTING (None, если выключена)
+    """
+    routing = LLMConfig.MODEL_ROUTING
+    if not routing.get('ENABLED'):
+        return None
+    return ModelRouter(
+        small_model=routing.get('SMALL_MODEL', LLMConfig.MODEL_NAME),
+        large_model=routing.get('LARGE_MODEL', LLMConfig.MODEL_NAME),
+        small_input_tokens=routing.get('SMALL_INPUT_TOKENS', 1500),
+        small_max_input_tokens=routing.get('SMALL_MAX_INPUT_TOKENS', 6000),
+        load_threshold=routing.get('LOAD_THRESHOLD', 0.8),
+        num_predict=routing.get('NUM_PREDICT'),
+        max_tokens=LLMConfig.MAX_TOKENS
+    )
+
+
+def overloaded_response(error):
+    """
+    Ответ 503 при отказе планировщика LLM (очередь класса приоритета переполнена)
+    """
+    return Response(
+        {
+            'error': f'Сервис LLM перегружен, повторите запрос позже: {error}',
+            'priority': error.priority,
+            'queued': error.queued
+        },
+        status=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={'Retry-After': str(LLMConfig.OVERLOAD_RETRY_AFTER)}
+    )
+
 
 class LLMTopicAnalysisView(APIView):
     """
     View для анализа тем с использованием LLM через Ollama
     """
     
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        # Инициализация анализатора с конфигурацией из settings
-        self.analyzer = create_llm_analyzer(
-            provider=LLMConfig.PROVIDER,
-            model=LLMConfig.MODEL_NAME,  # <-- МОДЕЛЬ БЕРЕТСЯ ИЗ КОНФИГУРАЦИИ
-            ollama_url=LLMConfig.OLLAMA_URL,
-            timeout=LLMConfig.TIMEOUT,
-            max_retries=LLMConfig.MAX_RETRIES,
-            temperature=LLMConfig.TEMPERATURE
-        )
-    
     def post(self, request):
         """
         Анализ документов с помощью LLM
         """
-        # Можно переопределить модель для конкретного запроса
-        custom_model = request.data.get('model_name')
+        serializer = AnalysisRequestSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        analyzer = self.build_analyzer(serializer.validated_data, request.data)
+        return self.perform_llm_analysis(serializer.validated_data, analyzer)
+    
+    def build_analyzer(self, validated_data, options):
+        """
+        Анализатор для запроса; options - исходные параметры запроса
+        (engine, model_name, assignment_mode)
+        """
+        # Локальная кластеризация с названиями тем от LLM вместо отправки всего корпуса
+        engine = options.get('engine', LLMConfig.TOPIC_ENGINE)
+        task = 'cluster_naming' if engine == 'clusters' else 'topic_analysis'
+        texts = [doc['text'] for doc in validated_data['documents']['documents']]
+        
+        # Можно переопределить модель для конкретного запроса,
+        # иначе модель выбирается по задаче и объему документов
+        custom_model = options.get('model_name')
+        overrides = {}
         if custom_model:
             print(f"Using custom model: {custom_model}")
-            analyzer = create_llm_analyzer(
-                provider=LLMConfig.PROVIDER,
-                model=custom_model,
-                ollama_url=LLMConfig.OLLAMA_URL
-            )
-        else:
-            analyzer = self.analyzer
+            overrides['model'] = custom_model
+        analyzer = build_llm_analyzer(priority='bulk', task=task, texts=texts, **overrides)
         
-        serializer = AnalysisRequestSerializer(data=request.data)
-        if serializer.is_valid():
-            return self.perform_llm_analysis(serializer.validated_data, analyzer)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        # Режим распределения документов можно задать для конкретного запроса
+        assignment_mode = options.get('assignment_mode')
+        if assignment_mode in ('llm', 'embedding'):
+            analyzer.assignment_mode = assignment_mode
+        
+        if engine == 'clusters':
+            analyzer = LLMClusterTopicAnalyzer(analyzer)
+        
+        return analyzer
     
-    def perform_llm_analysis(self, validated_data, analyzer):
+    def perform_llm_analysis(self, validated_data, analyzer, job=None):
         """
         Выполнение анализа с использованием LLM
+        (job - фоновая задача, если анализ выполняет обработчик очереди)
         """
+        session = None
         try:
-            with transaction.atomic():
-                # Извлекаем данные документов
-                documents_data = validated_data['documents']['documents']
-                analysis_name = validated_data.get('analysis_name', 'LLM Анализ')
-                
-                # Сохраняем документы в базу
-                text_documents = []
-                for doc_data in documents_data:
-                    document = TextDocument.objects.create(
-                        date=doc_data['date'],
-                        theme=doc_data['theme'],
-                        text=doc_data['text']
-                    )
-                    text_documents.append(document)
-                
-                # Создаем сессию анализа с указанием модели
-                session = AnalysisSession.objects.create(
-                    name=analysis_name,
-                    description=f'Анализ с использованием LLM (Модель: {analyzer.model_name})',
-                    algorithm_used=f'llm_{analyzer.model_name}'
+            # Извлекаем данные документов
+            documents_data = validated_data['documents']['documents']
+            analysis_name = validated_data.get('analysis_name', 'LLM Анализ')
+            
+            # Сохраняем документы и создаем сессию анализа с указанием модели
+            # (короткая транзакция до обращения к LLM)
+            session, text_documents = start_analysis_session(
+                documents_data,
+                job=job,
+                name=analysis_name,
+                description=f'Анализ с использованием LLM (Модель: {analyzer.model_name})',
+                algorithm_used=f'llm_{analyzer.model_name}',
+                metadata={'model_routing': analyzer.routing}
+            )
+            
+            # Преобразуем в формат для LLM анализатора
+            llm_documents = []
+            for i, doc in enumerate(text_documents):
+                llm_document = Document(
+                    id=f"doc_{i+1}",
+                    date=str(doc.date),
+                    theme=doc.theme,
+                    text=doc.text
                 )
-                session.documents.set(text_documents)
-                
-                # Преобразуем в формат для LLM анализатора
-                llm_documents = []
-                for i, doc in enumerate(text_documents):
-                    llm_document = Document(
-                        id=f"doc_{i+1}",
-                        date=str(doc.date),
-                        theme=doc.theme,
-                        text=doc.text
-                    )
-                    llm_documents.append(llm_document)
-                
-                # Выполняем анализ с LLM
-                print(f"Starting LLM analysis for {len(llm_documents)} documents using {analyzer.model_name}...")
-                analysis_result = analyzer.analyze_topics(llm_documents)
-                
-                # Сохраняем результаты в базу
-                self.save_llm_results(session, analysis_result, text_documents)
-                
-                # Формируем ответ
-                response_data = self.format_llm_response(session, analysis_result)
-                
-                return Response(response_data, status=status.HTTP_200_OK)
+                llm_documents.append(llm_document)
+            
+            # Выполняем анализ с LLM вне транзакции
+            print(f"Starting LLM analysis for {len(llm_documents)} documents using {analyzer.model_name}...")
+            analysis_result = analyzer.analyze_topics(llm_documents)
+            
+            # Сохраняем результаты в базу
+            self.save_llm_results(session, analysis_result, text_documents)
+            
+            # Формируем ответ
+            response_data = self.format_llm_response(session, analysis_result)
+            
+            return Response(response_data, status=status.HTTP_200_OK)
                 
+        except LLMOverloadedError as e:
+            if session is not None:
+                fail_analysis_session(session, e)
+            return overloaded_response(e)
         except Exception as e:
+            if session is not None:
+                fail_analysis_session(session, e)
             import traceback
             traceback.print_exc()
             return Response(
@@ -109,34 +193,41 @@ class LLMTopicAnalysisView(APIView):
         """
         Сохранение результатов LLM анализа
         """
-        # Создаем словарь документов для быстрого доступа
+        # Документы анализатора имеют id doc_<номер>, см. perform_llm_analysis
         doc_dict = {f"doc_{i+1}": doc for i, doc in enumerate(text_documents)}
         
-        for topic_data in analysis_result['topics']:
-            # Находим Django документы по их индексам
-            topic_documents = []
-            for doc_idx in topic_data.get('document_indices', []):
-                if doc_idx in doc_dict:
-                    topic_documents.append(doc_dict[doc_idx])
-                else:
-                    # Пытаемся найти по индексу
-                    try:
-                        idx = int(doc_idx.split('_')[1]) - 1
-                        if 0 <= idx < len(text_documents):
-                            topic_documents.append(text_documents[idx])
-                    except:
-                        pass
+        topics = []
+        saved_columns = []
+        for column, topic_data in enumerate(analysis_result['topics']):
+            document_ids = topic_data.get('document_indices', [])
+            confidences = topic_data.get('document_confidences') or [None] * len(document_ids)
+            links = [
+                (doc_dict[doc_id], confidence)
+                for doc_id, confidence in zip(document_ids, confidences) if doc_id in doc_dict
+            ]
             
             # Создаем запись результата
-            if topic_documents:  # Сохраняем только темы с документами
-                topic_result = TopicResult.objects.create(
-                    session=session,
-                    topic_name=topic_data['topic_name'],
-                    topic_keywords=topic_data['keywords'][:10],
-                    document_count=len(topic_documents),
-                    confidence_score=topic_data.get('confidence', 0.7)
+            if links:  # Сохраняем только темы с документами
+                topics.append({
+                    'topic_name': topic_data['topic_name'],
+                    'topic_keywords': topic_data['keywords'][:10],
+                    'confidence_score': topic_data.get('confidence', 0.7),
+                    'documents': [document for document, _ in links],
+                    'confidences': [confidence for _, confidence in links]
+                })
+                saved_columns.append(column)
+        
+        with transaction.atomic():
+            topic_results = save_topic_results(session, topics)
+            
+            # Веса тем документов (движок кластеризации) сохраняются для переотнесения
+            weights = analysis_result.get('document_topic_weights')
+            if weights is not None and len(weights) == len(text_documents):
+                results_by_column = dict(zip(saved_columns, topic_results))
+                save_topic_distribution(
+                    session, text_documents, weights,
+                    [results_by_column.get(column) for column in range(len(analysis_result['topics']))]
                 )
-                topic_result.documents.set(topic_documents)
     
     def format_llm_response(self, session, analysis_result):
         """
@@ -163,7 +254,8 @@ class LLMTopicAnalysisView(APIView):
             'topics_discovered': len(topic_statistics),
             'model_used': analysis_result['metadata']['model_used'],
             'provider': analysis_result['metadata']['provider'],
-            'processing_time': analysis_result['metadata']['timestamp']
+            'processing_time': analysis_result['metadata']['timestamp'],
+            'model_routing': session.metadata.get('model_routing')
         }
         
         return {
@@ -179,76 +271,116 @@ class LLMSummaryView(APIView):
     View для генерации аналитической справки с помощью LLM
     """
     
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        self.analyzer = create_llm_analyzer()
+    def build_analyzer(self, llm_documents):
+        """
+        Анализатор для справки: модель выбирается по объему документов темы за период
+        """
+        return build_llm_analyzer(
+            priority='report',
+            task='summary',
+            texts=[doc.text for doc in llm_documents]
+        )
+    
+    def prepare_summary_request(self, params):
+        """
+        Проверка параметров и загрузка документов темы за период.
+        Возвращает (данные темы, документы для LLM, ответ с ошибкой или None)
+        """
+        session_id = params.get('session_id')
+        topic_name = params.get('topic_name')
+        start_date = params.get('start_date')
+        end_date = params.get('end_date')
+        
+        if not all([session_id, topic_name, start_date, end_date]):
+            return None, None, Response(
+                {'error': 'Необходимы session_id, topic_name, start_date и end_date'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Получаем сессию и тему
+        session = AnalysisSession.objects.get(id=session_id)
+        topic_result = session.topic_results.filter(topic_name=topic_name).first()
+        
+        if not topic_result:
+            return None, None, Response(
+                {'error': 'Тема не найдена в указанной сессии'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        # Получаем документы темы
+        topic_documents = topic_result.documents.all()
+        
+        # Фильтруем по дате
+        filtered_documents = topic_documents.filter(
+            date__range=[start_date, end_date]
+        )
+        
+        # Преобразуем в формат для LLM
+        llm_documents = []
+        for i, doc in enumerate(filtered_documents):
+            llm_doc = Document(
+                id=f"doc_{i+1}",
+                date=str(doc.date),
+                theme=doc.theme,
+                text=doc.text
+            )
+            llm_documents.append(llm_doc)
+        
+        # Подготавливаем данные темы
+        topic_data = {
+            'topic_name': topic_result.topic_name,
+            'description': f'Тема из анализа сессии "{session.name}"',
+            'keywords': topic_result.topic_keywords
+        }
+        return topic_data, llm_documents, None
     
     def post(self, request):
         """
         Генерация справки по теме с использованием LLM
         """
         try:
-            session_id = request.data.get('session_id')
+            topic_data, llm_documents, error_response = self.prepare_summary_request(request.data)
+            if error_response:
+                return error_response
+            analyzer = self.build_analyzer(llm_documents)
+            
             topic_name = request.data.get('topic_name')
             start_date = request.data.get('start_date')
             end_date = request.data.get('end_date')
             
-            if not all([session_id, topic_name, start_date, end_date]):
-                return Response(
-                    {'error': 'Необходимы session_id, topic_name, start_date и end_date'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            # Получаем сессию и тему
-            session = AnalysisSession.objects.get(id=session_id)
-            topic_result = session.topic_results.filter(topic_name=topic_name).first()
-            
-            if not topic_result:
-                return Response(
-                    {'error': 'Тема не найдена в указанной сессии'},
-                    status=status.HTTP_404_NOT_FOUND
-                )
-            
-            # Получаем документы темы
-            topic_documents = topic_result.documents.all()
-            
-            # Фильтруем по дате
-            filtered_documents = topic_documents.filter(
-                date__range=[start_date, end_date]
-            )
-            
-            # Преобразуем в формат для LLM
-            llm_documents = []
-            for i, doc in enumerate(filtered_documents):
-                llm_doc = Document(
-                    id=f"doc_{i+1}",
-                    date=str(doc.date),
-                    theme=doc.theme,
-                    text=doc.text
-                )
-                llm_documents.append(llm_doc)
-            
-            # Подготавливаем данные темы
-            topic_data = {
-                'topic_name': topic_result.topic_name,
-                'description': f'Тема из анализа сессии "{session.name}"',
-                'keywords': topic_result.topic_keywords
-            }
+            # Справка собирается из кэшированных сводок по дням/неделям,
+            # granularity='none' - одна справка по всему периоду
+            granularity = request.data.get('granularity', LLMConfig.SUMMARY_GRANULARITY)
             
             # Генерируем справку с LLM
             print(f"Generating LLM summary for topic: {topic_name}")
-            summary = self.analyzer.generate_summary(
-                topic=topic_data,
-                documents=llm_documents,
-                start_date=start_date,
-                end_date=end_date
-            )
+            partials = None
+            if granularity in HierarchicalSummaryEngine.GRANULARITIES:
+                engine = HierarchicalSummaryEngine(analyzer, granularity=granularity)
+                result = engine.summarize(
+                    topic=topic_data,
+                    documents=llm_documents,
+                    start_date=start_date,
+                    end_date=end_date
+                )
+                summary = result['summary']
+                partials = result['partials']
+            else:
+                summary = analyzer.generate_summary(
+                    topic=topic_data,
+                    documents=llm_documents,
+                    start_date=start_date,
+                    end_date=end_date
+                )
             
             return Response({
                 'topic_name': topic_name,
                 'period': f'{start_date} - {end_date}',
-                'documents_analyzed': len(filtered_documents),
+                'documents_analyzed': len(llm_documents),
                 'summary': summary,
+                'granularity': granularity if partials is not None else 'none',
+                'partial_summaries': partials,
+                'model_routing': analyzer.routing,
                 'generated_at': str(datetime.now())
             })
             
@@ -257,6 +389,8 @@ class LLMSummaryView(APIView):
                 {'error': 'Сессия анализа не найдена'},
                 status=status.HTTP_404_NOT_FOUND
             )
+        except LLMOverloadedError as e:
+            return overloaded_response(e)
         except Exception as e:
             return Response(
                 {'error': f'Ошибка при генерации справки: {str(e)}'},
@@ -264,15 +398,85 @@ class LLMSummaryView(APIView):
             )
 
 
+class LLMSummaryStreamView(LLMSummaryView):
+    """
+    Потоковая генерация справки (Server-Sent Events): фрагменты текста
+    отправляются клиенту по мере генерации моделью.
+    
+    GET с параметрами в query string подходит для EventSource,
+    POST принимает те же поля, что и llm/generate-summary/.
+    """
+    
+    def perform_content_negotiation(self, request, force=False):
+        # EventSource присылает Accept: text/event-stream, ошибки отдаем как JSON
+        return super().perform_content_negotiation(request, force=True)
+    
+    def get(self, request):
+        return self.stream(request.query_params)
+    
+    def post(self, request):
+        return self.stream(request.data)
+    
+    @staticmethod
+    def _sse(event, data):
+        return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+    
+    def stream(self, params):
+        try:
+            topic_data, llm_documents, error_response = self.prepare_summary_request(params)
+        except AnalysisSession.DoesNotExist:
+            return Response(
+                {'error': 'Сессия анализа не найдена'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        if error_response:
+            return error_response
+        analyzer = self.build_analyzer(llm_documents)
+        
+        start_date = params.get('start_date')
+        end_date = params.get('end_date')
+        print(f"Streaming LLM summary for topic: {topic_data['topic_name']}")
+        
+        def events():
+            yield self._sse('start', {
+                'topic_name': topic_data['topic_name'],
+                'period': f'{start_date} - {end_date}',
+                'documents_analyzed': len(llm_documents),
+                'model_routing': analyzer.routing
+            })
+            stream_state = {}
+            try:
+                for chunk in analyzer.stream_summary(
+                    topic=topic_data,
+                    documents=llm_documents,
+                    start_date=start_date,
+                    end_date=end_date,
+                    state=stream_state
+                ):
+                    yield self._sse('chunk', {'text': chunk})
+            except Exception as e:
+                yield self._sse('error', {'error': f'Ошибка при генерации справки: {str(e)}'})
+                return
+            if not stream_state.get('done'):
+                # Модель оборвала ответ: отправленный текст справки неполный
+                yield self._sse('error', {
+                    'error': 'Генерация справки прервана, справка неполная',
+                    'truncated': True
+                })
+                return
+            yield self._sse('done', {'generated_at': str(datetime.now())})
+        
+        response = StreamingHttpResponse(events(), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # Отключаем буферизацию в nginx
+        return response
+
+
 class LLMQuickAnalysisView(APIView):
     """
     Быстрый анализ без сохранения в базу
     """
     
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        self.analyzer = create_llm_analyzer()
-    
     def post(self, request):
         """
         Быстрый анализ текстов с LLM
@@ -293,9 +497,15 @@ class LLMQuickAnalysisView(APIView):
                     )
                     llm_documents.append(llm_doc)
                 
+                analyzer = build_llm_analyzer(
+                    priority='interactive',
+                    task='quick_analysis',
+                    texts=[doc.text for doc in llm_documents]
+                )
+                
                 # Выполняем анализ
                 print(f"Quick LLM analysis for {len(llm_documents)} documents")
-                analysis_result = self.analyzer.analyze_topics(llm_documents)
+                analysis_result = analyzer.analyze_topics(llm_documents)
                 
                 # Форматируем результат
                 topic_statistics = []
@@ -312,13 +522,357 @@ class LLMQuickAnalysisView(APIView):
                 return Response({
                     'topic_statistics': topic_statistics,
                     'total_documents_analyzed': len(llm_documents),
-                    'model_used': analysis_result['metadata']['model_used']
+                    'model_used': analysis_result['metadata']['model_used'],
+                    'model_routing': analyzer.routing
                 })
                 
+            except LLMOverloadedError as e:
+                return overloaded_response(e)
             except Exception as e:
                 return Response(
                     {'error': f'Ошибка быстрого анализа: {str(e)}'},
                     status=status.HTTP_500_INTERNAL_SERVER_ERROR
                 )
         
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class LLMTopicStreamView(APIView):
+    """
+    Потоковый быстрый анализ (Server-Sent Events): темы отправляются клиенту
+    по мере того, как модель их формирует, итог - в событии done.
+    Событие reset: поток модели оборвался, отправленные темы заменяются
+    темами фолбэк анализа, которые идут следом
+    """
+    
+    def perform_content_negotiation(self, request, force=False):
+        # Клиент присылает Accept: text/event-stream, ошибки отдаем как JSON
+        return super().perform_content_negotiation(request, force=True)
+    
+    def post(self, request):
+        serializer = TextDocumentUploadSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        llm_documents = [
+            Document(
+                id=f"doc_{i+1}",
+                date=doc_data['date'],
+                theme=doc_data['theme'],
+                text=doc_data['text']
+            )
+            for i, doc_data in enumerate(serializer.validated_data['documents'])
+        ]
+        analyzer = build_llm_analyzer(
+            priority='interactive',
+            task='topic_analysis',
+            texts=[doc.text for doc in llm_documents]
+        )
+        print(f"Streaming LLM topic analysis for {len(llm_documents)} documents")
+        
+        def events():
+            yield LLMSummaryStreamView._sse('start', {
+                'total_documents': len(llm_documents),
+                'model_routing': analyzer.routing
+            })
+            try:
+                for kind, data in analyzer.stream_topics(llm_documents):
+                    if kind in ('topic', 'reset'):
+                        yield LLMSummaryStreamView._sse(kind, data)
+                        continue
+                    topic_statistics = [
+                        {
+                            'topic_name': topic_data['topic_name'],
+                            'description': topic_data.get('description', ''),
+                            'keywords': topic_data['keywords'],
+                            'document_count': topic_data['document_count'],
+                            'confidence': topic_data.get('confidence', 0.7)
+                        }
+                        for topic_data in data['topics'] if topic_data['document_count'] > 0
+                    ]
+                    yield LLMSummaryStreamView._sse('done', {
+                        'topic_statistics': topic_statistics,
+                        'total_documents_analyzed': len(llm_documents),
+                        'model_used': data['metadata'].get('model_used', analyzer.model_name)
+                    })
+            except Exception as e:
+                yield LLMSummaryStreamView._sse('error', {'error': f'Ошибка анализа: {str(e)}'})
+        
+        response = StreamingHttpResponse(events(), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # Отключаем буферизацию в nginx
+        return response
+
+
+class LLMDocumentClassificationView(APIView):
+    """
+    Пакетная классификация документов: несколько документов в одном промпте
+    """
+    
+    def post(self, request):
+        """
+        Определение основной темы каждого документа
+        """
+        try:
+            batch_size = int(request.data.get('batch_size', LLMConfig.CLASSIFICATION_BATCH_SIZE))
+        except (TypeError, ValueError):
+            return Response({'error': 'batch_size должен быть целым числом'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        serializer = TextDocumentUploadSerializer(data=request.data)
+        if serializer.is_valid():
+            try:
+                documents_data = serializer.validated_data['documents']
+                
+                # Преобразуем в формат для LLM
+                llm_documents = [
+                    Document(
+                        id=f"doc_{i+1}",
+                        date=doc_data['date'],
+                        theme=doc_data['theme'],
+                        text=doc_data['text']
+                    )
+                    for i, doc_data in enumerate(documents_data)
+                ]
+                
+                analyzer = build_llm_analyzer(
+                    priority='bulk',
+                    task='classification',
+                    texts=[doc.text for doc in llm_documents]
+                )
+                
+                print(f"Batch LLM classification for {len(llm_documents)} documents")
+                results = analyzer.analyze_documents_batch(
+                    llm_documents, batch_size=max(1, batch_size)
+                )
+                
+                return Response({
+                    'results': results,
+                    'total_documents_analyzed': len(llm_documents),
+                    'model_used': analyzer.model_name,
+                    'model_routing': analyzer.routing
+                })
+                
+            except LLMOverloadedError as e:
+                return overloaded_response(e)
+            except Exception as e:
+                return Response(
+                    {'error': f'Ошибка классификации документов: {str(e)}'},
+                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                )
+        
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class LLMSessionRefinementView(APIView):
+    """
+    Инкрементальное добавление документов в существующую сессию LLM анализа:
+    LLM получает только новые документы и компактный список тем сессии
+    """
+    
+    def post(self, request):
+        session_id = request.data.get('session_id')
+        if not session_id:
+            return Response(
+                {'error': 'Необходим session_id'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        serializer = TextDocumentUploadSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            session = AnalysisSession.objects.get(id=session_id)
+            return self.perform_refinement(session, serializer.validated_data['documents'])
+        except AnalysisSession.DoesNotExist:
+            return Response(
+                {'error': 'Сессия анализа не найдена'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        except LLMOverloadedError as e:
+            return overloaded_response(e)
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            return Response(
+                {'error': f'Ошибка при обновлении анализа: {str(e)}'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+    
+    def perform_refinement(self, session, documents_data):
+        """
+        Сохранение новых документов, уточнение тем и слияние с TopicResult сессии
+        """
+        # Сохраняем новые документы и добавляем их в сессию (короткая транзакция)
+        with transaction.atomic():
+            text_documents = ingest_documents(documents_data)
+            session.documents.add(*text_documents)
+        
+        topic_results = {str(tr.id): tr for tr in session.topic_results.all()}
+        existing_topics = [
+            {
+                'id': tr_id,
+                'name': tr.topic_name,
+                'keywords': tr.topic_keywords,
+                'confidence': tr.confidence_score
+            }
+            for tr_id, tr in topic_results.items()
+        ]
+        
+        llm_documents = [
+            Document(
+                id=f"new_{i+1}",
+                date=str(doc.date),
+                theme=doc.theme,
+                text=doc.text
+            )
+            for i, doc in enumerate(text_documents)
+        ]
+        doc_dict = {llm_doc.id: doc for llm_doc, doc in zip(llm_documents, text_documents)}
+        
+        analyzer = build_llm_analyzer(
+            priority='bulk',
+            task='refinement',
+            texts=[doc.text for doc in llm_documents]
+        )
+        
+        # Обращение к LLM - вне транзакции
+        print(f"Refining session {session.id} with {len(llm_documents)} new documents")
+        delta = analyzer.refine_topics(existing_topics, llm_documents)
+        
+        with transaction.atomic():
+            # Темы перечитываются с блокировкой: за время запроса к LLM их могли изменить
+            topic_results = {str(tr.id): tr for tr in session.topic_results.select_for_update()}
+            
+            # Решение о модели сохраняется для каждого обновления сессии
+            session.metadata.setdefault('refinement_routing', []).append(analyzer.routing)
+            session.save(update_fields=['metadata'])
+            
+            updated, created, touched = self.merge_topic_updates(session, topic_results, delta, doc_dict)
+            
+            # Дневные счетчики: итоги сессии и затронутые темы
+            rebuild_daily_counts(session, topic_ids=touched)
+            
+            # Сохраненное распределение не покрывает новые документы и темы
+            # (уточнение не дает весов тем) - оно удаляется, а не остается неполным
+            dropped, _ = TopicDistribution.objects.filter(session=session).delete()
+            if dropped:
+                print(f"Dropped topic distribution of session {session.id} after refinement")
+        
+        return Response({
+            'session_id': session.id,
+            'session_name': session.name,
+            'new_documents': len(text_documents),
+            'topics_updated': updated,
+            'topics_created': created,
+            'unassigned_documents': len(delta['unassigned_document_ids']),
+            'topic_statistics': [
+                {
+                    'topic_name': tr.topic_name,
+                    'keywords': tr.topic_keywords,
+                    'document_count': tr.document_count,
+                    'average_confidence': tr.confidence_score
+                }
+                for tr in session.topic_results.all()
+            ]
+        }, status=status.HTTP_200_OK)
+    
+    def merge_topic_updates(self, session, topic_results, delta, doc_dict):
+        """
+        Слияние updated_topics с сохраненными темами: существующие темы
+        обновляются и получают новые документы, новые темы создаются.
+        Темы и связи собираются в памяти и записываются пачками; уверенность
+        отнесения нового документа - уверенность темы в ответе LLM.
+        Возвращает (обновлено, создано, id затронутых тем)
+        """
+        new_topics = []
+        changed = []
+        links = []
+        for topic_data in delta['updated_topics']:
+            topic_documents = [doc_dict[doc_id] for doc_id in topic_data['document_ids'] if doc_id in doc_dict]
+            topic_result = topic_results.get(topic_data['id']) if topic_data['id'] else None
+            
+            if topic_result is None:
+                if topic_documents:
+                    confidence = topic_data.get('confidence', 0.7)
+                    new_topics.append({
+                        'topic_name': topic_data['name'][:200],
+                        'topic_keywords': topic_data['keywords'][:10],
+                        'confidence_score': confidence,
+                        'documents': topic_documents,
+                        'confidences': [confidence] * len(topic_documents)
+                    })
+                continue
+            
+            topic_result.topic_name = topic_data['name'][:200]
+            if topic_data['keywords']:
+                topic_result.topic_keywords = topic_data['keywords'][:10]
+            topic_result.confidence_score = topic_data.get('confidence', topic_result.confidence_score)
+            links.extend(topic_document_links(
+                topic_result.id, topic_documents, [topic_result.confidence_score] * len(topic_documents)
+            ))
+            if topic_result not in changed:
+                changed.append(topic_result)
+        
+        created = create_topic_results(session, new_topics)
+        # Документ, уже связанный с темой (совпал по содержимому), повторно не добавляется
+        TopicDocument.objects.bulk_create(links, batch_size=20000, ignore_conflicts=True)
+        
+        counts = dict(
+            TopicDocument.objects.filter(topic__in=changed)
+            .values('topic_id').annotate(count=Count('id')).values_list('topic_id', 'count')
+        )
+        for topic_result in changed:
+            topic_result.document_count = counts.get(topic_result.id, 0)
+        TopicResult.objects.bulk_update(
+            changed, ['topic_name', 'topic_keywords', 'confidence_score', 'document_count']
+        )
+        
+        return len(changed), len(created), [topic.id for topic in changed + created]
+
+
+class LLMBackendStatusView(APIView):
+    """
+    Состояние пула LLM бэкендов: загрузка, лимиты, модели, состояние цепи
+    """
+    
+    def get(self, request):
+        analyzer = build_llm_analyzer()
+        backends = analyzer.pool.status()
+        return Response({
+            'model_name': analyzer.model_name,
+            'available': analyzer.pool.is_available(analyzer.model_name),
+            'backends': backends
+        })
+
+
+class LLMSchedulerStatusView(APIView):
+    """
+    Состояние планировщика LLM: занятые слоты, очереди и время ожидания по классам приоритета
+    """
+    
+    def get(self, request):
+        return Response(get_scheduler(LLMConfig.SCHEDULER).status())
+
+
+class LLMModelResidencyView(APIView):
+    """
+    Какие модели загружены в память бэкендов Ollama; POST запускает прогрев
+    """
+    
+    def get(self, request):
+        warmer = get_model_warmer()
+        return Response({
+            'models': warmer.models,
+            'keep_alive': warmer.keep_alive,
+            'last_warmup': warmer.last_warmup,
+            'backends': warmer.residency()
+        })
+    
+    def post(self, request):
+        warmer = get_model_warmer()
+        results = warmer.warm_up()
+        return Response({
+            'warmed': results,
+            'backends': warmer.residency()
+        })
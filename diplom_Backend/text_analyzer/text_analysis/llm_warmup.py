@@ -0,0 +1,161 @@
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import requests
+
+from .llm_pool import LLMBackendPool, get_backend_pool
+
+
+class ModelWarmer:
+    """
+    Прогрев моделей Ollama: загрузка в память при старте сервера и
+    периодическое продление keep_alive, чтобы первый пользовательский
+    запрос не ждал загрузки модели.
+    """
+
+    def __init__(self, pool: LLMBackendPool, models: List[str], keep_alive: str = "30m",
+                 interval: float = 600, timeout: float = 120):
+        """
+        Args:
+            pool: Пул бэкендов, на которых прогреваются модели
+            models: Модели для прогрева
+            keep_alive: Сколько Ollama держит модель в памяти после запроса
+            interval: Период продления keep_alive (сек), меньше keep_alive
+            timeout: Таймаут запроса прогрева (загрузка модели может быть долгой)
+        """
+        self.pool = pool
+        self.models = list(dict.fromkeys(models))
+        self.keep_alive = keep_alive
+        self.interval = interval
+        self.timeout = timeout
+        self.last_warmup: Dict[str, str] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def warm_model(self, url: str, model: str) -> bool:
+        """
+        Загрузка модели на бэкенд: запрос без промпта загружает модель
+        и продлевает ее keep_alive
+        """
+        try:
+            response = requests.post(
+                f"{url}/api/generate",
+                json={"model": model, "prompt": "", "keep_alive": self.keep_alive},
+                timeout=self.timeout
+            )
+            ok = response.status_code == 200
+            if not ok:
+                print(f"Warm-up of {model} on {url} failed: {response.status_code}")
+            return ok
+        except requests.RequestException as e:
+            print(f"Warm-up of {model} on {url} error: {e}")
+            return False
+
+    def warm_up(self) -> Dict[str, bool]:
+        """Прогрев всех моделей на всех обслуживающих их бэкендах"""
+        results = {}
+        for model in self.models:
+            for backend in self.pool.backends_for(model):
+                if backend.health.is_open():
+                    continue
+                key = f"{backend.url}|{model}"
+                results[key] = self.warm_model(backend.url, model)
+                if results[key]:
+                    self.last_warmup[key] = datetime.now().isoformat(timespec='seconds')
+        print(f"Model warm-up: {sum(results.values())}/{len(results)} models resident")
+        return results
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.warm_up()
+            self._stop.wait(self.interval)
+
+    def start(self):
+        """Фоновый прогрев: сразу и затем каждые interval секунд"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="llm-model-warmer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def residency(self) -> List[Dict]:
+        """
+        Какие модели сейчас загружены в память бэкендов (Ollama /api/ps)
+        """
+        status = []
+        for backend in self.pool.backends:
+            info = {"url": backend.url, "reachable": False, "loaded": [], "warm": {}}
+            try:
+                response = requests.get(f"{backend.url}/api/ps", timeout=2)
+                if response.status_code == 200:
+                    info["reachable"] = True
+                    info["loaded"] = [
+                        {
+                            "name": model.get("name"),
+                            "size_vram": model.get("size_vram"),
+                            "expires_at": model.get("expires_at")
+                        }
+                        for model in response.json().get("models", [])
+                    ]
+            except requests.RequestException as e:
+                print(f"Residency check for {backend.url} failed: {e}")
+
+            loaded_names = {model["name"] for model in info["loaded"]}
+            for model in self.models:
+                if backend.serves(model):
+                    # Ollama добавляет тег ':latest' к моделям без тега
+                    info["warm"][model] = model in loaded_names or f"{model}:latest" in loaded_names
+            status.append(info)
+        return status
+
+
+_warmer: Optional[ModelWarmer] = None
+_warmer_lock = threading.Lock()
+
+
+def get_model_warmer() -> ModelWarmer:
+    """
+    Общий для процесса прогрев моделей по LLM_CONFIG['WARMUP']
+    """
+    global _warmer
+    from .llm_config import LLMConfig
+
+    with _warmer_lock:
+        if _warmer is None:
+            warmup = LLMConfig.WARMUP
+            routing = LLMConfig.MODEL_ROUTING
+            models = warmup.get('MODELS') or [LLMConfig.MODEL_NAME]
+            if not warmup.get('MODELS') and routing.get('ENABLED'):
+                models += [
+                    routing.get('SMALL_MODEL', LLMConfig.MODEL_NAME),
+                    routing.get('LARGE_MODEL', LLMConfig.MODEL_NAME),
+                ]
+            pool = get_backend_pool(
+                LLMConfig.BACKENDS or [{'URL': LLMConfig.OLLAMA_URL}],
+                failure_threshold=LLMConfig.CIRCUIT_FAILURE_THRESHOLD,
+                reset_timeout=LLMConfig.CIRCUIT_RESET_TIMEOUT
+            )
+            _warmer = ModelWarmer(
+                pool,
+                models,
+                keep_alive=LLMConfig.KEEP_ALIVE or "30m",
+                interval=warmup.get('INTERVAL', 600)
+            )
+        return _warmer
+
+
+def start_model_warmup():
+    """
+    Запуск фонового прогрева при старте сервера (wsgi/asgi), если он включен
+    """
+    from .llm_config import LLMConfig
+
+    if not LLMConfig.WARMUP.get('ENABLED'):
+        return None
+    warmer = get_model_warmer()
+    warmer.start()
+    return warmer
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('text_analysis', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analysissession',
+            name='metadata',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Параметры анализа'),
+        ),
+    ]
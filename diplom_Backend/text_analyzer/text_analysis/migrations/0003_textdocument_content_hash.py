@@ -0,0 +1,90 @@
+import hashlib
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def _content_hash(date, theme, text):
+    return hashlib.sha256(f"{date.isoformat()}|{theme}|{text}".encode('utf-8')).hexdigest()
+
+
+def backfill_and_collapse(apps, schema_editor):
+    """
+    Заполнение хешей и слияние одинаковых документов: связи сессий и тем
+    переносятся на документ с наименьшим id, дубликаты удаляются
+    """
+    TextDocument = apps.get_model('text_analysis', 'TextDocument')
+    AnalysisSession = apps.get_model('text_analysis', 'AnalysisSession')
+    TopicResult = apps.get_model('text_analysis', 'TopicResult')
+    SessionDocuments = AnalysisSession.documents.through
+    TopicDocuments = TopicResult.documents.through
+
+    batch = []
+    for document in TextDocument.objects.order_by('id').iterator(chunk_size=2000):
+        document.content_hash = _content_hash(document.date, document.theme, document.text)
+        batch.append(document)
+        if len(batch) >= 2000:
+            TextDocument.objects.bulk_update(batch, ['content_hash'])
+            batch = []
+    if batch:
+        TextDocument.objects.bulk_update(batch, ['content_hash'])
+
+    duplicates = (
+        TextDocument.objects.values('content_hash')
+        .annotate(copies=Count('id'), keeper=Min('id'))
+        .filter(copies__gt=1)
+    )
+    affected_topics = set()
+    collapsed = 0
+    for group in duplicates.iterator():
+        keeper = group['keeper']
+        duplicate_ids = list(
+            TextDocument.objects.filter(content_hash=group['content_hash'])
+            .exclude(id=keeper).values_list('id', flat=True)
+        )
+
+        session_ids = set(
+            SessionDocuments.objects.filter(textdocument_id__in=duplicate_ids)
+            .values_list('analysissession_id', flat=True)
+        )
+        SessionDocuments.objects.bulk_create(
+            [SessionDocuments(analysissession_id=session_id, textdocument_id=keeper) for session_id in session_ids],
+            ignore_conflicts=True
+        )
+
+        topic_ids = set(
+            TopicDocuments.objects.filter(textdocument_id__in=duplicate_ids)
+            .values_list('topicresult_id', flat=True)
+        )
+        TopicDocuments.objects.bulk_create(
+            [TopicDocuments(topicresult_id=topic_id, textdocument_id=keeper) for topic_id in topic_ids],
+            ignore_conflicts=True
+        )
+        affected_topics.update(topic_ids)
+
+        TextDocument.objects.filter(id__in=duplicate_ids).delete()
+        collapsed += len(duplicate_ids)
+
+    # Количество документов тем, где слились дубликаты, пересчитывается
+    for topic in TopicResult.objects.filter(id__in=affected_topics):
+        topic.document_count = TopicDocuments.objects.filter(topicresult_id=topic.id).count()
+        topic.save(update_fields=['document_count'])
+
+    if collapsed:
+        print(f"\n  Collapsed {collapsed} duplicate documents")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('text_analysis', '0002_analysissession_metadata'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='textdocument',
+            name='content_hash',
+            field=models.CharField(editable=False, max_length=64, null=True, verbose_name='Хеш содержимого'),
+        ),
+        migrations.RunPython(backfill_and_collapse, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Уникальность включается отдельной миграцией: в PostgreSQL таблицу нельзя
+    # изменять в той же транзакции, где удалялись дубликаты
+
+    dependencies = [
+        ('text_analysis', '0003_textdocument_content_hash'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='textdocument',
+            name='content_hash',
+            field=models.CharField(editable=False, max_length=64, unique=True, verbose_name='Хеш содержимого'),
+        ),
+    ]
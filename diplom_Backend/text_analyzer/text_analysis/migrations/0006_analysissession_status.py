@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('text_analysis', '0005_analysisjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analysissession',
+            name='status',
+            field=models.CharField(choices=[('running', 'Выполняется'), ('completed', 'Завершен'), ('failed', 'Ошибка')], default='completed', max_length=20, verbose_name='Статус анализа'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """
+    Явная модель связи TopicResult.documents поверх существующей таблицы
+    text_analysis_topicresult_documents (данные не переносятся) и
+    колонка уверенности отнесения документа к теме.
+    """
+
+    dependencies = [
+        ('text_analysis', '0006_analysissession_status'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='TopicDocument',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('topic', models.ForeignKey(db_column='topicresult_id', on_delete=django.db.models.deletion.CASCADE, related_name='document_links', to='text_analysis.topicresult', verbose_name='Тема')),
+                        ('document', models.ForeignKey(db_column='textdocument_id', on_delete=django.db.models.deletion.CASCADE, related_name='topic_links', to='text_analysis.textdocument', verbose_name='Документ')),
+                    ],
+                    options={
+                        'verbose_name': 'Документ темы',
+                        'verbose_name_plural': 'Документы тем',
+                        'db_table': 'text_analysis_topicresult_documents',
+                        'unique_together': {('topic', 'document')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='topicresult',
+                    name='documents',
+                    field=models.ManyToManyField(related_name='assigned_topics', through='text_analysis.TopicDocument', to='text_analysis.textdocument', verbose_name='Документы в теме'),
+                ),
+            ],
+            database_operations=[],
+        ),
+        migrations.AddField(
+            model_name='topicdocument',
+            name='confidence',
+            field=models.FloatField(blank=True, null=True, verbose_name='Уверенность отнесения'),
+        ),
+    ]
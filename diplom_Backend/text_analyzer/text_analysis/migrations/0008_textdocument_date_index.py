@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('text_analysis', '0007_topicdocument'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='textdocument',
+            index=models.Index(fields=['date'], name='textdocument_date'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_daily_counts(apps, schema_editor):
+    """
+    Дневные счетчики для уже сохраненных сессий
+    """
+    AnalysisSession = apps.get_model('text_analysis', 'AnalysisSession')
+    TopicDocument = apps.get_model('text_analysis', 'TopicDocument')
+    TopicDailyCount = apps.get_model('text_analysis', 'TopicDailyCount')
+    SessionDocuments = AnalysisSession.documents.through
+
+    rows = [
+        TopicDailyCount(session_id=day['analysissession_id'], date=day['textdocument__date'], document_count=day['count'])
+        for day in SessionDocuments.objects.values('analysissession_id', 'textdocument__date')
+        .annotate(count=Count('id')).order_by()
+    ]
+    rows += [
+        TopicDailyCount(
+            session_id=day['topic__session_id'], topic_id=day['topic_id'],
+            date=day['document__date'], document_count=day['count']
+        )
+        for day in TopicDocument.objects.values('topic__session_id', 'topic_id', 'document__date')
+        .annotate(count=Count('id')).order_by()
+    ]
+    TopicDailyCount.objects.bulk_create(rows, batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('text_analysis', '0008_textdocument_date_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TopicDailyCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('document_count', models.IntegerField(verbose_name='Количество документов')),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_counts', to='text_analysis.analysissession', verbose_name='Сессия анализа')),
+                ('topic', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='daily_counts', to='text_analysis.topicresult', verbose_name='Тема')),
+            ],
+            options={
+                'verbose_name': 'Документы темы за день',
+                'verbose_name_plural': 'Документы тем по дням',
+                'indexes': [models.Index(fields=['session', 'date'], name='topicdailycount_session_date')],
+            },
+        ),
+        migrations.RunPython(backfill_daily_counts, migrations.RunPython.noop),
+    ]
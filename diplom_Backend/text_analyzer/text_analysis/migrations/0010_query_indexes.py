@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('text_analysis', '0009_topicdailycount'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='analysissession',
+            index=models.Index(fields=['-created_at', '-id'], name='analysissession_created'),
+        ),
+        migrations.AddIndex(
+            model_name='analysissession',
+            index=models.Index(fields=['status', 'created_at'], name='analysissession_status_created'),
+        ),
+        migrations.AddIndex(
+            model_name='textdocument',
+            index=models.Index(fields=['theme', 'date'], name='textdocument_theme_date'),
+        ),
+        migrations.AddIndex(
+            model_name='textdocument',
+            index=models.Index(fields=['-created_at', '-id'], name='textdocument_created'),
+        ),
+        migrations.AddIndex(
+            model_name='topicdocument',
+            index=models.Index(fields=['document', 'topic'], name='topicdocument_document_topic'),
+        ),
+        migrations.AddIndex(
+            model_name='topicresult',
+            index=models.Index(fields=['session', 'topic_name'], name='topicresult_session_name'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('text_analysis', '0010_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TopicDistribution',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('n_documents', models.IntegerField(verbose_name='Количество документов')),
+                ('n_topics', models.IntegerField(verbose_name='Количество тем')),
+                ('dtype', models.CharField(default='float16', max_length=10, verbose_name='Тип весов')),
+                ('matrix', models.BinaryField(verbose_name='Матрица весов тем')),
+                ('document_ids', models.BinaryField(verbose_name='ID документов по строкам')),
+                ('topic_ids', models.JSONField(default=list, verbose_name='ID тем по столбцам')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('session', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='topic_distribution', to='text_analysis.analysissession', verbose_name='Сессия анализа')),
+            ],
+            options={
+                'verbose_name': 'Распределение документов по темам',
+                'verbose_name_plural': 'Распределения документов по темам',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('text_analysis', '0011_topicdistribution'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analysisjob',
+            name='run_after',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Повтор не раньше'),
+        ),
+    ]
@@ -1,6 +1,17 @@
+import hashlib
+
 from django.db import models
 from django.contrib.postgres.fields import ArrayField
 
+
+def compute_content_hash(date, theme, text):
+    """
+    Хеш содержимого документа (дата, тематика, текст) для поиска одинаковых документов
+    """
+    date = TextDocument._meta.get_field('date').to_python(date)
+    return hashlib.sha256(f"{date.isoformat()}|{theme}|{text}".encode('utf-8')).hexdigest()
+
+
 class TextDocument(models.Model):
     """
     Модель для хранения исходных текстовых документов.
@@ -10,11 +21,26 @@ class TextDocument(models.Model):
     theme = models.CharField(max_length=200, verbose_name='Исходная тематика')
     text = models.TextField(verbose_name='Текст')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
+    content_hash = models.CharField(
+        max_length=64, unique=True, editable=False, verbose_name='Хеш содержимого'
+    )
     
     class Meta:
         verbose_name = 'Текстовый документ'
         verbose_name_plural = 'Текстовые документы'
         ordering = ['-created_at']
+        indexes = [
+            # Отбор документов по периоду (справки за диапазон дат)
+            models.Index(fields=['date'], name='textdocument_date'),
+            # Период внутри исходной тематики
+            models.Index(fields=['theme', 'date'], name='textdocument_theme_date'),
+            # Список документов (ordering) и постраничная выдача по ключу (created_at, id)
+            models.Index(fields=['-created_at', '-id'], name='textdocument_created'),
+        ]
+    
+    def save(self, *args, **kwargs):
+        self.content_hash = compute_content_hash(self.date, self.theme, self.text)
+        super().save(*args, **kwargs)
     
     def __str__(self):
         return f"Документ от {self.date} - {self.theme}"
@@ -24,16 +50,35 @@ class AnalysisSession(models.Model):
     Модель для хранения сессий анализа.
     Содержит информацию о когда и какие тексты анализировались.
     """
+    STATUS_RUNNING = 'running'
+    STATUS_COMPLETED = 'completed'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_RUNNING, 'Выполняется'),
+        (STATUS_COMPLETED, 'Завершен'),
+        (STATUS_FAILED, 'Ошибка'),
+    ]
+
     name = models.CharField(max_length=200, verbose_name='Название сессии')
     description = models.TextField(blank=True, verbose_name='Описание')
     documents = models.ManyToManyField(TextDocument, verbose_name='Анализируемые документы')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
     algorithm_used = models.CharField(max_length=100, default='bayesian', verbose_name='Использованный алгоритм')
+    metadata = models.JSONField(default=dict, blank=True, verbose_name='Параметры анализа')
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default=STATUS_COMPLETED, verbose_name='Статус анализа'
+    )
     
     class Meta:
         verbose_name = 'Сессия анализа'
         verbose_name_plural = 'Сессии анализа'
         ordering = ['-created_at']
+        indexes = [
+            # Список сессий (ordering) и постраничная выдача по ключу (created_at, id)
+            models.Index(fields=['-created_at', '-id'], name='analysissession_created'),
+            # Поиск прерванных сессий (status = running)
+            models.Index(fields=['status', 'created_at'], name='analysissession_status_created'),
+        ]
     
     def __str__(self):
         return f"Анализ: {self.name}"
@@ -57,6 +102,7 @@ class TopicResult(models.Model):
     document_count = models.IntegerField(verbose_name='Количество документов')
     documents = models.ManyToManyField(
         TextDocument, 
+        through='TopicDocument',
         related_name='assigned_topics',
         verbose_name='Документы в теме'
     )
@@ -65,6 +111,165 @@ class TopicResult(models.Model):
     class Meta:
         verbose_name = 'Результат тематического анализа'
         verbose_name_plural = 'Результаты тематического анализа'
+        indexes = [
+            # Тема сессии по названию (справки по теме)
+            models.Index(fields=['session', 'topic_name'], name='topicresult_session_name'),
+        ]
     
     def __str__(self):
-        return f"Тема: {self.topic_name} ({self.document_count} документов)"
\ No newline at end of file
+        return f"Тема: {self.topic_name} ({self.document_count} документов)"
+
+class TopicDocument(models.Model):
+    """
+    Связь темы и документа с уверенностью отнесения документа к теме.
+    Использует таблицу прежней автоматической связи TopicResult.documents.
+    """
+    topic = models.ForeignKey(
+        TopicResult,
+        on_delete=models.CASCADE,
+        db_column='topicresult_id',
+        related_name='document_links',
+        verbose_name='Тема'
+    )
+    document = models.ForeignKey(
+        TextDocument,
+        on_delete=models.CASCADE,
+        db_column='textdocument_id',
+        related_name='topic_links',
+        verbose_name='Документ'
+    )
+    confidence = models.FloatField(null=True, blank=True, verbose_name='Уверенность отнесения')
+
+    class Meta:
+        db_table = 'text_analysis_topicresult_documents'
+        unique_together = [('topic', 'document')]
+        indexes = [
+            # Темы документа; уникальный индекс (topic, document) обслуживает обратное направление
+            models.Index(fields=['document', 'topic'], name='topicdocument_document_topic'),
+        ]
+        verbose_name = 'Документ темы'
+        verbose_name_plural = 'Документы тем'
+
+    def __str__(self):
+        return f"{self.topic_id} - {self.document_id}"
+
+class AnalysisJob(models.Model):
+    """
+    Модель фоновой задачи анализа.
+    Задача ставится в очередь запросом API и выполняется отдельным
+    процессом-обработчиком (run_worker.py), а клиент опрашивает статус.
+    """
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'В очереди'),
+        (STATUS_RUNNING, 'Выполняется'),
+        (STATUS_DONE, 'Завершена'),
+        (STATUS_FAILED, 'Ошибка'),
+    ]
+    KIND_CHOICES = [
+        ('topic_analysis', 'Тематический анализ'),
+        ('llm_topic_analysis', 'Тематический анализ с LLM'),
+    ]
+
+    kind = models.CharField(max_length=50, choices=KIND_CHOICES, verbose_name='Тип задачи')
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED, verbose_name='Статус'
+    )
+    params = models.JSONField(default=dict, blank=True, verbose_name='Параметры запроса')
+    result = models.JSONField(null=True, blank=True, verbose_name='Результат')
+    error = models.TextField(blank=True, verbose_name='Ошибка')
+    progress = models.FloatField(default=0.0, verbose_name='Прогресс')
+    progress_message = models.CharField(max_length=200, blank=True, verbose_name='Этап')
+    session = models.ForeignKey(
+        AnalysisSession,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='jobs',
+        verbose_name='Сессия анализа'
+    )
+    worker = models.CharField(max_length=100, blank=True, verbose_name='Обработчик')
+    attempts = models.IntegerField(default=0, verbose_name='Попыток')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name='Начало выполнения')
+    heartbeat_at = models.DateTimeField(null=True, blank=True, verbose_name='Последний сигнал обработчика')
+    run_after = models.DateTimeField(null=True, blank=True, verbose_name='Повтор не раньше')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='Окончание выполнения')
+
+    class Meta:
+        verbose_name = 'Задача анализа'
+        verbose_name_plural = 'Задачи анализа'
+        ordering = ['-created_at']
+        indexes = [
+            # Выборка следующей задачи обработчиком
+            models.Index(fields=['status', 'created_at'], name='analysisjob_status_created'),
+        ]
+
+    def __str__(self):
+        return f"Задача {self.id}: {self.kind} ({self.status})"
+
+
+class TopicDailyCount(models.Model):
+    """
+    Материализованное количество документов по дням для графиков и справок
+    за период: по теме сессии или (topic = NULL) по всем документам сессии.
+    Пересчитывается при сохранении результатов и изменении сессии.
+    """
+    session = models.ForeignKey(
+        AnalysisSession,
+        on_delete=models.CASCADE,
+        related_name='daily_counts',
+        verbose_name='Сессия анализа'
+    )
+    topic = models.ForeignKey(
+        TopicResult,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='daily_counts',
+        verbose_name='Тема'
+    )
+    date = models.DateField(verbose_name='Дата')
+    document_count = models.IntegerField(verbose_name='Количество документов')
+
+    class Meta:
+        verbose_name = 'Документы темы за день'
+        verbose_name_plural = 'Документы тем по дням'
+        indexes = [
+            models.Index(fields=['session', 'date'], name='topicdailycount_session_date'),
+        ]
+
+    def __str__(self):
+        return f"{self.date}: {self.document_count} документов"
+
+
+class TopicDistribution(models.Model):
+    """
+    Распределение документов сессии по темам в компактном виде:
+    матрица весов (документы x темы) float16/float32 и id документов
+    int64 хранятся бинарными блоками, строки - в порядке анализа.
+    Позволяет переотносить документы и искать второстепенные темы без повторного анализа.
+    """
+    session = models.OneToOneField(
+        AnalysisSession,
+        on_delete=models.CASCADE,
+        related_name='topic_distribution',
+        verbose_name='Сессия анализа'
+    )
+    n_documents = models.IntegerField(verbose_name='Количество документов')
+    n_topics = models.IntegerField(verbose_name='Количество тем')
+    dtype = models.CharField(max_length=10, default='float16', verbose_name='Тип весов')
+    matrix = models.BinaryField(verbose_name='Матрица весов тем')
+    document_ids = models.BinaryField(verbose_name='ID документов по строкам')
+    topic_ids = models.JSONField(default=list, verbose_name='ID тем по столбцам')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
+
+    class Meta:
+        verbose_name = 'Распределение документов по темам'
+        verbose_name_plural = 'Распределения документов по темам'
+
+    def __str__(self):
+        return f"Распределение сессии {self.session_id}: {self.n_documents}x{self.n_topics}"
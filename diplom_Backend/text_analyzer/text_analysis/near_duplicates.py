@@ -0,0 +1,120 @@
+import re
+import zlib
+import numpy as np
+from typing import List, Dict
+
+
+class NearDuplicateDetector:
+    """
+    Поиск почти одинаковых документов (репосты, мелкие правки) с помощью MinHash + LSH
+    """
+
+    # Простое число Мерсенна для универсального хеширования
+    _PRIME = (1 << 61) - 1
+    _MAX_HASH = (1 << 32) - 1
+
+    def __init__(self, threshold: float = 0.85, num_perm: int = 128,
+                 shingle_size: int = 3, seed: int = 42):
+        """
+        Args:
+            threshold: Порог сходства Жаккара для объединения документов
+            num_perm: Количество хеш-функций в MinHash сигнатуре
+            shingle_size: Длина шингла в словах
+            seed: Зерно генератора для воспроизводимости
+        """
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, self._MAX_HASH, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, self._MAX_HASH, size=num_perm, dtype=np.uint64)
+
+        self.bands, self.rows = self._choose_bands(threshold, num_perm)
+
+    @staticmethod
+    def _choose_bands(threshold: float, num_perm: int):
+        """Подбор числа полос LSH так, чтобы порог срабатывания был близок к заданному"""
+        best = (num_perm, 1)
+        best_error = float("inf")
+        for rows in range(1, num_perm + 1):
+            if num_perm % rows:
+                continue
+            bands = num_perm // rows
+            # Приблизительный порог S-кривой LSH: (1/b)^(1/r)
+            error = abs((1.0 / bands) ** (1.0 / rows) - threshold)
+            if error < best_error:
+                best_error = error
+                best = (bands, rows)
+        return best
+
+    def _shingles(self, text: str) -> np.ndarray:
+        """Множество хешей словесных шинглов документа"""
+        words = re.findall(r'\w+', text.lower())
+        if len(words) < self.shingle_size:
+            shingles = {" ".join(words)}
+        else:
+            shingles = {
+                " ".join(words[i:i + self.shingle_size])
+                for i in range(len(words) - self.shingle_size + 1)
+            }
+        return np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) for s in shingles),
+            dtype=np.uint64,
+            count=len(shingles)
+        )
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash сигнатура документа"""
+        hashes = self._shingles(text)
+        # (a * x + b) mod p для всех хеш-функций сразу
+        permuted = (np.outer(hashes, self._a) + self._b) % np.uint64(self._PRIME)
+        return (permuted & np.uint64(self._MAX_HASH)).min(axis=0)
+
+    def group(self, texts: List[str]) -> List[List[int]]:
+        """
+        Группировка почти одинаковых текстов
+
+        Returns:
+            Список групп индексов; первый индекс группы - представитель,
+            группы упорядочены по позиции представителя
+        """
+        if not texts:
+            return []
+
+        signatures = np.vstack([self.signature(text) for text in texts])
+        parent = list(range(len(texts)))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        # LSH: документы с совпадающей полосой становятся кандидатами
+        for band in range(self.bands):
+            buckets: Dict[bytes, List[int]] = {}
+            band_slice = signatures[:, band * self.rows:(band + 1) * self.rows]
+            for idx, row in enumerate(band_slice):
+                buckets.setdefault(row.tobytes(), []).append(idx)
+
+            # Проверяются все пары корзины: ложный кандидат не должен
+            # заслонять настоящие пары, найденные в этой же полосе
+            for candidates in buckets.values():
+                if len(candidates) < 2 or len({find(idx) for idx in candidates}) == 1:
+                    continue
+                for position, first in enumerate(candidates[:-1]):
+                    others = candidates[position + 1:]
+                    # Оценка сходства Жаккара по полной сигнатуре сразу для всех пар
+                    similarities = (signatures[others] == signatures[first]).mean(axis=1)
+                    for match in np.flatnonzero(similarities >= self.threshold):
+                        other = others[match]
+                        root_first, root_other = find(first), find(other)
+                        if root_first != root_other:
+                            parent[max(root_first, root_other)] = min(root_first, root_other)
+
+        groups: Dict[int, List[int]] = {}
+        for idx in range(len(texts)):
+            groups.setdefault(find(idx), []).append(idx)
+
+        return [groups[root] for root in sorted(groups)]
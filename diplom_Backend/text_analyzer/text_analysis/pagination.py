@@ -0,0 +1,32 @@
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from rest_framework.pagination import CursorPagination
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Постраничная выдача по ключу (created_at, id) вместо OFFSET:
+    следующая страница - WHERE created_at < <курсор> по индексу,
+    поэтому стоимость страницы не зависит от ее номера и размера таблицы.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+def ndjson_response(rows, filename: str, chunk_size: int = 2000) -> StreamingHttpResponse:
+    """
+    Потоковая выгрузка строк (словарей из QuerySet.values()) в формате
+    NDJSON: одна JSON строка на запись, строки читаются из БД пачками
+    через iterator() без загрузки всей таблицы в память
+    """
+    def lines():
+        for row in rows.iterator(chunk_size=chunk_size):
+            yield json.dumps(row, ensure_ascii=False, cls=DjangoJSONEncoder) + '\n'
+
+    response = StreamingHttpResponse(lines(), content_type='application/x-ndjson; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import TextDocument, AnalysisSession, TopicResult
+from .models import TextDocument, AnalysisSession, TopicResult, AnalysisJob, compute_content_hash
 
 class TextDocumentSerializer(serializers.ModelSerializer):
     """
@@ -11,6 +11,30 @@ class TextDocumentSerializer(serializers.ModelSerializer):
         fields = ['id', 'date', 'theme', 'text', 'created_at']
         read_only_fields = ['id', 'created_at']
 
+    def validate(self, attrs):
+        """
+        Изменение документа: строка, общая для нескольких сессий (после
+        дедупликации), не редактируется на месте, а новое содержимое
+        не должно совпадать с другим сохраненным документом
+        """
+        if self.instance is None:
+            return attrs
+
+        if self.instance.analysissession_set.count() > 1:
+            raise serializers.ValidationError(
+                "Документ используется в нескольких сессиях анализа и не может быть изменен"
+            )
+        content_hash = compute_content_hash(
+            attrs.get('date', self.instance.date),
+            attrs.get('theme', self.instance.theme),
+            attrs.get('text', self.instance.text)
+        )
+        if TextDocument.objects.filter(content_hash=content_hash).exclude(pk=self.instance.pk).exists():
+            raise serializers.ValidationError(
+                "Документ с такой датой, тематикой и текстом уже существует"
+            )
+        return attrs
+
 class TextDocumentUploadSerializer(serializers.Serializer):
     """
     Сериализатор для загрузки текстовых документов.
@@ -42,10 +66,14 @@ class AnalysisSessionSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = AnalysisSession
-        fields = ['id', 'name', 'description', 'document_count', 'created_at', 'algorithm_used']
-        read_only_fields = ['id', 'created_at']
+        fields = ['id', 'name', 'description', 'document_count', 'created_at', 'algorithm_used', 'metadata', 'status']
+        read_only_fields = ['id', 'created_at', 'metadata', 'status']
     
     def get_document_count(self, obj):
+        # В списках количество уже посчитано в запросе (AnalysisSessionViewSet.queryset)
+        document_count = getattr(obj, 'document_count', None)
+        if document_count is not None:
+            return document_count
         return obj.documents.count()
 
 class TopicResultSerializer(serializers.ModelSerializer):
@@ -87,4 +115,33 @@ class AnalysisResultSerializer(serializers.Serializer):
     analysis_metadata = serializers.DictField()
     
     class Meta:
-        fields = ['session_id', 'session_name', 'topic_statistics', 'analysis_metadata']
\ No newline at end of file
+        fields = ['session_id', 'session_name', 'topic_statistics', 'analysis_metadata']
+
+class AnalysisJobSerializer(serializers.ModelSerializer):
+    """
+    Сериализатор статуса фоновой задачи анализа (без параметров и результата).
+    """
+    class Meta:
+        model = AnalysisJob
+        fields = [
+            'id', 'kind', 'status', 'progress', 'progress_message', 'error', 'session',
+            'attempts', 'created_at', 'started_at', 'heartbeat_at', 'run_after', 'finished_at'
+        ]
+        read_only_fields = fields
+
+class AnalysisJobSubmitSerializer(serializers.Serializer):
+    """
+    Сериализатор постановки задачи анализа в очередь.
+    params - тело запроса соответствующего синхронного endpoint.
+    """
+    kind = serializers.ChoiceField(choices=AnalysisJob.KIND_CHOICES)
+    params = serializers.DictField()
+
+    def validate_params(self, value):
+        """
+        Параметры проверяются сразу, чтобы ошибка не всплыла только в обработчике.
+        """
+        request_serializer = AnalysisRequestSerializer(data=value)
+        if not request_serializer.is_valid():
+            raise serializers.ValidationError(request_serializer.errors)
+        return value
@@ -0,0 +1,152 @@
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .models import AnalysisSession, TextDocument, TopicDistribution, TopicResult
+
+
+def save_topic_distribution(session: AnalysisSession, documents: Sequence[TextDocument], matrix,
+                            topic_results: Sequence[Optional[TopicResult]],
+                            dtype: str = 'float16') -> TopicDistribution:
+    """
+    Сохранение распределения документов сессии по темам.
+
+    Args:
+        documents: Документы по строкам matrix (порядок анализа)
+        matrix: Веса тем документов, документы x столбцы тем
+        topic_results: TopicResult каждого столбца (None - тема не сохранена)
+        dtype: float16 (2 байта на вес) или float32
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if matrix.ndim != 2 or matrix.shape != (len(documents), len(topic_results)):
+        raise ValueError(f"Distribution shape {matrix.shape} does not match "
+                         f"{len(documents)} documents x {len(topic_results)} topics")
+
+    # Одинаковые по содержимому документы - одна строка TextDocument, берется первая строка
+    rows = {}
+    for row, document in enumerate(documents):
+        rows.setdefault(document.id, row)
+    document_ids = np.fromiter(rows.keys(), dtype='<i8', count=len(rows))
+    matrix = matrix[list(rows.values())]
+
+    distribution, _ = TopicDistribution.objects.update_or_create(
+        session=session,
+        defaults={
+            'n_documents': len(document_ids),
+            'n_topics': matrix.shape[1],
+            'dtype': dtype,
+            'matrix': matrix.astype(np.dtype(dtype).newbyteorder('<')).tobytes(),
+            'document_ids': document_ids.tobytes(),
+            'topic_ids': [topic.id if topic is not None else None for topic in topic_results],
+        }
+    )
+    print(f"Stored {len(document_ids)}x{matrix.shape[1]} topic distribution "
+          f"for session {session.id} ({len(distribution.matrix)} bytes)")
+    return distribution
+
+
+class DistributionReader:
+    """
+    Чтение сохраненного распределения: переотнесение документов с другим
+    порогом, самые характерные документы темы и второстепенные темы
+    документов - без повторного анализа.
+    """
+
+    def __init__(self, distribution: TopicDistribution):
+        self.distribution = distribution
+        self.matrix = np.frombuffer(
+            bytes(distribution.matrix), dtype=np.dtype(distribution.dtype).newbyteorder('<')
+        ).astype(np.float32).reshape(distribution.n_documents, distribution.n_topics)
+        self.document_ids = np.frombuffer(bytes(distribution.document_ids), dtype='<i8')
+        self.topic_ids = list(distribution.topic_ids)
+        self._rows = None
+
+    def column(self, topic_id: int) -> int:
+        """Столбец матрицы темы (TopicResult.id)"""
+        try:
+            return self.topic_ids.index(topic_id)
+        except ValueError:
+            raise KeyError(f"Topic {topic_id} has no stored distribution")
+
+    def row(self, document_id: int) -> int:
+        """Строка матрицы документа (TextDocument.id)"""
+        if self._rows is None:
+            self._rows = {int(document_id): row for row, document_id in enumerate(self.document_ids)}
+        try:
+            return self._rows[document_id]
+        except KeyError:
+            raise KeyError(f"Document {document_id} is not in the session distribution")
+
+    def rethreshold(self, threshold: float) -> Dict:
+        """
+        Количество документов тем при другом пороге уверенности: основная тема
+        документа засчитывается, если ее вес >= threshold (иначе документ
+        не отнесен); members - документы с весом темы >= threshold
+        """
+        dominant = self.matrix.argmax(axis=1)
+        dominant_weight = self.matrix.max(axis=1)
+        assigned = dominant_weight >= threshold
+        dominant_counts = np.bincount(dominant[assigned], minlength=self.matrix.shape[1])
+        member_counts = (self.matrix >= threshold).sum(axis=0)
+        return {
+            'threshold': threshold,
+            'total_documents': int(len(self.document_ids)),
+            'unassigned_documents': int((~assigned).sum()),
+            'topics': [
+                {
+                    'topic_id': topic_id,
+                    'document_count': int(dominant_counts[column]),
+                    'member_count': int(member_counts[column]),
+                    'average_weight': round(float(self.matrix[:, column].mean()), 4)
+                }
+                for column, topic_id in enumerate(self.topic_ids) if topic_id is not None
+            ]
+        }
+
+    def top_documents(self, topic_id: int, limit: int = 10) -> List[Dict]:
+        """Документы с наибольшим весом темы"""
+        weights = self.matrix[:, self.column(topic_id)]
+        limit = min(limit, len(weights))
+        if limit <= 0:
+            return []
+        top = np.argpartition(-weights, limit - 1)[:limit]
+        top = top[np.argsort(-weights[top], kind='stable')]
+        return [
+            {'document_id': int(self.document_ids[row]), 'weight': round(float(weights[row]), 4)}
+            for row in top
+        ]
+
+    def document_topics(self, document_id: int, min_weight: float = 0.0) -> List[Dict]:
+        """Темы документа по убыванию веса (первая - основная)"""
+        weights = self.matrix[self.row(document_id)]
+        return [
+            {'topic_id': self.topic_ids[column], 'weight': round(float(weights[column]), 4)}
+            for column in np.argsort(-weights, kind='stable')
+            if self.topic_ids[column] is not None and weights[column] >= min_weight
+        ]
+
+    def secondary_topics(self, min_weight: float = 0.1, limit: int = 100) -> List[Dict]:
+        """
+        Документы, у которых вторая по весу тема не меньше min_weight,
+        по убыванию веса второй темы
+        """
+        saved = np.array([topic_id is not None for topic_id in self.topic_ids])
+        if saved.sum() < 2:
+            return []
+        # Столбцы тем без сохраненного TopicResult не участвуют
+        matrix = np.where(saved, self.matrix, -1.0)
+        order = np.argsort(-matrix, axis=1, kind='stable')[:, :2]
+        rows = np.arange(len(matrix))
+        second_weights = matrix[rows, order[:, 1]]
+        candidates = np.flatnonzero(second_weights >= min_weight)
+        candidates = candidates[np.argsort(-second_weights[candidates], kind='stable')][:limit]
+        return [
+            {
+                'document_id': int(self.document_ids[row]),
+                'main_topic_id': self.topic_ids[order[row, 0]],
+                'main_weight': round(float(self.matrix[row, order[row, 0]]), 4),
+                'secondary_topic_id': self.topic_ids[order[row, 1]],
+                'secondary_weight': round(float(second_weights[row]), 4)
+            }
+            for row in candidates
+        ]
@@ -1,11 +1,18 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import TextDocumentViewSet, AnalysisSessionViewSet, TopicAnalysisView, QuickAnalysisView
-from .llm_views import LLMTopicAnalysisView, LLMSummaryView, LLMQuickAnalysisView
+from .llm_views import (
+    LLMTopicAnalysisView, LLMSummaryView, LLMSummaryStreamView, LLMQuickAnalysisView,
+    LLMDocumentClassificationView, LLMSessionRefinementView, LLMBackendStatusView,
+    LLMSchedulerStatusView, LLMModelResidencyView, LLMTopicStreamView
+)
+from .job_views import AnalysisJobViewSet
 
 router = DefaultRouter()
 router.register(r'documents', TextDocumentViewSet)
 router.register(r'analysis-sessions', AnalysisSessionViewSet)
+# Фоновые задачи анализа: POST jobs/, GET jobs/<id>/, GET jobs/<id>/result/
+router.register(r'jobs', AnalysisJobViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -15,5 +22,12 @@ urlpatterns = [
     # Новые LLM endpoints
     path('llm/analyze-topics/', LLMTopicAnalysisView.as_view(), name='llm-analyze-topics'),
     path('llm/generate-summary/', LLMSummaryView.as_view(), name='llm-generate-summary'),
+    path('llm/generate-summary/stream/', LLMSummaryStreamView.as_view(), name='llm-generate-summary-stream'),
     path('llm/quick-analyze/', LLMQuickAnalysisView.as_view(), name='llm-quick-analyze'),
+    path('llm/analyze-topics/stream/', LLMTopicStreamView.as_view(), name='llm-analyze-topics-stream'),
+    path('llm/classify-documents/', LLMDocumentClassificationView.as_view(), name='llm-classify-documents'),
+    path('llm/refine-session/', LLMSessionRefinementView.as_view(), name='llm-refine-session'),
+    path('llm/backends/', LLMBackendStatusView.as_view(), name='llm-backends'),
+    path('llm/scheduler/', LLMSchedulerStatusView.as_view(), name='llm-scheduler'),
+    path('llm/models/', LLMModelResidencyView.as_view(), name='llm-models'),
 ]
\ No newline at end of file
@@ -1,11 +1,17 @@
 from rest_framework import viewsets, status
-from django.db.models import Q
+from django.db.models import Q, Sum, Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from datetime import datetime
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from django.db import transaction
-from .models import TextDocument, AnalysisSession, TopicResult
+from django.db import IntegrityError, transaction
+from .models import TextDocument, AnalysisSession, TopicResult, TopicDistribution, compute_content_hash
+from .ingestion import ingest_documents
+from .pagination import KeysetPagination, ndjson_response
+from .topic_distributions import save_topic_distribution, DistributionReader
+from .analysis_sessions import start_analysis_session, save_topic_results, fail_analysis_session
 from .serializers import (
     TextDocumentSerializer, AnalysisSessionSerializer,
     TopicResultSerializer, AnalysisRequestSerializer,
@@ -36,66 +42,58 @@ class ImprovedTopicAnalysisView(APIView):
         """
         Выполнение улучшенного анализа
         """
+        session = None
         try:
-            with transaction.atomic():
-                # Извлекаем данные
-                documents_data = validated_data['documents']['documents']
-                analysis_name = validated_data.get('analysis_name', 'Улучшенный анализ')
-                use_advanced = validated_data.get('use_advanced', True)
-                
-                # Сохраняем документы
-                text_documents = []
-                for doc_data in documents_data:
-                    document = TextDocument.objects.create(
-                        date=doc_data['date'],
-                        theme=doc_data['theme'],
-                        text=doc_data['text']
-                    )
-                    text_documents.append(document)
+            # Извлекаем данные
+            documents_data = validated_data['documents']['documents']
+            analysis_name = validated_data.get('analysis_name', 'Улучшенный анализ')
+            use_advanced = validated_data.get('use_advanced', True)
+            
+            # Сохраняем документы и создаем сессию (короткая транзакция)
+            session, text_documents = start_analysis_session(
+                documents_data,
+                name=analysis_name,
+                description='Анализ с улучшенным алгоритмом'
+            )
+            
+            # Анализ выполняется вне транзакции
+            if use_advanced:
+                # Используем гибридный анализатор
+                analyzer = create_analyzer(mode='hybrid')
                 
-                # Создаем сессию
-                session = AnalysisSession.objects.create(
-                    name=analysis_name,
-                    description='Анализ с улучшенным алгоритмом'
-                )
-                session.documents.set(text_documents)
+                # Извлекаем тексты
+                texts = [doc.text for doc in text_documents]
                 
-                # Выбираем анализатор
-                if use_advanced:
-                    # Используем гибридный анализатор
-                    analyzer = create_analyzer(mode='hybrid')
-                    
-                    # Извлекаем тексты
-                    texts = [doc.text for doc in text_documents]
-                    
-                    # Загружаем обучающие данные для дообучения
-                    training_data = TopicTrainingData()
-                    if len(training_data.data) > 0:
-                        print(f"Используем {len(training_data.data)} обучающих примеров")
-                    
-                    # Выполняем анализ
-                    analysis_result = analyzer.ensemble_analysis(texts)
-                    
-                    # Используем консенсусные результаты
-                    topic_stats = analysis_result['consensus']['topic_statistics']
-                    
-                else:
-                    # Используем старый анализатор для обратной совместимости
-                    from .bayesian_analyzer import EnhancedBayesianAnalyzer
-                    analyzer = EnhancedBayesianAnalyzer()
-                    texts = [doc.text for doc in text_documents]
-                    result = analyzer.analyze_with_auto_topics(texts)
-                    topic_stats = result['topic_statistics']
+                # Загружаем обучающие данные для дообучения
+                training_data = TopicTrainingData()
+                if len(training_data.data) > 0:
+                    print(f"Используем {len(training_data.data)} обучающих примеров")
                 
-                # Сохраняем результаты
-                self.save_enhanced_results(session, topic_stats, text_documents)
+                # Выполняем анализ
+                analysis_result = analyzer.ensemble_analysis(texts)
                 
-                # Формируем улучшенный ответ
-                response_data = self.format_enhanced_response(session, topic_stats, text_documents)
+                # Используем консенсусные результаты
+                topic_stats = analysis_result['consensus']['topic_statistics']
                 
-                return Response(response_data, status=status.HTTP_200_OK)
+            else:
+                # Используем старый анализатор для обратной совместимости
+                from .bayesian_analyzer import EnhancedBayesianAnalyzer
+                analyzer = EnhancedBayesianAnalyzer()
+                texts = [doc.text for doc in text_documents]
+                result = analyzer.analyze_with_auto_topics(texts)
+                topic_stats = result['topic_statistics']
+            
+            # Сохраняем результаты
+            self.save_enhanced_results(session, topic_stats, text_documents)
+            
+            # Формируем улучшенный ответ
+            response_data = self.format_enhanced_response(session, topic_stats, text_documents)
+            
+            return Response(response_data, status=status.HTTP_200_OK)
                 
         except Exception as e:
+            if session is not None:
+                fail_analysis_session(session, e)
             return Response(
                 {'error': f'Ошибка при анализе: {str(e)}'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -105,21 +103,16 @@ class ImprovedTopicAnalysisView(APIView):
         """
         Сохранение улучшенных результатов анализа
         """
-        for topic_stat in topic_stats:
-            if topic_stat['document_count'] > 0:
+        save_topic_results(session, [
+            {
+                'topic_name': topic_stat['topic_name'],
+                'topic_keywords': topic_stat['keywords'][:10],  # Сохраняем топ-10 ключевых слов
+                'confidence_score': topic_stat['average_confidence'],
                 # Находим документы для этой темы
-                topic_docs_indices = topic_stat['document_indices']
-                topic_documents = [text_documents[i] for i in topic_docs_indices]
-                
-                # Создаем запись результата
-                topic_result = TopicResult.objects.create(
-                    session=session,
-                    topic_name=topic_stat['topic_name'],
-                    topic_keywords=topic_stat['keywords'][:10],  # Сохраняем топ-10 ключевых слов
-                    document_count=topic_stat['document_count'],
-                    confidence_score=topic_stat['average_confidence']
-                )
-                topic_result.documents.set(topic_documents)
+                'documents': [text_documents[i] for i in topic_stat['document_indices']]
+            }
+            for topic_stat in topic_stats if topic_stat['document_count'] > 0
+        ])
     
     def format_enhanced_response(self, session, topic_stats, text_documents):
         """
@@ -195,21 +188,8 @@ class SummaryReportView(APIView):
             # Получаем сессию
             session = AnalysisSession.objects.get(id=session_id)
             
-            # Фильтруем документы по дате
-            filtered_documents = session.documents.filter(
-                date__range=[start_date, end_date]
-            )
-            
-            # Получаем темы для отфильтрованных документов
-            topic_results = TopicResult.objects.filter(
-                session=session,
-                documents__in=filtered_documents
-            ).distinct()
-            
             # Формируем статистику
-            summary_data = self.generate_summary(
-                topic_results, filtered_documents, start_date, end_date
-            )
+            summary_data = self.generate_summary(session, start_date, end_date)
             
             return Response(summary_data)
             
@@ -224,21 +204,32 @@ class SummaryReportView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
-    def generate_summary(self, topic_results, documents, start_date, end_date):
+    def generate_summary(self, session, start_date, end_date):
         """
-        Генерация сводной справки
+        Генерация сводной справки: суммы дневных счетчиков (TopicDailyCount)
+        за период - двумя агрегирующими запросами независимо от числа тем
         """
-        total_documents = documents.count()
+        period_counts = session.daily_counts.filter(date__range=[start_date, end_date])
+        total_documents = period_counts.filter(topic__isnull=True).aggregate(
+            total=Sum('document_count')
+        )['total'] or 0
+        
+        # Документы тем за период - один GROUP BY по дневным счетчикам тем
+        topic_counts = (
+            period_counts.filter(topic__isnull=False)
+            .values('topic_id', 'topic__topic_name', 'topic__topic_keywords', 'topic__confidence_score')
+            .annotate(documents=Sum('document_count'))
+            .order_by('-documents', 'topic_id')
+        )
         
         topic_stats = []
-        for topic in topic_results:
-            topic_docs = topic.documents.filter(id__in=documents.values_list('id', flat=True))
+        for topic in topic_counts:
             topic_stats.append({
-                'topic_name': topic.topic_name,
-                'document_count': topic_docs.count(),
-                'keywords': topic.topic_keywords,
-                'confidence_score': topic.confidence_score,
-                'percentage': round((topic_docs.count() / total_documents) * 100, 2) if total_documents > 0 else 0
+                'topic_name': topic['topic__topic_name'],
+                'document_count': topic['documents'],
+                'keywords': topic['topic__topic_keywords'],
+                'confidence_score': topic['topic__confidence_score'],
+                'percentage': round((topic['documents'] / total_documents) * 100, 2) if total_documents > 0 else 0
             })
         
         return {
@@ -258,6 +249,42 @@ class TextDocumentViewSet(viewsets.ModelViewSet):
     """
     queryset = TextDocument.objects.all()
     serializer_class = TextDocumentSerializer
+    pagination_class = KeysetPagination
+    
+    def create(self, request, *args, **kwargs):
+        """
+        Создание документа через загрузку с дедупликацией: если документ
+        с такой датой, тематикой и текстом уже сохранен, возвращается он (200)
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        content_hash = compute_content_hash(data['date'], data['theme'], data['text'])
+        exists = TextDocument.objects.filter(content_hash=content_hash).exists()
+        
+        document = ingest_documents([data])[0]
+        return Response(
+            self.get_serializer(document).data,
+            status=status.HTTP_200_OK if exists else status.HTTP_201_CREATED
+        )
+    
+    def perform_update(self, serializer):
+        # Параллельное изменение могло занять то же содержимое после проверки сериализатора
+        try:
+            with transaction.atomic():
+                serializer.save()
+        except IntegrityError:
+            raise ValidationError({'error': 'Документ с такой датой, тематикой и текстом уже существует'})
+    
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Выгрузка всех документов потоком NDJSON (без постраничной выдачи).
+        """
+        rows = TextDocument.objects.order_by('-created_at', '-id').values(
+            'id', 'date', 'theme', 'text', 'created_at'
+        )
+        return ndjson_response(rows, 'documents.ndjson')
     
     @action(detail=False, methods=['post'])
     def bulk_upload(self, request):
@@ -268,14 +295,7 @@ class TextDocumentViewSet(viewsets.ModelViewSet):
         if serializer.is_valid():
             documents_data = serializer.validated_data['documents']
             
-            created_documents = []
-            for doc_data in documents_data:
-                document = TextDocument.objects.create(
-                    date=doc_data['date'],
-                    theme=doc_data['theme'],
-                    text=doc_data['text']
-                )
-                created_documents.append(document)
+            created_documents = ingest_documents(documents_data)
             
             result_serializer = TextDocumentSerializer(created_documents, many=True)
             return Response({
@@ -289,8 +309,34 @@ class AnalysisSessionViewSet(viewsets.ModelViewSet):
     """
     ViewSet для управления сессиями анализа.
     """
-    queryset = AnalysisSession.objects.all()
     serializer_class = AnalysisSessionSerializer
+    pagination_class = KeysetPagination
+    
+    # Количество документов - коррелированным подзапросом по связям сессии:
+    # считается только для сессий выдаваемой страницы, а не GROUP BY по всей таблице
+    queryset = AnalysisSession.objects.annotate(
+        document_count=Coalesce(
+            Subquery(
+                AnalysisSession.documents.through.objects
+                .filter(analysissession_id=OuterRef('pk'))
+                .values('analysissession_id')
+                .annotate(count=Count('id'))
+                .values('count')
+            ),
+            0
+        )
+    )
+    
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Выгрузка всех сессий потоком NDJSON (без постраничной выдачи).
+        """
+        rows = self.get_queryset().order_by('-created_at', '-id').values(
+            'id', 'name', 'description', 'document_count', 'created_at',
+            'algorithm_used', 'status', 'metadata'
+        )
+        return ndjson_response(rows, 'analysis_sessions.ndjson')
     
     @action(detail=True, methods=['get'])
     def results(self, request, pk=None):
@@ -301,6 +347,157 @@ class AnalysisSessionViewSet(viewsets.ModelViewSet):
         topic_results = session.topic_results.all()
         serializer = TopicResultSerializer(topic_results, many=True)
         return Response(serializer.data)
+    
+    @action(detail=True, methods=['get'])
+    def histogram(self, request, pk=None):
+        """
+        Количество документов сессии и ее тем по дням для графика
+        (?start_date=YYYY-MM-DD&end_date=YYYY-MM-DD, оба необязательны).
+        Строится по дневным счетчикам, без обращения к документам.
+        """
+        session = self.get_object()
+        daily_counts = session.daily_counts.all()
+        try:
+            if request.query_params.get('start_date'):
+                start_date = datetime.strptime(request.query_params['start_date'], '%Y-%m-%d').date()
+                daily_counts = daily_counts.filter(date__gte=start_date)
+            if request.query_params.get('end_date'):
+                end_date = datetime.strptime(request.query_params['end_date'], '%Y-%m-%d').date()
+                daily_counts = daily_counts.filter(date__lte=end_date)
+        except ValueError:
+            return Response(
+                {'error': 'Даты должны быть в формате YYYY-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        totals = {}
+        topics = {}
+        for row in daily_counts.values('topic_id', 'topic__topic_name', 'date', 'document_count'):
+            if row['topic_id'] is None:
+                totals[row['date']] = row['document_count']
+            else:
+                topic = topics.setdefault(row['topic_id'], {'name': row['topic__topic_name'], 'days': {}})
+                topic['days'][row['date']] = row['document_count']
+        
+        dates = sorted(totals)
+        return Response({
+            'dates': [date.strftime('%Y-%m-%d') for date in dates],
+            'counts': [totals[date] for date in dates],
+            'topics': [
+                {
+                    'topic_id': topic_id,
+                    'topic_name': topic['name'],
+                    'counts': [topic['days'].get(date, 0) for date in dates]
+                }
+                for topic_id, topic in topics.items()
+            ]
+        })
+
+    def get_distribution(self, session):
+        """
+        Чтение сохраненного распределения сессии; None, если сессия анализировалась
+        алгоритмом без распределения по темам
+        """
+        try:
+            return DistributionReader(session.topic_distribution)
+        except TopicDistribution.DoesNotExist:
+            return None
+    
+    def distribution_not_found(self):
+        return Response(
+            {'error': 'Для сессии не сохранено распределение документов по темам'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    @action(detail=True, methods=['get'])
+    def distribution(self, request, pk=None):
+        """
+        Переотнесение документов по сохраненному распределению с порогом
+        уверенности ?threshold= (по умолчанию 0.3), без повторного анализа.
+        """
+        session = self.get_object()
+        reader = self.get_distribution(session)
+        if reader is None:
+            return self.distribution_not_found()
+        try:
+            threshold = float(request.query_params.get('threshold', 0.3))
+        except ValueError:
+            return Response({'error': 'threshold должен быть числом'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        result = reader.rethreshold(threshold)
+        names = dict(session.topic_results.values_list('id', 'topic_name'))
+        for topic in result['topics']:
+            topic['topic_name'] = names.get(topic['topic_id'])
+        result['session_id'] = session.id
+        result['dtype'] = reader.distribution.dtype
+        return Response(result)
+    
+    @action(detail=True, methods=['get'], url_path='top-documents')
+    def top_documents(self, request, pk=None):
+        """
+        Самые характерные документы темы ?topic_id= (по весу темы), ?limit= (по умолчанию 10).
+        """
+        session = self.get_object()
+        reader = self.get_distribution(session)
+        if reader is None:
+            return self.distribution_not_found()
+        try:
+            topic_id = int(request.query_params['topic_id'])
+            limit = min(int(request.query_params.get('limit', 10)), 1000)
+            top = reader.top_documents(topic_id, limit)
+        except (KeyError, ValueError):
+            return Response(
+                {'error': 'Необходим topic_id темы этой сессии'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        documents = TextDocument.objects.in_bulk([item['document_id'] for item in top])
+        for item in top:
+            document = documents.get(item['document_id'])
+            if document is not None:
+                item.update({
+                    'date': document.date,
+                    'theme': document.theme,
+                    'text_preview': document.text[:100] + '...' if len(document.text) > 100 else document.text
+                })
+        return Response({'session_id': session.id, 'topic_id': topic_id, 'documents': top})
+    
+    @action(detail=True, methods=['get'], url_path='secondary-topics')
+    def secondary_topics(self, request, pk=None):
+        """
+        Второстепенные темы: для ?document_id= - все темы документа по весу,
+        иначе документы со второй темой весом не меньше ?min_weight= (по умолчанию 0.1).
+        """
+        session = self.get_object()
+        reader = self.get_distribution(session)
+        if reader is None:
+            return self.distribution_not_found()
+        try:
+            min_weight = float(request.query_params.get('min_weight', 0.1))
+            limit = min(int(request.query_params.get('limit', 100)), 1000)
+            document_id = request.query_params.get('document_id')
+            if document_id is not None:
+                return Response({
+                    'session_id': session.id,
+                    'document_id': int(document_id),
+                    'topics': reader.document_topics(int(document_id), min_weight)
+                })
+        except KeyError:
+            return Response(
+                {'error': 'Документ не входит в распределение сессии'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        except ValueError:
+            return Response(
+                {'error': 'Некорректные параметры document_id, min_weight или limit'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return Response({
+            'session_id': session.id,
+            'min_weight': min_weight,
+            'documents': reader.secondary_topics(min_weight, limit)
+        })
 
 class TopicAnalysisView(APIView):
     """
@@ -317,56 +514,50 @@ class TopicAnalysisView(APIView):
             return self.perform_analysis(serializer.validated_data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
-    def perform_analysis(self, validated_data):
+    def perform_analysis(self, validated_data, job=None):
         """
         Выполнение тематического анализа с использованием алгоритма Байеса.
+        job - фоновая задача, если анализ выполняет обработчик очереди.
         """
+        session = None
         try:
-            with transaction.atomic():
-                # Извлекаем данные документов
-                documents_data = validated_data['documents']['documents']
-                analysis_name = validated_data.get('analysis_name', 'Анализ текстов')
-                analysis_description = validated_data.get('analysis_description', '')
-                num_topics = validated_data['num_topics']
-                auto_determine = validated_data['auto_determine_topics']
-                
-                # Сохраняем документы в базу
-                text_documents = []
-                for doc_data in documents_data:
-                    document = TextDocument.objects.create(
-                        date=doc_data['date'],
-                        theme=doc_data['theme'],
-                        text=doc_data['text']
-                    )
-                    text_documents.append(document)
-                
-                # Создаем сессию анализа
-                session = AnalysisSession.objects.create(
-                    name=analysis_name,
-                    description=analysis_description
-                )
-                session.documents.set(text_documents)
-                
-                # Подготавливаем тексты для анализа
-                texts = [doc.text for doc in text_documents]
-                
-                # Выбираем анализатор
-                if auto_determine:
-                    analyzer = EnhancedBayesianAnalyzer()
-                    analysis_result = analyzer.analyze_with_auto_topics(texts)
-                else:
-                    analyzer = BayesianTopicAnalyzer(n_topics=num_topics)
-                    analysis_result = analyzer.analyze_topics(texts)
-                
-                # Сохраняем результаты в базу
-                self.save_analysis_results(session, analysis_result, text_documents)
-                
-                # Формируем ответ
-                response_data = self.format_analysis_response(session, analysis_result)
-                
-                return Response(response_data, status=status.HTTP_200_OK)
+            # Извлекаем данные документов
+            documents_data = validated_data['documents']['documents']
+            analysis_name = validated_data.get('analysis_name', 'Анализ текстов')
+            analysis_description = validated_data.get('analysis_description', '')
+            num_topics = validated_data['num_topics']
+            auto_determine = validated_data['auto_determine_topics']
+            
+            # Сохраняем документы и создаем сессию анализа (короткая транзакция)
+            session, text_documents = start_analysis_session(
+                documents_data,
+                job=job,
+                name=analysis_name,
+                description=analysis_description
+            )
+            
+            # Подготавливаем тексты для анализа
+            texts = [doc.text for doc in text_documents]
+            
+            # Обучение модели выполняется вне транзакции
+            if auto_determine:
+                analyzer = EnhancedBayesianAnalyzer()
+                analysis_result = analyzer.analyze_with_auto_topics(texts)
+            else:
+                analyzer = BayesianTopicAnalyzer(n_topics=num_topics)
+                analysis_result = analyzer.analyze_topics(texts)
+            
+            # Сохраняем результаты в базу
+            self.save_analysis_results(session, analysis_result, text_documents)
+            
+            # Формируем ответ
+            response_data = self.format_analysis_response(session, analysis_result)
+            
+            return Response(response_data, status=status.HTTP_200_OK)
                 
         except Exception as e:
+            if session is not None:
+                fail_analysis_session(session, e)
             return Response(
                 {'error': f'Ошибка при анализе: {str(e)}'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -376,20 +567,36 @@ class TopicAnalysisView(APIView):
         """
         Сохранение результатов анализа в базу данных.
         """
-        for topic_stat in analysis_result['topic_statistics']:
-            # Находим документы для этой темы
-            topic_docs_indices = topic_stat['document_indices']
-            topic_documents = [text_documents[i] for i in topic_docs_indices]
+        # Уверенность LDA для каждого документа
+        confidences = {
+            assignment['document_index']: assignment['confidence']
+            for assignment in analysis_result.get('document_assignments', [])
+        }
+        with transaction.atomic():
+            topic_results = save_topic_results(session, [
+                {
+                    'topic_name': topic_stat['topic_name'],
+                    'topic_keywords': topic_stat['keywords'],
+                    'confidence_score': topic_stat['average_confidence'],
+                    # Находим документы для этой темы
+                    'documents': [text_documents[i] for i in topic_stat['document_indices']],
+                    'confidences': [confidences.get(i) for i in topic_stat['document_indices']]
+                }
+                for topic_stat in analysis_result['topic_statistics']
+            ])
             
-            # Создаем запись результата
-            topic_result = TopicResult.objects.create(
-                session=session,
-                topic_name=topic_stat['topic_name'],
-                topic_keywords=topic_stat['keywords'],
-                document_count=topic_stat['document_count'],
-                confidence_score=topic_stat['average_confidence']
-            )
-            topic_result.documents.set(topic_documents)
+            # Полное распределение LDA по темам сохраняется для переотнесения без повторного анализа
+            assignments = analysis_result.get('document_assignments', [])
+            if assignments and len(assignments) == len(text_documents):
+                results_by_topic = {
+                    topic_stat['topic_id']: topic_result
+                    for topic_stat, topic_result in zip(analysis_result['topic_statistics'], topic_results)
+                }
+                matrix = [assignment['topic_distribution'] for assignment in assignments]
+                save_topic_distribution(
+                    session, text_documents, matrix,
+                    [results_by_topic.get(column) for column in range(len(matrix[0]))]
+                )
     
     def format_analysis_response(self, session, analysis_result):
         """
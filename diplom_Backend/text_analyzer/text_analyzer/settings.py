@@ -20,6 +20,61 @@ LLM_CONFIG = {
     'MAX_RETRIES': 3,
     'TEMPERATURE': 0.3,
     'MAX_TOKENS': 4000,
+    'ASSIGNMENT_MODE': 'llm',  # 'llm' - ID документов от модели, 'embedding' - сходство эмбеддингов
+    'EMBEDDING_MODEL': 'nomic-embed-text',  # Модель Ollama для /api/embeddings
+    'REQUEST_DEADLINE': 180,  # секунд на все попытки одного вызова
+    'CIRCUIT_FAILURE_THRESHOLD': 3,  # неудач подряд до перехода в фолбэк
+    'CIRCUIT_RESET_TIMEOUT': 30,  # секунд до повторной проверки бэкенда
+    'CLASSIFICATION_BATCH_SIZE': 10,  # документов в одном промпте классификации
+    'TOPIC_ENGINE': 'llm',  # 'llm' или 'clusters' (NMF кластеры + названия от LLM)
+    'SUMMARY_GRANULARITY': 'day',  # 'day', 'week' или 'none' - сводки для справок по периоду
+    # Пул экземпляров Ollama; запрос уходит на наименее загруженный доступный.
+    # MODELS - модели, загруженные на экземпляре (пусто - любые).
+    # Пустой список - используется только OLLAMA_URL.
+    'BACKENDS': [
+        # {'URL': 'http://localhost:11434', 'MAX_CONCURRENCY': 2, 'MODELS': ['mistral']},
+        # {'URL': 'http://gpu-2:11434', 'MAX_CONCURRENCY': 4, 'MODELS': []},
+    ],
+    # Планировщик вызовов LLM по классам приоритета:
+    # interactive - llm/quick-analyze/, report - справки, bulk - анализ корпусов
+    'SCHEDULER': {
+        'MAX_CONCURRENCY': 4,  # одновременных вызовов LLM на процесс
+        'QUOTAS': {'interactive': 4, 'report': 3, 'bulk': 2},  # максимум одновременных вызовов класса
+        'MAX_QUEUE': {'interactive': 20, 'report': 10, 'bulk': 20},  # длина очереди до отказа (503)
+    },
+    'OVERLOAD_RETRY_AFTER': 5,  # секунд в заголовке Retry-After при отказе
+    # Маршрутизация моделей: быстрые задачи и маленькие входы - на малую модель,
+    # анализ корпуса и справки - на большую (если она не перегружена)
+    'MODEL_ROUTING': {
+        'ENABLED': True,
+        'SMALL_MODEL': 'mistral',  # например, 'qwen2.5:3b'
+        'LARGE_MODEL': 'mistral',
+        'SMALL_INPUT_TOKENS': 1500,  # до этого объема входа - всегда малая модель
+        'SMALL_MAX_INPUT_TOKENS': 6000,  # больший вход малой модели не отдаем
+        'LOAD_THRESHOLD': 0.8,  # доля занятых слотов большой модели для переноса на малую
+        'NUM_PREDICT': {},  # бюджет генерации по задачам, например {'summary': 1200}
+    },
+    'KEEP_ALIVE': '30m',  # сколько модель остается в памяти Ollama после запроса
+    # Прогрев моделей при старте сервера (wsgi/asgi)
+    'WARMUP': {
+        'ENABLED': True,
+        'MODELS': [],  # пусто - MODEL_NAME и модели из MODEL_ROUTING
+        'INTERVAL': 600,  # секунд между продлениями keep_alive (меньше KEEP_ALIVE)
+    },
+}
+
+# Массовое сохранение загружаемых документов
+INGESTION_CONFIG = {
+    'BATCH_SIZE': 1000,  # документов в одном INSERT (bulk_create)
+    'COPY_THRESHOLD': 20000,  # с этого количества документов - COPY (PostgreSQL), 0 - не использовать
+}
+
+# Фоновые задачи анализа (обработчик: python run_worker.py)
+JOBS_CONFIG = {
+    'POLL_INTERVAL': 2,  # пауза между опросами пустой очереди (сек)
+    'STALE_AFTER': 1800,  # задача без сигнала обработчика дольше - возвращается в очередь (сек)
+    'MAX_ATTEMPTS': 2,  # сколько раз задача может быть взята в работу
+    'RETRY_DELAY': 30,  # пауза перед повтором после временного отказа без Retry-After (сек)
 }
 
 INSTALLED_APPS = [
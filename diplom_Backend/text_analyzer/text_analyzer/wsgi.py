@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'text_analyzer.settings')
 
 application = get_wsgi_application()
+
+# Прогрев моделей Ollama, чтобы первый запрос не ждал их загрузки
+from text_analysis.llm_warmup import start_model_warmup  # noqa: E402
+
+start_model_warmup()